@@ -3,7 +3,10 @@ import json
 import requests
 from datetime import datetime, timedelta, date as dt_date
 import re
-from langchain_groq import ChatGroq
+import time
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.pydantic_v1 import BaseModel, Field
@@ -21,12 +24,18 @@ from langchain_core.messages import AnyMessage
 from datetime import date
 import urllib.parse
 
-# Groq setup
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise RuntimeError("GROQ_API_KEY is not set. Please set the environment variable before running.")
+from app.integrations.llm import get_llm, estimate_tokens
+from app.metrics import observe_http, timed_external, timed_node, LLM_PROMPT_TOKENS, LLM_SKIPPED
+from app.services.temporal import parse_date, parse_time, in_period
+from app.services.candidates import KINDS as CANDIDATE_KINDS, rank as rank_candidates, clear_winner, build_choice_prompt
+from app.tracing import record_span
+from app.logger import get_logger
+from app.config import settings
+
+log = get_logger("agent")
+
+# LLM backend: Groq by default, or LLM_BACKEND=stub/record for offline replay; built on first call
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
-llm = ChatGroq(model=GROQ_MODEL, temperature=0.0)
 
 # Google API setup (optional at runtime)
 SCOPES = ['https://www.googleapis.com/auth/calendar', 'https://www.googleapis.com/auth/gmail.send']
@@ -42,6 +51,23 @@ except Exception:
 # FastAPI endpoints
 BASE_URL = "http://localhost:8000"
 
+# One keep-alive session for the loopback calls; each response is timed by endpoint
+def _time_response(r, *args, **kwargs):
+    path = urllib.parse.urlsplit(r.url).path
+    endpoint = "/" + path.split('/')[1]
+    seconds = r.elapsed.total_seconds()
+    observe_http(seconds, "agent_http", endpoint)
+    end_ns = time.time_ns()
+    record_span(f"{r.request.method} {endpoint}", end_ns - int(seconds * 1e9), end_ns, **{
+        "http.method": r.request.method,
+        "http.target": path,
+        "http.status_code": r.status_code,
+        "db.queries": int(r.headers.get("x-db-queries", 0)),
+    })
+
+http_session = requests.Session()
+http_session.hooks["response"].append(_time_response)
+
 class AvailabilityInput(BaseModel):
     doctor_name: str = Field(description="Name of the doctor")
     date: str = Field(description="Date in YYYY-MM-DD format")
@@ -57,7 +83,7 @@ class BookInput(BaseModel):
 
 # Tools
 def check_availability(doctor_id: int, date: str):
-    response = requests.get(f"{BASE_URL}/availability/{doctor_id}/{date}")
+    response = http_session.get(f"{BASE_URL}/availability/{doctor_id}/{date}")
     if response.status_code == 200:
         return response.json()
     return []
@@ -69,9 +95,10 @@ def book_appointment(doctor_id: int, date: str, start_time: str, end_time: str,
         "end_time": end_time,
         "reason": reason
     }
-    response = requests.post(f"{BASE_URL}/book/{doctor_id}/{date}", json=payload)
+    response = http_session.post(f"{BASE_URL}/book/{doctor_id}/{date}", json=payload)
     return response.json()
 
+@timed_external("google_calendar", "insert")
 def create_calendar_event(summary, start_time, end_time, attendee_email):
     if not calendar_service:
         return None
@@ -86,6 +113,7 @@ def create_calendar_event(summary, start_time, end_time, attendee_email):
     except Exception:
         return None
 
+@timed_external("gmail", "send")
 def send_email(to, subject, body):
     if not gmail_service:
         return None
@@ -124,69 +152,26 @@ def _extract_json(text: str) -> dict:
             return {}
 
 def _normalize_date(s: str | None) -> str | None:
-    if not s:
-        return None
-    sl = s.strip().lower()
-    today = dt_date.today()
-    if sl in ["today", "todays"]:
-        return today.strftime("%Y-%m-%d")
-    if "tomorrow" in sl:
-        return (today + timedelta(days=1)).strftime("%Y-%m-%d")
-    # remove ordinal suffixes
-    sl = re.sub(r"(\d+)(st|nd|rd|th)", r"\1", sl)
-    # ordinal-only day like "26"
-    if re.fullmatch(r"\d{1,2}", sl):
-        try:
-            day = int(sl)
-            cand = dt_date(today.year, today.month, min(day, 28) if day > 28 else day)
-            if cand < today:
-                nm = today.month + 1
-                ny = today.year + (1 if nm > 12 else 0)
-                nm = 1 if nm > 12 else nm
-                cand = dt_date(ny, nm, min(day, 28) if day > 28 else day)
-            return cand.strftime("%Y-%m-%d")
-        except Exception:
-            pass
-    for fmt in ["%Y-%m-%d", "%d %B %Y", "%B %d %Y", "%d %B", "%B %d", "%d-%m-%Y", "%d/%m/%Y"]:
-        try:
-            dt = datetime.strptime(sl.title() if "%B" in fmt else sl, fmt)
-            if "%Y" not in fmt:
-                dt = dt.replace(year=today.year)
-            return dt.strftime("%Y-%m-%d")
-        except Exception:
-            continue
-    return None
+    return parse_date(s)
 
 def _normalize_time(s: str | None) -> str | None:
-    if not s:
-        return None
-    t = s.strip().lower().replace(" ", "")
-    m = re.match(r"^(\d{1,2})(?::(\d{2}))?(am|pm)?$", t)
-    if m:
-        h = int(m.group(1))
-        mi = int(m.group(2) or 0)
-        ap = m.group(3)
-        if ap == 'pm' and h < 12:
-            h += 12
-        if ap == 'am' and h == 12:
-            h = 0
-        return f"{h:02d}:{mi:02d}"
-    # Already HH:MM
-    if re.match(r"^\d{2}:\d{2}$", t):
-        return t
-    return None
+    return parse_time(s, seconds=False)
 
 # LLM parsing using robust JSON extraction
 
-def llm_parse(query: str) -> dict:
-    prompt = (
-        "Return ONLY a JSON object with keys: intent, doctor_name, date, time_period, start_time, "
+def parse_prompt(query: str) -> str:
+    return (
+        "Return ONLY a JSON object with keys: intent, doctor_name, specialization, date, time_period, start_time, "
         "patient_email, reason. Interpret natural language dates/times."
         " intent is one of [list_doctors, check_availability, book_appointment]."
         " Do not add comments or extra text."
         f"\nQuery: {query}"
     )
-    resp = llm.invoke(prompt).content
+
+def llm_parse(query: str) -> dict:
+    prompt = parse_prompt(query)
+    LLM_PROMPT_TOKENS.observe(estimate_tokens(prompt), purpose="parse")
+    resp = get_llm(GROQ_MODEL).invoke(prompt).content
     data = _extract_json(resp)
     # Normalize
     data['date'] = _normalize_date(data.get('date'))
@@ -210,14 +195,19 @@ class AgentState(TypedDict):
     intent: str
     doctor_name: str
     doctor_id: int
+    specialization: str
     patient_email: str
     patient_id: int
+    returning_patient: bool
+    visit_minutes: int
     date: str
     time_period: str
     start_time: str
     end_time: str
     reason: str
     need_info: bool
+    llm_calls: int
+    llm_budget: int
 
 # Remove memory line
 # memory = {"configurable": {"thread_id": "test_thread"}}
@@ -225,63 +215,141 @@ class AgentState(TypedDict):
 # Lookup functions
 def get_doctor_id(name):
     encoded = urllib.parse.quote(name)
-    response = requests.get(f"{BASE_URL}/doctor_id/{encoded}")
+    response = http_session.get(f"{BASE_URL}/doctor_id/{encoded}")
     if response.status_code == 200:
         return response.json()["doctor_id"]
     return None
 
-def get_patient_id(email):
+def get_patient_context(email):
+    # {"patient_id", "returning", "visit_count", "last_visit", "last_doctor_id", "visit_minutes"} or None
     encoded = urllib.parse.quote(email)
-    response = requests.get(f"{BASE_URL}/patient_id/{encoded}")
+    response = http_session.get(f"{BASE_URL}/patient_id/{encoded}")
     if response.status_code == 200:
-        return response.json()["patient_id"]
+        return response.json()
     return None
 
+def get_patient_id(email):
+    ctx = get_patient_context(email)
+    return ctx["patient_id"] if ctx else None
+
 # Helper: fetch doctors/patients and LLM-rank the best match
 
 def fetch_doctors():
-    r = requests.get(f"{BASE_URL}/doctors")
+    r = http_session.get(f"{BASE_URL}/doctors")
     return r.json() if r.status_code == 200 else []
 
 def fetch_patients():
-    r = requests.get(f"{BASE_URL}/patients")
+    r = http_session.get(f"{BASE_URL}/patients")
     return r.json() if r.status_code == 200 else []
 
-def llm_choose_id(name_or_email: str, candidates: list, kind: str) -> int | None:
-    prompt = (
-        f"From this {kind} list, return ONLY a JSON with id field for the best match to: {name_or_email}.\n"
-        f"Candidates: {json.dumps(candidates)}"
-    )
-    resp = llm.invoke(prompt).content
+def choose_id(name_or_email: str, candidates: list, kind: str, allow_llm: bool = True) -> tuple[int | None, bool]:
+    # Rank locally first; an unambiguous match skips the LLM, otherwise it only sees the
+    # top candidates that fit the prompt token budget. Returns (id, whether the LLM was called).
+    ranked = rank_candidates(name_or_email, candidates, kind, settings.agent_choose_top_k)
+    winner = clear_winner(ranked, settings.agent_choose_min_score, settings.agent_choose_margin)
+    if winner is not None:
+        LLM_SKIPPED.inc(purpose=f"choose_{kind}")
+        return winner[CANDIDATE_KINDS[kind][0]], False
+    if not allow_llm or not ranked:
+        return None, False
+    prompt, _, tokens = build_choice_prompt(name_or_email, ranked, kind, settings.agent_choose_token_budget)
+    LLM_PROMPT_TOKENS.observe(tokens, purpose=f"choose_{kind}")
+    resp = get_llm(GROQ_MODEL).invoke(prompt).content
     data = _extract_json(resp)
-    return data.get('id') or data.get(f'{kind[:-1]}_id')
+    return data.get('id') or data.get(f'{kind[:-1]}_id'), True
+
+def llm_choose_id(name_or_email: str, candidates: list, kind: str) -> int | None:
+    return choose_id(name_or_email, candidates, kind)[0]
+
+# Per-turn LLM budget: the guard node resets it at turn entry, parse_input meters each call against it
+def _within_budget(state: AgentState, used: int) -> bool:
+    return (state.get('llm_calls') or 0) + used < (state.get('llm_budget') or settings.agent_llm_budget)
+
+def guard_node(state: AgentState) -> dict:
+    text = state['messages'][-1].content if state.get('messages') else ''
+    if not (text or '').strip():
+        return {"llm_calls": 0, "llm_budget": settings.agent_llm_budget, "messages": [AIMessage(content="Tell me a doctor, date or time you're interested in.")]}
+    return {"llm_calls": 0, "llm_budget": settings.agent_llm_budget}
+
+def decide_after_guard(state: AgentState):
+    text = state['messages'][-1].content if state.get('messages') else ''
+    return 'parse' if (text or '').strip() else END
+
+# Resolve a parsed doctor name / patient email to an id: direct lookup first, then local ranking, then the LLM if allowed
+def _resolve_doctor(name: str, allow_llm: bool) -> dict:
+    did = get_doctor_id(name)
+    if did:
+        return {'doctor_id': did}
+    doc_list = fetch_doctors()
+    sel, used = choose_id(name, doc_list, "doctors", allow_llm)
+    if not sel:
+        return {'llm_used': int(used)}
+    return {'llm_used': int(used), 'doctor_id': sel, 'doctor_name': next((d['name'] for d in doc_list if d['doctor_id'] == sel), name)}
+
+def _visit_context(ctx: dict | None) -> dict:
+    # New vs returning decides the visit length the booking will need
+    if not ctx or ctx.get('visit_minutes') is None:
+        return {}
+    return {'returning_patient': bool(ctx.get('returning')), 'visit_minutes': ctx['visit_minutes']}
+
+def _resolve_patient(email: str, allow_llm: bool) -> dict:
+    ctx = get_patient_context(email)
+    if ctx:
+        return {'patient_id': ctx['patient_id'], **_visit_context(ctx)}
+    pat_list = fetch_patients()
+    sel, used = choose_id(email, pat_list, "patients", allow_llm)
+    if not sel:
+        return {'llm_used': int(used)}
+    chosen = next((p['email'] for p in pat_list if p['patient_id'] == sel), None)
+    return {'llm_used': int(used), 'patient_id': sel, 'patient_email': chosen or email, **_visit_context(get_patient_context(chosen) if chosen else None)}
+
+_lookup_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent-lookup")
+
+def _run_lookups(lookups: list) -> list[dict]:
+    if len(lookups) < 2:
+        return [fn() for fn in lookups]
+    # copy_context keeps the turn's trace span and request metrics attached to the worker threads
+    futures = [_lookup_pool.submit(contextvars.copy_context().run, fn) for fn in lookups]
+    return [f.result() for f in futures]
 
 # Update parse_input to use llm_parse
 
 def parse_input(state: AgentState) -> dict:
     query = state['messages'][-1].content
-    parsed = llm_parse(query)
-    print("Parsed:", parsed)
-
-    changes: dict = {}
+    # LLM calls are metered against the budget the guard node set for this turn
+    used = 0
+    if _within_budget(state, used):
+        parsed = llm_parse(query)
+        used += 1
+    else:
+        parsed = {}
+    log.debug("Parsed: %s", parsed)
+
+    changes: dict = {'need_info': False}
+    # Doctor and patient resolution (direct lookup, then LLM pick from the list) are independent,
+    # so they run side by side; the turn waits for the slower one rather than both in sequence
+    lookups = []
+    remaining = (state.get('llm_budget') or settings.agent_llm_budget) - (state.get('llm_calls') or 0) - used
     if parsed.get("doctor_name"):
         changes['doctor_name'] = parsed["doctor_name"]
-        did = get_doctor_id(parsed["doctor_name"])
-        if did:
-            changes['doctor_id'] = did
+        lookups.append(functools.partial(_resolve_doctor, parsed["doctor_name"], remaining > 0))
+    if parsed.get("patient_email"):
+        changes['patient_email'] = parsed["patient_email"]
+        # Doctor fallback keeps priority when only one LLM call is left
+        lookups.append(functools.partial(_resolve_patient, parsed["patient_email"], remaining > (1 if parsed.get("doctor_name") else 0)))
+    for resolved in _run_lookups(lookups):
+        used += resolved.pop('llm_used', 0)
+        changes.update(resolved)
     if parsed.get("intent"):
         changes['intent'] = parsed["intent"]
+    if parsed.get("specialization"):
+        changes['specialization'] = parsed["specialization"]
     if parsed.get("date"):
         changes['date'] = parsed["date"]
     if parsed.get("time_period"):
         changes['time_period'] = parsed["time_period"]
     if parsed.get("start_time"):
         changes['start_time'] = parsed["start_time"]
-    if parsed.get("patient_email"):
-        changes['patient_email'] = parsed["patient_email"]
-        pid = get_patient_id(parsed["patient_email"])
-        if pid:
-            changes['patient_id'] = pid
     if parsed.get("reason"):
         changes['reason'] = parsed["reason"]
 
@@ -299,18 +367,9 @@ def parse_input(state: AgentState) -> dict:
                     changes['date'] = today.strftime("%Y-%m-%d")
         # Handle 'next week' → next Monday, override if model produced an irrelevant past date
         if 'next week' in ql:
-            dow = today.weekday()  # Monday=0
-            days_until_next_monday = (7 - dow) % 7 or 7
-            next_monday = today + timedelta(days=days_until_next_monday)
-            if not changes.get('date'):
-                changes['date'] = next_monday.strftime("%Y-%m-%d")
-            else:
-                try:
-                    dval = datetime.strptime(changes['date'], "%Y-%m-%d").date()
-                    if dval < next_monday:
-                        changes['date'] = next_monday.strftime("%Y-%m-%d")
-                except Exception:
-                    changes['date'] = next_monday.strftime("%Y-%m-%d")
+            next_monday = parse_date('next week', today)
+            if not changes.get('date') or changes['date'] < next_monday:
+                changes['date'] = next_monday
     except Exception:
         pass
 
@@ -333,28 +392,12 @@ def parse_input(state: AgentState) -> dict:
     if start_time_val and not end_time_val:
         try:
             start_dt = datetime.strptime(start_time_val, "%H:%M")
-            end_dt = start_dt + timedelta(minutes=30)
+            end_dt = start_dt + timedelta(minutes=changes.get('visit_minutes') or state.get('visit_minutes') or 30)
             changes['end_time'] = end_dt.strftime("%H:%M")
         except Exception:
             pass
 
-    # If parsed doctor_name yields no ID, try list-based selection
-    if parsed.get("doctor_name") and not changes.get('doctor_id'):
-        # Try list-based selection
-        doc_list = fetch_doctors()
-        sel = llm_choose_id(parsed["doctor_name"], doc_list, "doctors")
-        if sel:
-            changes['doctor_id'] = sel
-            changes['doctor_name'] = next((d['name'] for d in doc_list if d['doctor_id'] == sel), parsed['doctor_name'])
-
-    # If parsed patient_email yields no ID, try list-based selection
-    if parsed.get("patient_email") and not changes.get('patient_id'):
-        pat_list = fetch_patients()
-        sel = llm_choose_id(parsed["patient_email"], pat_list, "patients")
-        if sel:
-            changes['patient_id'] = sel
-            changes['patient_email'] = next((p['email'] for p in pat_list if p['patient_id'] == sel), parsed.get('patient_email'))
-
+    changes['llm_calls'] = (state.get('llm_calls') or 0) + used
     effective = {**state, **changes}
     # If the intent is to list doctors' availability, we don't require a specific doctor_id
     if (effective.get('intent') or '') == 'list_doctors':
@@ -378,23 +421,26 @@ def parse_input(state: AgentState) -> dict:
 # Period filtering function
 
 def _match_period(slot_start: str, period: str) -> bool:
+    return in_period(slot_start, period)
+
+# Helper to fetch next 7 days availability for a doctor
+def get_next_7_days(doctor_id: int, start_date: str):
     try:
-        hour = int(slot_start.split(':')[0])
-        p = (period or '').lower()
-        if p == 'morning':
-            return hour < 12
-        if p == 'afternoon':
-            return 12 <= hour < 17
-        if p == 'evening':
-            return hour >= 17
+        response = http_session.get(f"{BASE_URL}/availability_next_days/{doctor_id}/{start_date}/7")
+        if response.status_code == 200:
+            return response.json()
     except Exception:
         pass
-    return True
+    return []
 
-# Helper to fetch next 7 days availability for a doctor
-def get_next_7_days(doctor_id: int, start_date: str):
+# Soonest options across doctors in one request (server-side first-fit search)
+def get_earliest_available(start_date: str, days: int = 7, period: str | None = None, specialization: str | None = None, patient_id: int | None = None, k: int = 5, per_doctor: int | None = None):
+    params = {"start_date": start_date, "days": days, "k": k}
+    for key, val in (("period", period), ("specialization", specialization), ("patient_id", patient_id), ("per_doctor", per_doctor)):
+        if val:
+            params[key] = val
     try:
-        response = requests.get(f"{BASE_URL}/availability_next_days/{doctor_id}/{start_date}/7")
+        response = http_session.get(f"{BASE_URL}/earliest_available", params=params)
         if response.status_code == 200:
             return response.json()
     except Exception:
@@ -415,12 +461,13 @@ def book_node(state: AgentState):
         return {"messages": [AIMessage(content=f"Missing information for booking: {', '.join(missing)}. Please provide {ask}.")], "need_info": True}
     start_time = f"{state['start_time']}:00" if len(state['start_time'].split(':')) == 2 else state['start_time']
     end_time = f"{state['end_time']}:00" if state.get('end_time') and len(state['end_time'].split(':')) == 2 else state.get('end_time')
-    if not end_time:
+    # A known patient's visit length (60 min for new patients under the standard policy) wins over the listed slot's end
+    if not end_time or state.get('visit_minutes'):
         try:
-            st = datetime.strptime(state['start_time'], "%H:%M") + timedelta(minutes=30)
+            st = datetime.strptime(start_time, "%H:%M:%S") + timedelta(minutes=state.get('visit_minutes') or 30)
             end_time = st.strftime("%H:%M:00")
         except Exception:
-            end_time = "00:30:00"
+            end_time = end_time or "00:30:00"
 
     booking = book_appointment(state['doctor_id'], state['date'], start_time, end_time, state.get('patient_id') or 1, state.get('reason') or "General Checkup")
 
@@ -494,7 +541,10 @@ def decide_to_book(state: AgentState):
 def list_availability_node(state: AgentState):
     date = state.get('date') or dt_date.today().strftime("%Y-%m-%d")
     period = state.get('time_period')
+    specialization = (state.get('specialization') or '').strip()
     doctors = fetch_doctors()
+    if specialization:
+        doctors = [d for d in doctors if specialization.lower() in (d.get('specialization') or '').lower()]
     results = []
     for d in doctors:
         try:
@@ -516,26 +566,12 @@ def list_availability_node(state: AgentState):
         except Exception:
             continue
     if not results:
-        # As a fallback, show the soonest next date with availability for each doctor
-        alt = []
-        for d in doctors:
-            nxt = get_next_7_days(d['doctor_id'], date)
-            if nxt:
-                # take the first date that has slots matching period if provided
-                chosen = None
-                for day in nxt:
-                    day_slots = day.get('slots', [])
-                    if period:
-                        day_slots = [s for s in day_slots if _match_period(str(s.get('start_time','00:00:00')), period)]
-                    if day_slots:
-                        chosen = {"date": day.get('date'), "slot": day_slots[0]}
-                        break
-                if chosen:
-                    alt.append({
-                        "doctor_id": d['doctor_id'],
-                        "doctor_name": d.get('name', ''),
-                        "next_available": chosen
-                    })
+        # As a fallback, show each doctor's soonest slot in the next 7 days (one search, not one call per doctor)
+        alt = [{
+            "doctor_id": o['doctor_id'],
+            "doctor_name": o.get('doctor_name', ''),
+            "next_available": {"date": o['date'], "slot": {"start_time": o['start_time'], "end_time": o['end_time']}}
+        } for o in get_earliest_available(date, 7, period, specialization, state.get('patient_id'), k=min(max(len(doctors), 1), 100), per_doctor=1)]
         if not alt:
             return {"messages": [AIMessage(content=f"No doctors have availability on {date} or the next 7 days.")],
                     "ui": {"type": "alternatives", "alternatives": []}} 
@@ -557,16 +593,20 @@ def decide_next_action(state: AgentState):
 
 # Update graph
 workflow = StateGraph(AgentState)
-workflow.add_node("parse", parse_input)
-workflow.add_node("list", list_availability_node)
-workflow.add_node("check", check_availability_node)
-workflow.add_node("book", book_node)
-workflow.add_node("clarify", lambda state: {"messages": [AIMessage(content="Please provide the missing details so I can proceed.")]})
-
-workflow.set_entry_point("parse")
+workflow.add_node("guard", timed_node("guard", guard_node))
+workflow.add_node("parse", timed_node("parse", parse_input))
+workflow.add_node("list", timed_node("list", list_availability_node))
+workflow.add_node("check", timed_node("check", check_availability_node))
+workflow.add_node("book", timed_node("book", book_node))
+# Clarification ends the turn: parse already asked for the missing fields, and re-parsing the
+# same message would only repeat the LLM call until recursion_limit
+workflow.add_node("clarify", timed_node("clarify", lambda state: {"need_info": True}))
+
+workflow.set_entry_point("guard")
+workflow.add_conditional_edges("guard", decide_after_guard, {"parse": "parse", END: END})
 workflow.add_conditional_edges("parse", decide_next_action, {"list": "list", "check": "check", "clarify": "clarify"})
 workflow.add_conditional_edges("check", decide_to_book, {"book": "book", END: END})
-workflow.add_edge("clarify", "parse")
+workflow.add_edge("clarify", END)
 workflow.add_edge("book", END)
 
 app = workflow.compile()
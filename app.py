@@ -1,7 +1,7 @@
-from fastapi import FastAPI, HTTPException, Depends, Body
-from sqlalchemy import create_engine, Column, Integer, String, Date, Time, Boolean, Text, ForeignKey, DateTime, func as sa_func
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Response
+from sqlalchemy import Column, Integer, String, Date, Time, Boolean, Text, ForeignKey, DateTime, func as sa_func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pydantic import BaseModel
 import os
@@ -9,13 +9,18 @@ import json
 from datetime import date, time as dt_time, datetime, timedelta
 from typing import List
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
-import requests
-from langchain_groq import ChatGroq
+from app.config import settings
+from app.db import get_db, pool_metrics
+from app.services.history_store import get_history_store
+from app.services.temporal import PERIODS, parse_date, parse_time
+from app.services.report_cache import cached_query as cached_report_query, report_cache
+from app.services.availability import earliest_slots, free_slots, materialize_slot
+from app.services.booking import get_policy, is_returning_patient
+from app.services.visit_summary import get_summary
+from app.integrations.llm import get_llm
+from app.metrics import MetricsMiddleware, metrics_response, timed_external
+from app.tracing import start_trace
 import re
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from langchain_core.messages import HumanMessage
 
 # Patient agent app (lazy import to allow backend up without GROQ env)
 patient_agent_app = None
@@ -30,42 +35,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency, DB query counts and LLM/HTTP time (X-DB-Queries, Server-Timing headers)
+app.add_middleware(MetricsMiddleware, app_name="api")
 
-# Database connection
-DATABASE_URL = "xxx"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Database connection: shares the engine/pool configured in app/db.py (DATABASE_URL, DB_POOL_*)
+# Models below mirror create_tables.sql, so they keep their own declarative base
 Base = declarative_base()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# SQLite for prompt history / notifications
-HISTORY_DB = "prompt_history.db"
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
 
-def init_history_db():
-    conn = sqlite3.connect(HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS prompts (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT, prompt TEXT, response TEXT, created_at TEXT)")
-    cur.execute("CREATE TABLE IF NOT EXISTS notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, channel TEXT, message TEXT, created_at TEXT)")
-    conn.commit()
-    conn.close()
+@app.get("/admin/db/pool")
+def db_pool_metrics():
+    return pool_metrics()
 
-init_history_db()
+# SQLite for prompt history / notifications (pooled connections + batched writer)
+history_store = get_history_store()
 
 SCOPES = ['https://www.googleapis.com/auth/calendar', 'https://www.googleapis.com/auth/gmail.send']
 
+# Google client libraries are imported on first use; they dominate cold start otherwise
+def _google_service(name: str, version: str):
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
+    creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+    return build(name, version, credentials=creds)
+
+@timed_external("gmail", "send")
 def gmail_send(to_email: str, subject: str, body: str):
     try:
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
         from email.mime.text import MIMEText
         import base64
-        gmail = build('gmail', 'v1', credentials=creds)
+        gmail = _google_service('gmail', 'v1')
         msg = MIMEText(body)
         msg['to'] = to_email
         msg['subject'] = subject
@@ -74,10 +76,10 @@ def gmail_send(to_email: str, subject: str, body: str):
     except Exception:
         pass
 
+@timed_external("google_calendar", "insert")
 def calendar_create(summary: str, start_iso: str, end_iso: str, attendee: str | None = None):
     try:
-        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        cal = build('calendar', 'v3', credentials=creds)
+        cal = _google_service('calendar', 'v3')
         event = {
             'summary': summary,
             'start': {'dateTime': start_iso, 'timeZone': 'UTC'},
@@ -89,8 +91,22 @@ def calendar_create(summary: str, start_iso: str, end_iso: str, attendee: str |
     except Exception:
         pass
 
+# Bind real date/time objects: SQLite's Date/Time types reject strings (Postgres casts them)
+def _as_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+
+def _as_time(value: str) -> dt_time:
+    try:
+        return dt_time.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time")
+
 class AvailabilityResponse(BaseModel):
-    availability_id: int
+    # None for template slots that have no row until booked
+    availability_id: int | None
     available_date: date
     start_time: dt_time
     end_time: dt_time
@@ -98,12 +114,8 @@ class AvailabilityResponse(BaseModel):
 
 @app.get("/availability/{doctor_id}/{date}", response_model=list[AvailabilityResponse])
 def get_availability(doctor_id: int, date: str, db=Depends(get_db)):
-    availabilities = db.query(DoctorAvailability).filter(
-        DoctorAvailability.doctor_id == doctor_id,
-        DoctorAvailability.available_date == date,
-        DoctorAvailability.is_booked == False
-    ).all()
-    return availabilities
+    day = _as_date(date)
+    return [{**s, "available_date": day, "is_booked": False} for s in free_slots(db, doctor_id, day).get(day, [])]
 
 @app.get("/doctor_id/{doctor_name}")
 def get_doctor_id(doctor_name: str, db=Depends(get_db)):
@@ -123,14 +135,24 @@ def get_doctor_id(doctor_name: str, db=Depends(get_db)):
 def get_patient_id(patient_email: str, db=Depends(get_db)):
     patient = db.query(Patients).filter(sa_func.lower(Patients.email) == patient_email.lower()).first()
     if patient:
-        return {"patient_id": patient.patient_id}
+        # Visit history for the agent's patient context, from the cached patient_visit_summary row
+        summary = get_summary(db, patient.patient_id) or {}
+        returning = bool(summary.get("visit_count"))
+        return {
+            "patient_id": patient.patient_id,
+            "returning": returning,
+            "visit_count": summary.get("visit_count") or 0,
+            "last_visit": summary.get("last_visit"),
+            "last_doctor_id": summary.get("last_doctor_id"),
+            "visit_minutes": get_policy().minutes(returning),
+        }
     raise HTTPException(status_code=404, detail="Patient not found")
 
 # Simple list endpoints (no response_model to avoid schema issues)
 @app.get("/doctors")
 def list_doctors(db=Depends(get_db)):
     rows = db.query(Doctors).all()
-    return [{"doctor_id": d.doctor_id, "name": d.name} for d in rows]
+    return [{"doctor_id": d.doctor_id, "name": d.name, "specialization": d.specialization} for d in rows]
 
 @app.get("/patients")
 def list_patients(db=Depends(get_db)):
@@ -145,25 +167,17 @@ class BookRequest(BaseModel):
 
 @app.post("/book/{doctor_id}/{date}")
 def book_appointment(doctor_id: int, date: str, request: BookRequest, db=Depends(get_db)):
-    availability = db.query(DoctorAvailability).filter(
-        DoctorAvailability.doctor_id == doctor_id,
-        DoctorAvailability.available_date == date,
-        DoctorAvailability.start_time == request.start_time,
-        DoctorAvailability.end_time == request.end_time,
-        DoctorAvailability.is_booked == False
-    ).first()
-
-    if not availability:
+    day, start, end = _as_date(date), _as_time(request.start_time), _as_time(request.end_time)
+    # Claims an explicit free row, or materializes a booked row from the doctor's schedule template
+    if materialize_slot(db, doctor_id, day, start, end) is None:
         raise HTTPException(status_code=400, detail="Slot not available")
 
-    availability.is_booked = True
-
     appointment = Appointments(
         doctor_id=doctor_id,
         patient_id=request.patient_id,
-        appointment_date=date,
-        start_time=request.start_time,
-        end_time=request.end_time,
+        appointment_date=day,
+        start_time=start,
+        end_time=end,
         reason=request.reason,
         status='Scheduled'
     )
@@ -189,21 +203,29 @@ def availability_next_days(doctor_id: int, start_date: str, days: int, db=Depend
         base = datetime.strptime(start_date, "%Y-%m-%d").date()
     except Exception:
         return []
-    out = []
-    for i in range(days):
-        d = (base + timedelta(days=i)).isoformat()
-        slots = db.query(DoctorAvailability).filter(
-            DoctorAvailability.doctor_id == doctor_id,
-            DoctorAvailability.available_date == d,
-            DoctorAvailability.is_booked == False
-        ).all()
-        if slots:
-            out.append({"date": d, "slots": [{
-                "start_time": str(s.start_time),
-                "end_time": str(s.end_time),
-                "is_booked": s.is_booked
-            } for s in slots]})
-    return out
+    if days <= 0:
+        return []
+    by_day = free_slots(db, doctor_id, base, base + timedelta(days=days - 1))
+    return [{"date": d.isoformat(), "slots": [{
+        "start_time": str(s["start_time"]),
+        "end_time": str(s["end_time"]),
+        "is_booked": False
+    } for s in slots]} for d, slots in by_day.items()]
+
+@app.get("/earliest_available")
+def earliest_available(specialization: str | None = None, period: str | None = None, patient_id: int | None = None, minutes: int | None = None,
+                       start_date: str | None = None, days: int = 14, k: int = 5, per_doctor: int | None = None, db=Depends(get_db)):
+    # "Soonest slot with any pediatrician": k earliest options across matching doctors in one call.
+    # Visit length follows the booking policy for this patient (new patients when unknown) unless given.
+    base = _as_date(start_date) if start_date else date.today()
+    if not 1 <= days <= 92 or not 1 <= k <= 100 or (minutes is not None and not 5 <= minutes <= 480):
+        raise HTTPException(status_code=400, detail="Need 1 <= days <= 92, 1 <= k <= 100 and 5 <= minutes <= 480")
+    if period and period.lower() not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIODS)}")
+    if minutes is None:
+        minutes = get_policy().minutes(patient_id is not None and is_returning_patient(db, patient_id))
+    options = earliest_slots(db, minutes, base, days, k, specialization=specialization, period=period, per_doctor=per_doctor)
+    return [{**o, "date": o["date"].isoformat(), "start_time": str(o["start_time"]), "end_time": str(o["end_time"])} for o in options]
 
 # Stats endpoints
 @app.get("/stats/appointments_count")
@@ -298,30 +320,59 @@ def symptom_count(keyword: str, doctor_id: int | None = None, start_date: str |
     if doctor_id:
         q = q.filter(Appointments.doctor_id == doctor_id)
     if start_date:
-        q = q.filter(Appointments.appointment_date >= start_date)
+        q = q.filter(Appointments.appointment_date >= _as_date(start_date))
     if end_date:
-        q = q.filter(Appointments.appointment_date <= end_date)
+        q = q.filter(Appointments.appointment_date <= _as_date(end_date))
     q = q.filter(sa_func.lower(PatientReports.symptoms).like(f"%{keyword.lower()}%"))
     return {"keyword": keyword, "count": q.count()}
 
+# Unified report query: metrics x filters x range x group_by compiled into one aggregate (app/services/report_query.py)
+@app.post("/stats/query")
+def stats_query(response: Response, payload: dict = Body(...), db=Depends(get_db)):
+    try:
+        result, hit = cached_report_query(db, payload)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["X-Cache"] = "hit" if hit else "miss"
+    return result
+
+@app.get("/stats/cache")
+def stats_cache():
+    return report_cache.stats()
+
 # Prompt history endpoints
 @app.post("/history/log")
-def history_log(role: str = Body(...), prompt: str = Body(...), response: str = Body("")):
-    conn = sqlite3.connect(HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO prompts(role, prompt, response, created_at) VALUES (?,?,?,?)", (role, prompt, response, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
+def history_log(role: str = Body(...), prompt: str = Body(...), response: str = Body(""), doctor_id: int | None = Body(None)):
+    history_store.log_prompt(role, prompt, response, doctor_id)
     return {"status": "ok"}
 
+def _keyset_page(rows: list[dict], limit: int, response: Response) -> list[dict]:
+    # Keyset pagination: pass X-Next-Before-Id back as before_id for the next page
+    if len(rows) == limit and rows:
+        response.headers["X-Next-Before-Id"] = str(rows[-1]["id"])
+    return rows
+
 @app.get("/history")
-def history_list(limit: int = 50):
-    conn = sqlite3.connect(HISTORY_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, role, prompt, response, created_at FROM prompts ORDER BY id DESC LIMIT ?", (limit,))
-    rows = cur.fetchall()
-    conn.close()
-    return [{"id": r[0], "role": r[1], "prompt": r[2], "response": r[3], "created_at": r[4]} for r in rows]
+def history_list(response: Response, limit: int = Query(50, ge=1, le=500), before_id: int | None = None, role: str | None = None, doctor_id: int | None = None, start_date: str | None = None, end_date: str | None = None):
+    try:
+        rows = history_store.list_prompts(limit, before_id=before_id, role=role, doctor_id=doctor_id, start_date=start_date, end_date=end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    return _keyset_page(rows, limit, response)
+
+@app.get("/notifications/{user}")
+def notifications_inbox(user: str, response: Response, limit: int = Query(50, ge=1, le=500), before_id: int | None = None, channel: str | None = None):
+    rows = history_store.list_notifications(user, limit, before_id=before_id, channel=channel)
+    return _keyset_page(rows, limit, response)
+
+@app.post("/history/compact")
+def history_compact(retention_days: int | None = Body(None, embed=True)):
+    days = settings.history_retention_days if retention_days is None else retention_days
+    return {"archived": history_store.compact(days, settings.history_archive_dir)}
+
+@app.on_event("startup")
+def start_history_retention():
+    history_store.start_retention(settings.history_retention_days, settings.history_archive_dir, settings.history_compact_interval_hours * 3600)
 
 # Report agent trigger
 @app.post("/report")
@@ -332,18 +383,15 @@ def trigger_report(payload: dict = Body(...)):
     channel = payload.get("channel", "in_app")
     result = run_report(prompt, doctor_id, channel)
     # log history
-    history_log("doctor", prompt, result)
+    history_log("doctor", prompt, result, doctor_id)
     # store notification if in_app
     if channel == "in_app":
-        conn = sqlite3.connect(HISTORY_DB)
-        cur = conn.cursor()
-        cur.execute("INSERT INTO notifications(user, channel, message, created_at) VALUES (?,?,?,?)", (f"doctor:{doctor_id}", channel, result, datetime.utcnow().isoformat()))
-        conn.commit()
-        conn.close()
+        history_store.log_notification(f"doctor:{doctor_id}", channel, result)
     return {"result": result}
 
-# NLP parse endpoint
-llm_groq = ChatGroq(model="llama3-70b-8192")
+# NLP parse endpoint (client built on first request; LLM_BACKEND=stub replays fixtures)
+def _get_llm():
+    return get_llm("llama3-70b-8192")
 
 def _extract_json_py(text: str) -> dict:
     try:
@@ -363,33 +411,10 @@ def _extract_json_py(text: str) -> dict:
             return {}
 
 def _normalize_date_py(s: str | None) -> str | None:
-    if not s: return None
-    sl = re.sub(r"(\d+)(st|nd|rd|th)", r"\1", s.strip().lower())
-    try:
-        return datetime.strptime(sl, "%Y-%m-%d").date().isoformat()
-    except: pass
-    for fmt in ["%d %B %Y", "%B %d %Y", "%d %B", "%B %d", "%d-%m-%Y", "%d/%m/%Y"]:
-        try:
-            dt = datetime.strptime(sl.title(), fmt)
-            if "%Y" not in fmt: dt = dt.replace(year=datetime.utcnow().year)
-            return dt.date().isoformat()
-        except: pass
-    if sl=="tomorrow": return (datetime.utcnow().date()+timedelta(days=1)).isoformat()
-    if sl=="today": return datetime.utcnow().date().isoformat()
-    return None
+    return parse_date(s)
 
 def _normalize_time_py(s: str | None) -> str | None:
-    if not s: return None
-    t = s.strip().lower().replace(' ', '')
-    m = re.match(r"^(\d{1,2})(?::(\d{2}))?(am|pm)?$", t)
-    if m:
-        h = int(m.group(1)); mi=int(m.group(2) or 0); ap=m.group(3)
-        if ap=='pm' and h<12: h+=12
-        if ap=='am' and h==12: h=0
-        return f"{h:02d}:{mi:02d}:00"
-    if re.match(r"^\d{2}:\d{2}(:\d{2})?$", t):
-        return t if t.count(':')==2 else f"{t}:00"
-    return None
+    return parse_time(s)
 
 @app.post("/nlp/parse_booking")
 def nlp_parse_booking(payload: dict = Body(...), db=Depends(get_db)):
@@ -398,7 +423,7 @@ def nlp_parse_booking(payload: dict = Body(...), db=Depends(get_db)):
         "Return ONLY JSON with: doctor_name, date (YYYY-MM-DD or natural), start_time (HH:MM or HH:MM:SS).\n"
         f"Text: {text}"
     )
-    resp = llm_groq.invoke(prompt).content
+    resp = _get_llm().invoke(prompt).content
     data = _extract_json_py(resp)
     name = (data.get('doctor_name') or '').strip()
     dval = _normalize_date_py(data.get('date'))
@@ -450,6 +475,7 @@ def tool_whatsapp_send(payload: dict = Body(...)):
     phone_id = payload.get("phone_id") or os.getenv("WHATSAPP_PHONE_ID")
     if not (to and (message or template) and token and phone_id):
         raise HTTPException(status_code=400, detail="Missing to/message(or template)/token/phone_id")
+    import requests
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     url = f"https://graph.facebook.com/v22.0/{phone_id}/messages"
     if template and not message:
@@ -463,11 +489,13 @@ def tool_whatsapp_send(payload: dict = Body(...)):
         raise HTTPException(status_code=500, detail=f"whatsapp_send failed: {e}")
 
 # Helper for WhatsApp from server-side flows
+@timed_external("whatsapp", "send_text")
 def _whatsapp_send_text(to: str, message: str, token: str | None = None, phone_id: str | None = None) -> tuple[int, str]:
     token = token or os.getenv("WHATSAPP_TOKEN")
     phone_id = phone_id or os.getenv("WHATSAPP_PHONE_ID")
     if not (to and message and token and phone_id):
         return (400, "missing to/message/token/phone_id")
+    import requests
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     url = f"https://graph.facebook.com/v22.0/{phone_id}/messages"
     payload_out = {"messaging_product":"whatsapp","to":to,"type":"text","text":{"body":message[:1000]}}
@@ -567,16 +595,22 @@ def patient_agent_chat(payload: dict = Body(...)):
         'reason': client_state.get('reason'),
         'need_info': client_state.get('need_info', False),
     }
+    from langchain_core.messages import HumanMessage
     text = payload.get("message", "")
     state['messages'].append(HumanMessage(content=text))
     try:
-        output = patient_agent_app.invoke(state, {"recursion_limit": 50})
+        # One trace per turn: spans for each graph node, LLM call and loopback HTTP call
+        with start_trace("agent.patient_chat", **{"agent.message_chars": len(text)}) as trace:
+            output = patient_agent_app.invoke(state, {"recursion_limit": 50})
         # last agent message
         msg = output.get('messages', [])[-1].content if output.get('messages') else ""
         # Return updated state (excluding messages for size) and agent reply
         out_state = {k: v for k, v in output.items() if k != 'messages' and k != 'ui'}
         ui = output.get('ui')
-        return {"message": msg, "state": out_state, "ui": ui}
+        out = {"message": msg, "state": out_state, "ui": ui}
+        if payload.get("debug") or settings.trace_debug:
+            out["debug"] = trace.summary()
+        return out
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent error: {e}")
 
@@ -4,10 +4,45 @@ from pydantic import Field
 class Settings(BaseSettings):
 	app_env: str = Field(default="development")
 	database_url: str = Field(default="sqlite:///./clinic.db")
+	db_pool_size: int = Field(default=5)
+	db_max_overflow: int = Field(default=10)
+	db_pool_timeout: float = Field(default=30.0)
+	db_pool_recycle: int = Field(default=1800)
+	db_statement_timeout_ms: int | None = None
+	db_pgbouncer: bool = Field(default=False)
+	db_n_plus_one_threshold: int = Field(default=10)
 	timezone: str = Field(default="UTC")
+	auto_migrate: bool = Field(default=False)
 
 	groq_api_key: str | None = None
 	groq_model: str = Field(default="llama3-8b-8192")
+	llm_backend: str = Field(default="groq")
+	llm_fixtures: str = Field(default="fixtures/llm.jsonl")
+	llm_stub_latency_ms: float = Field(default=0.0)
+	llm_stub_jitter_ms: float = Field(default=0.0)
+	llm_stub_replay_latency: bool = Field(default=False)
+	llm_stub_strict: bool = Field(default=False)
+	# Max LLM calls per patient-agent turn (parse + doctor/patient disambiguation)
+	agent_llm_budget: int = Field(default=3)
+	# llm_choose_id: local pre-ranking, top-k capped by a prompt token budget; skip the LLM on a clear winner
+	agent_choose_top_k: int = Field(default=25)
+	agent_choose_token_budget: int = Field(default=1500)
+	agent_choose_min_score: float = Field(default=0.9)
+	agent_choose_margin: float = Field(default=0.15)
+
+	# /stats/query result cache; ranges that end before today get the longer historical TTL
+	report_cache_size: int = Field(default=1024)
+	report_cache_ttl_seconds: float = Field(default=60.0)
+	report_cache_historical_ttl_seconds: float = Field(default=3600.0)
+	# How often each process checks the shared stamp that bulk loads bump (cache_versions)
+	report_cache_version_check_seconds: float = Field(default=5.0)
+
+	# Visit length rule (app/services/booking.py POLICIES) and minutes kept clear around every booking
+	booking_duration_policy: str = Field(default="standard")
+	booking_buffer_minutes: int = Field(default=0)
+	# In-process cache of patient_visit_summary rows (new vs returning); writes in this process invalidate
+	visit_summary_cache_size: int = Field(default=4096)
+	visit_summary_ttl_seconds: float = Field(default=300.0)
 
 	google_token_file: str | None = Field(default="token.json")
 
@@ -20,6 +55,17 @@ class Settings(BaseSettings):
 	celery_broker_url: str = Field(default="redis://localhost:6379/0")
 	celery_result_backend: str = Field(default="redis://localhost:6379/1")
 
+	# Agent tracing: OTLP/JSON lines file path or http(s) OTLP collector endpoint (e.g. http://localhost:4318/v1/traces)
+	trace_export: str | None = None
+	trace_service_name: str = Field(default="clinic-agent")
+	trace_debug: bool = Field(default=False)
+
+	history_db: str = Field(default="prompt_history.db")
+	history_batch_size: int = Field(default=200)
+	history_retention_days: int = Field(default=365)
+	history_archive_dir: str = Field(default="exports/history_archive")
+	history_compact_interval_hours: float = Field(default=24.0)
+
 	class Config:
 		env_file = ".env"
 		env_file_encoding = "utf-8"
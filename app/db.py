@@ -1,12 +1,191 @@
-from sqlalchemy import create_engine
+import time
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
 from app.config import settings
+from app.metrics import instrument_engine
 
-engine = create_engine(settings.database_url, pool_pre_ping=True, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
+
+class PoolStats:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.checkouts = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+		self.timeouts = 0
+
+	def record(self, seconds: float, timed_out: bool = False):
+		with self._lock:
+			self.checkouts += 1
+			self.wait_total += seconds
+			self.wait_max = max(self.wait_max, seconds)
+			if timed_out:
+				self.timeouts += 1
+
+
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+# Times how long callers wait for a pooled connection (queue wait + connect)
+class _TimedPoolMixin:
+	stats = pool_stats
+
+	def connect(self):
+		t0 = time.perf_counter()
+		try:
+			conn = super().connect()
+		except PoolTimeoutError:
+			self.stats.record(time.perf_counter() - t0, timed_out=True)
+			raise
+		self.stats.record(time.perf_counter() - t0)
+		return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+	pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+	pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+	stats = async_pool_stats
+
+
+class TimedAsyncNullPool(_TimedPoolMixin, NullPool):
+	stats = async_pool_stats
+
+
+def _is_sqlite(url: str) -> bool:
+	return url.startswith("sqlite")
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+	queue_pool = TimedAsyncQueuePool if is_async else TimedQueuePool
+	null_pool = TimedAsyncNullPool if is_async else TimedNullPool
+	if _is_sqlite(url):
+		opts: dict = {"connect_args": {"check_same_thread": False}}
+		if make_url(url).database not in (None, "", ":memory:"):
+			opts["poolclass"] = queue_pool
+			opts.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow, pool_timeout=settings.db_pool_timeout)
+		return opts
+	opts = {"pool_pre_ping": True, "connect_args": {}}
+	if settings.db_pgbouncer:
+		# PgBouncer (transaction pooling) owns pooling; keep no idle connections here
+		opts["poolclass"] = null_pool
+		if "asyncpg" in url:
+			# Server-side prepared statements break under transaction pooling
+			opts["connect_args"].update(statement_cache_size=0, prepared_statement_cache_size=0)
+	else:
+		opts["poolclass"] = queue_pool
+		opts.update(
+			pool_size=settings.db_pool_size,
+			max_overflow=settings.db_max_overflow,
+			pool_timeout=settings.db_pool_timeout,
+			pool_recycle=settings.db_pool_recycle,
+		)
+	return opts
+
+
+def _install_statement_timeout(engine: Engine, timeout_ms: int):
+	if settings.db_pgbouncer:
+		# Session-level SETs leak across PgBouncer clients; scope to each transaction
+		@event.listens_for(engine, "begin")
+		def _set_local_timeout(conn):
+			conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+	else:
+		@event.listens_for(engine, "connect")
+		def _set_timeout(dbapi_conn, _record):
+			cur = dbapi_conn.cursor()
+			cur.execute(f"SET statement_timeout = {int(timeout_ms)}")
+			cur.close()
+
+
+def create_db_engine(url: str | None = None) -> Engine:
+	url = url or settings.database_url
+	eng = create_engine(url, **engine_options(url))
+	if settings.db_statement_timeout_ms and not _is_sqlite(url):
+		_install_statement_timeout(eng, settings.db_statement_timeout_ms)
+	return instrument_engine(eng)
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def async_database_url(url: str) -> str:
+	u = make_url(url)
+	if u.get_backend_name() == "sqlite":
+		return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+	if u.get_backend_name() == "postgresql":
+		return u.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+	return url
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+	# Built on first use so sync-only processes never import the asyncio drivers
+	global _async_engine, _async_sessionmaker
+	if _async_engine is None:
+		from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+		url = async_database_url(settings.database_url)
+		_async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+		if settings.db_statement_timeout_ms and not _is_sqlite(url):
+			_install_statement_timeout(_async_engine.sync_engine, settings.db_statement_timeout_ms)
+		instrument_engine(_async_engine)
+		_async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+	return _async_engine
+
+
+async def get_async_db():
+	get_async_engine()
+	async with _async_sessionmaker() as session:
+		yield session
+
+
+def pool_metrics(eng: Engine | None = None) -> dict:
+	eng = eng or engine
+	pool = eng.pool
+	stats = getattr(pool, "stats", None) or PoolStats()
+	out = {
+		"pool": type(pool).__name__,
+		"checkouts": stats.checkouts,
+		"wait_ms_total": round(stats.wait_total * 1000, 3),
+		"wait_ms_avg": round(stats.wait_total * 1000 / stats.checkouts, 3) if stats.checkouts else 0.0,
+		"wait_ms_max": round(stats.wait_max * 1000, 3),
+		"timeouts": stats.timeouts,
+	}
+	if isinstance(pool, QueuePool):
+		out.update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(), overflow=max(pool.overflow(), 0))
+	if eng is engine and _async_engine is not None:
+		out["async"] = pool_metrics(_async_engine.sync_engine)
+	return out
+
+
+def init_db():
+	# Explicit schema step (scripts/migrate.py); never run at import time
+	from app import models  # noqa: F401  registers tables on Base
+	from app.services.schedule import ensure_slot_key
+	from app.services.visit_summary import ensure_visit_summary
+	Base.metadata.create_all(bind=engine)
+	with engine.begin() as conn:
+		ensure_slot_key(conn)
+		# create_all skips indexes added to tables that already exist
+		for table in Base.metadata.sorted_tables:
+			for ix in table.indexes:
+				ix.create(conn, checkfirst=True)
+		ensure_visit_summary(conn)
+
+
 def get_db():
 	db = SessionLocal()
 	try:
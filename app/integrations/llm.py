@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from types import SimpleNamespace
+from app.config import settings
+from app.metrics import observe_llm
+from app.tracing import span, CLIENT
+
+# Backends share the one method callers use: invoke(prompt) -> object with .content
+BACKENDS = ("groq", "stub", "record")
+
+
+def prompt_key(prompt) -> str:
+	text = prompt if isinstance(prompt, str) else str(prompt)
+	return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def load_fixtures(path: str) -> dict[str, dict]:
+	out: dict[str, dict] = {}
+	if not path or not os.path.exists(path):
+		return out
+	with open(path, encoding="utf-8") as f:
+		for line in f:
+			line = line.strip()
+			if not line:
+				continue
+			rec = json.loads(line)
+			# Last recording of a prompt wins, so re-recording refreshes a fixture
+			out[rec.get("key") or prompt_key(rec["prompt"])] = rec
+	return out
+
+
+class StubLLM:
+	# Replays recorded prompt -> response pairs with artificial latency; no network
+	backend = "stub"
+
+	def __init__(self, fixtures: str | dict | None = None, latency_ms: float = 0.0, jitter_ms: float = 0.0, replay_latency: bool = False, default: str | None = "{}", strict: bool = False):
+		self.fixtures = fixtures if isinstance(fixtures, dict) else load_fixtures(fixtures)
+		self.latency_ms = latency_ms
+		self.jitter_ms = jitter_ms
+		self.replay_latency = replay_latency
+		self.default = default
+		self.strict = strict
+		self.hits = 0
+		self.misses = 0
+		self._rng = random.Random(0)
+		self._lock = threading.Lock()
+
+	def add(self, prompt: str, response: str, latency_ms: float | None = None):
+		self.fixtures[prompt_key(prompt)] = {"prompt": prompt, "response": response, "latency_ms": latency_ms}
+
+	def invoke(self, prompt, **kwargs):
+		rec = self.fixtures.get(prompt_key(prompt))
+		with self._lock:
+			if rec is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+			jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+		if rec is None and (self.strict or self.default is None):
+			raise KeyError(f"No LLM fixture for prompt: {str(prompt)[:120]!r}")
+		delay = (rec or {}).get("latency_ms") if self.replay_latency else None
+		delay = (self.latency_ms if delay is None else delay) + jitter
+		if delay > 0:
+			time.sleep(delay / 1000)
+		if rec is None:
+			return SimpleNamespace(content=self.default, usage_metadata=None)
+		return SimpleNamespace(content=rec["response"], usage_metadata=rec.get("usage"))
+
+
+class RecordingLLM:
+	# Passes calls through to a real client and appends each exchange to a JSONL fixture file
+	backend = "record"
+
+	def __init__(self, inner, path: str, model: str | None = None):
+		self.inner = inner
+		self.path = path
+		self.model = model
+		self._lock = threading.Lock()
+
+	def invoke(self, prompt, **kwargs):
+		t0 = time.perf_counter()
+		resp = self.inner.invoke(prompt, **kwargs)
+		latency_ms = round((time.perf_counter() - t0) * 1000, 2)
+		text = prompt if isinstance(prompt, str) else str(prompt)
+		rec = {"key": prompt_key(text), "prompt": text, "response": resp.content, "model": self.model, "latency_ms": latency_ms, "usage": token_usage(text, resp)}
+		with self._lock:
+			os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+			with open(self.path, "a", encoding="utf-8") as f:
+				f.write(json.dumps(rec) + "\n")
+		return resp
+
+
+def estimate_tokens(text: str) -> int:
+	# ~4 characters per token for English/JSON on Llama-family tokenizers
+	return len(text or "") // 4
+
+
+def token_usage(prompt, resp) -> dict:
+	# Provider-reported usage when available (LangChain usage_metadata / Groq token_usage), else a chars/4 estimate
+	usage = getattr(resp, "usage_metadata", None)
+	if usage and "input_tokens" in usage:
+		return {"input_tokens": usage["input_tokens"], "output_tokens": usage.get("output_tokens", 0)}
+	meta = (getattr(resp, "response_metadata", None) or {}).get("token_usage") or {}
+	if "prompt_tokens" in meta:
+		return {"input_tokens": meta["prompt_tokens"], "output_tokens": meta.get("completion_tokens", 0)}
+	text = prompt if isinstance(prompt, str) else str(prompt)
+	return {"input_tokens": estimate_tokens(text), "output_tokens": estimate_tokens(resp.content), "estimated": True}
+
+
+class TimedLLM:
+	# Wraps any backend so every invoke lands in llm_call_duration_seconds and the request's LLM time
+	def __init__(self, client, model: str | None = None):
+		self.client = client
+		self.model = model
+		self.backend = getattr(client, "backend", "groq")
+
+	def invoke(self, prompt, **kwargs):
+		t0 = time.perf_counter()
+		try:
+			with span("llm.invoke", CLIENT, **{"llm.backend": self.backend, "llm.model": self.model}) as s:
+				resp = self.client.invoke(prompt, **kwargs)
+				if s is not None:
+					usage = token_usage(prompt, resp)
+					s.set(**{"llm.tokens_in": usage["input_tokens"], "llm.tokens_out": usage["output_tokens"], "llm.tokens_estimated": usage.get("estimated", False)})
+				return resp
+		finally:
+			observe_llm(time.perf_counter() - t0, self.backend, self.model)
+
+	def __getattr__(self, name):
+		return getattr(self.client, name)
+
+
+_clients: dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+_override = None
+
+
+def _groq(model: str):
+	from langchain_groq import ChatGroq
+	return ChatGroq(model=model, temperature=0.0)
+
+
+def get_llm(model: str | None = None, backend: str | None = None):
+	model = model or settings.groq_model
+	if _override is not None:
+		return TimedLLM(_override, model)
+	backend = (backend or settings.llm_backend).lower()
+	if backend not in BACKENDS:
+		raise ValueError(f"Unknown LLM backend '{backend}'. Expected one of: {', '.join(BACKENDS)}")
+	key = (backend, model if backend != "stub" else None)
+	with _clients_lock:
+		client = _clients.get(key)
+		if client is None:
+			if backend == "stub":
+				client = StubLLM(settings.llm_fixtures, settings.llm_stub_latency_ms, settings.llm_stub_jitter_ms, settings.llm_stub_replay_latency, strict=settings.llm_stub_strict)
+			elif backend == "record":
+				client = RecordingLLM(_groq(model), settings.llm_fixtures, model)
+			else:
+				client = _groq(model)
+			client = _clients[key] = TimedLLM(client, model)
+		return client
+
+
+def use_llm(client):
+	# Route every get_llm() call to one client (e.g. a StubLLM built in a test or benchmark)
+	global _override
+	_override = client
+
+
+def reset_llm():
+	# Drop cached clients and any override so a changed backend/fixture setting takes effect
+	global _override
+	with _clients_lock:
+		_clients.clear()
+	_override = None
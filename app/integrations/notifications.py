@@ -4,8 +4,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-import requests
 from app.config import settings
+from app.metrics import timed_external
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 
@@ -19,6 +19,7 @@ def _gmail_service():
 		return None
 
 
+@timed_external("gmail", "send")
 def send_email(to_email: str, subject: str, body: str) -> bool:
 	service = _gmail_service()
 	if not service:
@@ -34,6 +35,7 @@ def send_email(to_email: str, subject: str, body: str) -> bool:
 		return False
 
 
+@timed_external("gmail", "send_attachment")
 def send_email_with_attachment(to_email: str, subject: str, body: str, filepath: str) -> bool:
 	service = _gmail_service()
 	if not service:
@@ -47,7 +49,7 @@ def send_email_with_attachment(to_email: str, subject: str, body: str, filepath:
 			part = MIMEBase('application', 'octet-stream')
 			part.set_payload(f.read())
 			encoders.encode_base64(part)
-			part.add_header('Content-Disposition', f'attachment; filename="{filepath.split('/')[-1]}"')
+			part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(filepath)}"')
 			msg.attach(part)
 		raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
 		service.users().messages().send(userId='me', body={'raw': raw}).execute()
@@ -55,12 +57,14 @@ def send_email_with_attachment(to_email: str, subject: str, body: str, filepath:
 	except Exception:
 		return False
 
+@timed_external("whatsapp", "send_text")
 def whatsapp_send_text(message: str, to: str | None = None) -> tuple[int, str]:
 	token = settings.whatsapp_token
 	phone_id = settings.whatsapp_phone_id
 	to_num = to or settings.whatsapp_to
 	if not (token and phone_id and to_num):
 		return (400, 'missing-config')
+	import requests
 	headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 	payload = {"messaging_product":"whatsapp","to":to_num,"type":"text","text":{"body":message[:1000]}}
 	try:
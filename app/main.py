@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.db import engine, Base
+from app.db import init_db
 from app.routers import doctors, patients, appointments, admin
 from app.routers import nlp, reminders
 from app.routers import insurance
@@ -11,6 +11,7 @@ from app.routers import analytics
 from app.routers import reschedule
 from fastapi.responses import JSONResponse
 from app.logger import get_logger
+from app.metrics import MetricsMiddleware, metrics_response
 
 app = FastAPI(title="Clinic Scheduling API", version="1.0.0")
 log = get_logger("api")
@@ -22,9 +23,14 @@ app.add_middleware(
 	allow_methods=["*"],
 	allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, app_name="main")
 
-# Create tables on startup for quick demo; in production use Alembic
-Base.metadata.create_all(bind=engine)
+# Schema creation is an explicit step (python scripts/migrate.py); AUTO_MIGRATE=true
+# restores create-on-startup for quick demos without slowing every import
+@app.on_event("startup")
+def auto_migrate():
+	if settings.auto_migrate:
+		init_db()
 
 app.include_router(doctors.router)
 app.include_router(patients.router)
@@ -44,6 +50,11 @@ def root():
 	return {"status": "ok", "env": settings.app_env}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+	return metrics_response()
+
+
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
 	log.exception("Unhandled error: %s", exc)
@@ -0,0 +1,300 @@
+import re
+import time
+import threading
+import functools
+import contextvars
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from app.config import settings
+from app.logger import get_logger
+from app.tracing import span, CLIENT
+
+log = get_logger("metrics")
+
+# Seconds; covers sub-ms SQLite reads up to multi-second LLM/agent turns
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+	parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help_text: str, labels: tuple = ()):
+		self.name = name
+		self.help = help_text
+		self.labels = tuple(labels)
+		self._lock = threading.Lock()
+
+	def _key(self, labels: dict) -> tuple:
+		return tuple(labels.get(n, "") for n in self.labels)
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help_text: str, labels: tuple = ()):
+		super().__init__(name, help_text, labels)
+		self._values: dict[tuple, float] = {}
+
+	def inc(self, amount: float = 1.0, **labels):
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0.0) + amount
+
+	def value(self, **labels) -> float:
+		return self._values.get(self._key(labels), 0.0)
+
+	def render(self) -> list[str]:
+		with self._lock:
+			items = sorted(self._values.items())
+		return [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+		super().__init__(name, help_text, labels)
+		self.buckets = tuple(sorted(buckets))
+		# key -> [per-bucket counts..., +Inf count, sum]
+		self._values: dict[tuple, list] = {}
+
+	def observe(self, value: float, **labels):
+		key = self._key(labels)
+		with self._lock:
+			row = self._values.get(key)
+			if row is None:
+				row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+			for i, b in enumerate(self.buckets):
+				if value <= b:
+					row[i] += 1
+					break
+			else:
+				row[len(self.buckets)] += 1
+			row[-1] += value
+
+	def count(self, **labels) -> int:
+		row = self._values.get(self._key(labels))
+		return sum(row[:-1]) if row else 0
+
+	def render(self) -> list[str]:
+		with self._lock:
+			items = sorted((k, list(v)) for k, v in self._values.items())
+		les = [f'le="{b}"' for b in self.buckets] + ['le="+Inf"']
+		out = []
+		for key, row in items:
+			cumulative = 0
+			for i, le in enumerate(les):
+				cumulative += row[i]
+				out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+			out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {row[-1]}")
+			out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+		return out
+
+
+class Registry:
+	def __init__(self):
+		self._metrics: dict[str, _Metric] = {}
+		self._lock = threading.Lock()
+
+	def _get(self, cls, name: str, help_text: str, labels: tuple, **kw):
+		with self._lock:
+			m = self._metrics.get(name)
+			if m is None:
+				m = self._metrics[name] = cls(name, help_text, labels, **kw)
+			return m
+
+	def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+		return self._get(Counter, name, help_text, labels)
+
+	def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+		return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+	def render(self) -> str:
+		lines = []
+		for m in list(self._metrics.values()):
+			lines.append(f"# HELP {m.name} {m.help}")
+			lines.append(f"# TYPE {m.name} {m.kind}")
+			lines.extend(m.render())
+		return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_DURATION = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route", ("app", "method", "route", "status"))
+DB_QUERY_DURATION = REGISTRY.histogram("db_query_duration_seconds", "Duration of individual SQL statements", ("operation",))
+DB_QUERIES_PER_REQUEST = REGISTRY.histogram("db_queries_per_request", "SQL statements executed per HTTP request", ("app", "route"), buckets=COUNT_BUCKETS)
+DB_TIME_PER_REQUEST = REGISTRY.histogram("db_time_per_request_seconds", "Total SQL time per HTTP request", ("app", "route"))
+DB_N_PLUS_ONE = REGISTRY.counter("db_n_plus_one_total", "Requests that repeated one statement at least DB_N_PLUS_ONE_THRESHOLD times", ("app", "route"))
+LLM_DURATION = REGISTRY.histogram("llm_call_duration_seconds", "LLM invoke latency", ("backend", "model"))
+EXTERNAL_DURATION = REGISTRY.histogram("external_call_duration_seconds", "Outbound calls (Gmail, WhatsApp, agent loopback HTTP)", ("service", "operation"))
+LLM_PROMPT_TOKENS = REGISTRY.histogram("llm_prompt_tokens", "Estimated prompt tokens per LLM call", ("purpose",), buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192))
+LLM_SKIPPED = REGISTRY.counter("llm_calls_skipped_total", "LLM calls avoided because a local match was unambiguous", ("purpose",))
+REPORT_CACHE_REQUESTS = REGISTRY.counter("report_cache_requests_total", "Report query cache lookups", ("result",))
+REPORT_CACHE_INVALIDATIONS = REGISTRY.counter("report_cache_invalidations_total", "Report cache entries dropped by appointment/report writes")
+VISIT_SUMMARY_CACHE_REQUESTS = REGISTRY.counter("visit_summary_cache_requests_total", "Patient visit summary cache lookups", ("result",))
+AGENT_NODE_DURATION = REGISTRY.histogram("agent_node_duration_seconds", "LangGraph node execution time", ("node",))
+
+
+class RequestStats:
+	__slots__ = ("queries", "db_time", "llm_time", "llm_calls", "http_time", "statements", "_lock")
+
+	def __init__(self):
+		self.queries = 0
+		self.db_time = 0.0
+		self.llm_time = 0.0
+		self.llm_calls = 0
+		self.http_time = 0.0
+		self.statements: _Tally = _Tally()
+		self._lock = threading.Lock()
+
+	def server_timing(self) -> str:
+		return f"db;dur={self.db_time * 1000:.1f};desc=\"{self.queries} queries\", llm;dur={self.llm_time * 1000:.1f}, http;dur={self.http_time * 1000:.1f}"
+
+
+# Set by the middleware; threadpool endpoints and LangGraph workers see the same object via copied contexts
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+	return _current.get()
+
+
+def _add(field: str, seconds: float):
+	stats = _current.get()
+	if stats is not None:
+		with stats._lock:
+			setattr(stats, field, getattr(stats, field) + seconds)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+	t0 = time.perf_counter()
+	try:
+		yield
+	finally:
+		histogram.observe(time.perf_counter() - t0, **labels)
+
+
+def observe_llm(seconds: float, backend: str, model: str | None):
+	LLM_DURATION.observe(seconds, backend=backend, model=model or "")
+	stats = _current.get()
+	if stats is not None:
+		with stats._lock:
+			stats.llm_time += seconds
+			stats.llm_calls += 1
+
+
+def observe_http(seconds: float, service: str, operation: str):
+	EXTERNAL_DURATION.observe(seconds, service=service, operation=operation)
+	_add("http_time", seconds)
+
+
+def timed_external(service: str, operation: str):
+	# Decorator for outbound calls; counts toward the current request's http time
+	def wrap(fn):
+		@functools.wraps(fn)
+		def inner(*args, **kwargs):
+			t0 = time.perf_counter()
+			try:
+				with span(f"{service}.{operation}", CLIENT, **{"peer.service": service}):
+					return fn(*args, **kwargs)
+			finally:
+				observe_http(time.perf_counter() - t0, service, operation)
+		return inner
+	return wrap
+
+
+def timed_node(name: str, fn):
+	@functools.wraps(fn)
+	def inner(state):
+		with timed(AGENT_NODE_DURATION, node=name), span(f"node.{name}", **{"graph.node": name}):
+			return fn(state)
+	return inner
+
+
+# SQLAlchemy hooks
+_SPACE = re.compile(r"\s+")
+
+
+def _on_before_execute(conn, cursor, statement, parameters, context, executemany):
+	conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _on_after_execute(conn, cursor, statement, parameters, context, executemany):
+	starts = conn.info.get("query_start")
+	if not starts:
+		return
+	elapsed = time.perf_counter() - starts.pop()
+	op = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+	DB_QUERY_DURATION.observe(elapsed, operation=op)
+	stats = _current.get()
+	if stats is not None:
+		with stats._lock:
+			stats.queries += 1
+			stats.db_time += elapsed
+			stats.statements[_SPACE.sub(" ", statement)] += 1
+
+
+def instrument_engine(engine):
+	from sqlalchemy import event
+	target = getattr(engine, "sync_engine", engine)
+	if not event.contains(target, "before_cursor_execute", _on_before_execute):
+		event.listen(target, "before_cursor_execute", _on_before_execute)
+		event.listen(target, "after_cursor_execute", _on_after_execute)
+	return engine
+
+
+class MetricsMiddleware:
+	# Pure ASGI so streaming responses and the background history writer are unaffected
+	def __init__(self, app, app_name: str = "api"):
+		self.app = app
+		self.app_name = app_name
+
+	async def __call__(self, scope, receive, send):
+		if scope["type"] != "http":
+			return await self.app(scope, receive, send)
+		stats = RequestStats()
+		token = _current.set(stats)
+		status = {"code": 500}
+		t0 = time.perf_counter()
+
+		async def send_wrapper(message):
+			if message["type"] == "http.response.start":
+				status["code"] = message["status"]
+				headers = list(message.get("headers", []))
+				headers.append((b"x-db-queries", str(stats.queries).encode()))
+				headers.append((b"server-timing", stats.server_timing().encode()))
+				message = {**message, "headers": headers}
+			await send(message)
+
+		try:
+			await self.app(scope, receive, send_wrapper)
+		finally:
+			_current.reset(token)
+			elapsed = time.perf_counter() - t0
+			route = getattr(scope.get("route"), "path", None) or "unmatched"
+			labels = {"app": self.app_name, "route": route}
+			HTTP_DURATION.observe(elapsed, method=scope.get("method", ""), status=str(status["code"]), **labels)
+			DB_QUERIES_PER_REQUEST.observe(stats.queries, **labels)
+			DB_TIME_PER_REQUEST.observe(stats.db_time, **labels)
+			repeated = stats.statements.most_common(1)
+			if repeated and repeated[0][1] >= settings.db_n_plus_one_threshold:
+				DB_N_PLUS_ONE.inc(**labels)
+				log.warning("Possible N+1 on %s %s: statement ran %d times: %s", scope.get("method"), route, repeated[0][1], repeated[0][0][:200])
+
+
+def metrics_response():
+	from fastapi.responses import PlainTextResponse
+	return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
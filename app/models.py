@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Time, Boolean, Text, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Date, Time, Boolean, Text, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.db import Base
 
@@ -41,6 +41,11 @@ class Insurance(Base):
 
 class DoctorAvailability(Base):
 	__tablename__ = "doctor_availability"
+	# Slot identity for bulk generation (INSERT ... ON CONFLICT DO NOTHING); date/time order for earliest-slot search
+	__table_args__ = (
+		Index("uq_doctor_availability_slot", "doctor_id", "available_date", "start_time", "end_time", unique=True),
+		Index("ix_doctor_availability_date_start", "available_date", "start_time"),
+	)
 	availability_id = Column(Integer, primary_key=True)
 	doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"), nullable=False)
 	available_date = Column(Date, nullable=False)
@@ -50,8 +55,36 @@ class DoctorAvailability(Base):
 
 	doctor = relationship("Doctor", back_populates="availabilities")
 
+class DoctorScheduleTemplate(Base):
+	# Recurring weekly hours; free slots are computed from these on request (app/services/availability.py)
+	__tablename__ = "doctor_schedule_templates"
+	__table_args__ = (Index("ix_doctor_schedule_templates_doctor", "doctor_id", "weekday"),)
+	template_id = Column(Integer, primary_key=True)
+	doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"), nullable=False)
+	weekday = Column(Integer, nullable=False)  # 0 = Monday
+	start_time = Column(Time, nullable=False)
+	end_time = Column(Time, nullable=False)
+	slot_minutes = Column(Integer, nullable=False, default=30)
+	effective_from = Column(Date)  # open-ended when null
+	effective_to = Column(Date)
+	created_at = Column(DateTime, server_default=func.now())
+
+class DoctorScheduleException(Base):
+	# Leave / holidays: blocks [start_time, end_time) on a date, or the whole day when the times are null.
+	# A null doctor_id applies to every doctor.
+	__tablename__ = "doctor_schedule_exceptions"
+	__table_args__ = (Index("ix_doctor_schedule_exceptions_date", "exception_date", "doctor_id"),)
+	exception_id = Column(Integer, primary_key=True)
+	doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"))
+	exception_date = Column(Date, nullable=False)
+	start_time = Column(Time)
+	end_time = Column(Time)
+	kind = Column(String, default="leave")  # 'leave' | 'holiday'
+	reason = Column(Text)
+
 class Appointment(Base):
 	__tablename__ = "appointments"
+	__table_args__ = (Index("ix_appointments_patient", "patient_id"),)
 	appointment_id = Column(Integer, primary_key=True)
 	doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"), nullable=False)
 	patient_id = Column(Integer, ForeignKey("patients.patient_id"), nullable=False)
@@ -71,6 +104,23 @@ class Appointment(Base):
 	patient = relationship("Patient", back_populates="appointments")
 	report = relationship("PatientReport", back_populates="appointment", uselist=False)
 
+class PatientVisitSummary(Base):
+	# One row per patient, rebuilt from appointments whenever they are written (app/services/visit_summary.py).
+	# Cancelled appointments don't count; last_* is the latest appointment by date, past or upcoming.
+	__tablename__ = "patient_visit_summary"
+	patient_id = Column(Integer, ForeignKey("patients.patient_id"), primary_key=True)
+	first_visit = Column(Date)
+	last_visit = Column(Date)
+	visit_count = Column(Integer, nullable=False, default=0)
+	last_doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"))
+	updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class CacheVersion(Base):
+	# Shared stamps for per-process caches, bumped by bulk writers that bypass the ORM (app/services/report_cache.py)
+	__tablename__ = "cache_versions"
+	name = Column(String, primary_key=True)
+	version = Column(Integer, nullable=False, default=0)
+
 class PatientReport(Base):
 	__tablename__ = "patient_reports"
 	report_id = Column(Integer, primary_key=True)
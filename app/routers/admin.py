@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_db, pool_metrics
 from app import models
-import pandas as pd
 from io import BytesIO
 from fastapi.responses import StreamingResponse
 from datetime import datetime
@@ -38,6 +37,7 @@ def export_appointments(db: Session = Depends(get_db)):
 			"member_id": i.member_id if i else None,
 			"group_number": i.group_number if i else None,
 		})
+	import pandas as pd  # heavy; loaded on first export only
 	df = pd.DataFrame(data)
 	output = BytesIO()
 	df.to_excel(output, index=False)
@@ -45,3 +45,7 @@ def export_appointments(db: Session = Depends(get_db)):
 	fname = f"appointments_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
 	return StreamingResponse(output, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": f"attachment; filename={fname}"})
 
+@router.get("/db/pool")
+def db_pool():
+	return pool_metrics()
+
@@ -2,10 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models
-from app.schemas import AppointmentOut
-from app.services.booking import book_slot
+from app.schemas import AppointmentOut, BatchBookingIn, BatchBookingOut
+from app.services.booking import book_batch, book_slot
 from app.integrations.notifications import send_email, send_email_with_attachment, whatsapp_send_text
-from app.workers.celery_app import send_reminder_task
 from datetime import datetime
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
@@ -19,23 +18,14 @@ def book(
 	start_time: str = Body(...),
 	reason: str | None = Body(None),
 	location: str | None = Body(None),
+	duration_minutes: int | None = Body(None),
 	db: Session = Depends(get_db),
 ):
 	try:
-		appt = book_slot(db, doctor_id, patient_id, date, start_time, reason)
+		appt = book_slot(db, doctor_id, patient_id, date, start_time, reason, duration_minutes=duration_minutes, location=location)
 	except ValueError as ve:
 		raise HTTPException(status_code=400, detail=str(ve))
 
-	# set visit type based on duration
-	try:
-		visit_type = 'returning' if (datetime.strptime(str(appt.end_time), "%H:%M:%S") - datetime.strptime(str(appt.start_time), "%H:%M:%S")).seconds == 1800 else 'new'
-		appt.visit_type = visit_type
-		if location:
-			appt.location = location
-		db.commit()
-	except Exception:
-		pass
-
 	# send confirmations (best-effort)
 	try:
 		p = db.query(models.Patient).filter(models.Patient.patient_id == patient_id).first()
@@ -44,6 +34,7 @@ def book(
 		if p and p.phone:
 			whatsapp_send_text(f"Appointment booked for {date} at {start_time}. Reply YES to confirm.")
 		# schedule 3 reminders (immediate queue for demo)
+		from app.workers.celery_app import send_reminder_task
 		appt_dt = datetime.fromisoformat(f"{date}T{start_time if len(start_time.split(':'))==3 else start_time+':00'}")
 		for hours in (48, 24, 2):
 			msg = f"Reminder: Appointment at {appt_dt.isoformat()}"
@@ -54,6 +45,27 @@ def book(
 
 	return appt
 
+@router.post("/book_batch", response_model=BatchBookingOut)
+
+def book_many(payload: BatchBookingIn, db: Session = Depends(get_db)):
+	# Follow-up series and family bookings in one transaction (app/services/booking.py book_batch)
+	results = book_batch(db, [i.model_dump() for i in payload.items], payload.mode)
+	booked = [r for r in results if r["booked"]]
+
+	# one confirmation per patient listing all their new visits (best-effort)
+	try:
+		ids = {r["patient_id"] for r in booked}
+		for p in db.query(models.Patient).filter(models.Patient.patient_id.in_(ids)) if ids else []:
+			when = ", ".join(f"{r['date']} {r['start_time']:%H:%M}" for r in booked if r["patient_id"] == p.patient_id)
+			if p.email:
+				send_email(p.email, "Appointment Confirmation", f"Your appointments are booked for {when}. You'll receive the intake form after confirmation.")
+			if p.phone:
+				whatsapp_send_text(f"Appointments booked for {when}. Reply YES to confirm.")
+	except Exception:
+		pass
+
+	return {"mode": payload.mode, "booked": len(booked), "failed": len(results) - len(booked), "results": results}
+
 @router.post("/{appointment_id}/forms")
 
 def mark_forms_complete(appointment_id: int, completed: bool = Body(True), db: Session = Depends(get_db)):
@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db import get_db
+from datetime import date as dt_date, timedelta
+from app.db import get_db, get_async_db
 from app import models
-from app.schemas import DoctorIn, DoctorOut, AvailabilityOut
+from app.schemas import DoctorIn, DoctorOut, AvailabilityOut, ScheduleTemplateIn, ScheduleTemplateOut, ScheduleExceptionIn, ScheduleExceptionOut
+from app.services.availability import DayPlan, free_slots
 
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
+# Read endpoints are async so short lookups don't queue behind the sync threadpool
 @router.get("", response_model=List[DoctorOut])
-def list_doctors(db: Session = Depends(get_db)):
-	return db.query(models.Doctor).all()
+async def list_doctors(db: AsyncSession = Depends(get_async_db)):
+	return (await db.execute(select(models.Doctor))).scalars().all()
 
 @router.post("", response_model=DoctorOut)
 def create_doctor(payload: DoctorIn, db: Session = Depends(get_db)):
@@ -20,24 +25,76 @@ def create_doctor(payload: DoctorIn, db: Session = Depends(get_db)):
 	return d
 
 @router.get("/{doctor_id}", response_model=DoctorOut)
-def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
-	d = db.query(models.Doctor).filter(models.Doctor.doctor_id == doctor_id).first()
+async def get_doctor(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
+	d = await db.get(models.Doctor, doctor_id)
 	if not d:
 		raise HTTPException(status_code=404, detail="Doctor not found")
 	return d
 
 @router.get("/{doctor_id}/availability/{date}", response_model=List[AvailabilityOut])
-def availability_for_date(doctor_id: int, date: str, db: Session = Depends(get_db)):
-	rows = db.query(models.DoctorAvailability).filter(
-		models.DoctorAvailability.doctor_id == doctor_id,
-		models.DoctorAvailability.available_date == date,
-		models.DoctorAvailability.is_booked == False,
-	).all()
+async def availability_for_date(doctor_id: int, date: dt_date, db: AsyncSession = Depends(get_async_db)):
+	# Explicit rows plus template slots (app/services/availability.py); the planner is sync ORM code
+	slots = await db.run_sync(lambda s: free_slots(s, doctor_id, date).get(date, []))
+	return [{**slot, "available_date": date, "is_booked": False} for slot in slots]
+
+@router.get("/{doctor_id}/free_slots")
+async def free_slots_range(doctor_id: int, start: dt_date, days: int = 7, db: AsyncSession = Depends(get_async_db)):
+	if not 1 <= days <= 92:
+		raise HTTPException(status_code=400, detail="days must be between 1 and 92")
+	by_day = await db.run_sync(lambda s: free_slots(s, doctor_id, start, start + timedelta(days=days - 1)))
+	return [{"date": d, "slots": [{"start_time": x["start_time"], "end_time": x["end_time"]} for x in slots]} for d, slots in by_day.items()]
+
+@router.get("/{doctor_id}/openings")
+async def openings(doctor_id: int, start: dt_date, minutes: int = 30, days: int = 7, limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+	# Earliest free runs of any length (15, 45, 90 min...), not just whole template slots
+	if not 1 <= days <= 92 or not 5 <= minutes <= 480 or not 1 <= limit <= 100:
+		raise HTTPException(status_code=400, detail="Need 1 <= days <= 92, 5 <= minutes <= 480 and 1 <= limit <= 100")
+
+	def find(s):
+		plan = DayPlan(s, [doctor_id], start, start + timedelta(days=days - 1))
+		out = []
+		for i in range(days):
+			day = start + timedelta(days=i)
+			out += [{"date": day, "start_time": st, "end_time": et} for st, et in plan.openings(doctor_id, day, minutes, limit=limit - len(out))]
+			if len(out) >= limit:
+				break
+		return out
+
+	return await db.run_sync(find)
+
+@router.get("/{doctor_id}/schedule", response_model=List[ScheduleTemplateOut])
+async def get_schedule(doctor_id: int, db: AsyncSession = Depends(get_async_db)):
+	T = models.DoctorScheduleTemplate
+	rows = await db.execute(select(T).where(T.doctor_id == doctor_id).order_by(T.weekday, T.start_time))
+	return rows.scalars().all()
+
+@router.put("/{doctor_id}/schedule", response_model=List[ScheduleTemplateOut])
+def replace_schedule(doctor_id: int, payload: List[ScheduleTemplateIn], db: Session = Depends(get_db)):
+	# Replaces the doctor's recurring hours; booked slots are unaffected (they have their own rows)
+	if not db.get(models.Doctor, doctor_id):
+		raise HTTPException(status_code=404, detail="Doctor not found")
+	bad = [t for t in payload if t.end_time <= t.start_time or (t.effective_from and t.effective_to and t.effective_to < t.effective_from)]
+	if bad:
+		raise HTTPException(status_code=400, detail="Each template needs start_time < end_time and effective_from <= effective_to")
+	db.query(models.DoctorScheduleTemplate).filter(models.DoctorScheduleTemplate.doctor_id == doctor_id).delete()
+	rows = [models.DoctorScheduleTemplate(doctor_id=doctor_id, **t.model_dump()) for t in payload]
+	db.add_all(rows)
+	db.commit()
 	return rows
 
+@router.post("/{doctor_id}/schedule/exceptions", response_model=ScheduleExceptionOut)
+def add_schedule_exception(doctor_id: int, payload: ScheduleExceptionIn, db: Session = Depends(get_db)):
+	if (payload.start_time is None) != (payload.end_time is None) or (payload.start_time and payload.end_time <= payload.start_time):
+		raise HTTPException(status_code=400, detail="Give both start_time < end_time, or neither for a whole day")
+	x = models.DoctorScheduleException(doctor_id=doctor_id, **payload.model_dump())
+	db.add(x)
+	db.commit()
+	db.refresh(x)
+	return x
+
 @router.get("/search/{name}", response_model=List[DoctorOut])
-def search_doctors(name: str, db: Session = Depends(get_db)):
+async def search_doctors(name: str, db: AsyncSession = Depends(get_async_db)):
 	q = f"%{name.lower()}%"
-	rows = db.query(models.Doctor).filter(models.Doctor.name.ilike(q)).all()
-	return rows
+	rows = await db.execute(select(models.Doctor).where(models.Doctor.name.ilike(q)))
+	return rows.scalars().all()
 
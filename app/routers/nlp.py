@@ -1,18 +1,13 @@
 from fastapi import APIRouter, Body, HTTPException
 from app.config import settings
-from langchain_groq import ChatGroq
+from app.integrations.llm import get_llm
+from app.services.temporal import parse_date, parse_time
 import json, re
-from datetime import datetime, timedelta, date as dt_date
 
 router = APIRouter(prefix="/nlp", tags=["nlp"])
 
-_llm = None
-
 def _get_llm():
-	global _llm
-	if _llm is None:
-		_llm = ChatGroq(model=settings.groq_model)
-	return _llm
+	return get_llm(settings.groq_model)
 
 def extract_json(text: str) -> dict:
 	try:
@@ -32,35 +27,11 @@ def extract_json(text: str) -> dict:
 
 
 def normalize_date(s: str | None) -> str | None:
-	if not s: return None
-	sl = re.sub(r"(\d+)(st|nd|rd|th)", r"\1", s.strip().lower())
-	try:
-		return datetime.strptime(sl, "%Y-%m-%d").date().isoformat()
-	except Exception:
-		for fmt in ["%d %B %Y", "%B %d %Y", "%d %B", "%B %d", "%d-%m-%Y", "%d/%m/%Y"]:
-			try:
-				dt = datetime.strptime(sl.title(), fmt)
-				if "%Y" not in fmt: dt = dt.replace(year=dt_date.today().year)
-				return dt.date().isoformat()
-			except Exception:
-				continue
-	if sl=="tomorrow": return (dt_date.today()+timedelta(days=1)).isoformat()
-	if sl=="today": return dt_date.today().isoformat()
-	return None
+	return parse_date(s)
 
 
 def normalize_time(s: str | None) -> str | None:
-	if not s: return None
-	t = s.strip().lower().replace(' ', '')
-	m = re.match(r"^(\d{1,2})(?::(\d{2}))?(am|pm)?$", t)
-	if m:
-		h = int(m.group(1)); mi=int(m.group(2) or 0); ap=m.group(3)
-		if ap=='pm' and h<12: h+=12
-		if ap=='am' and h==12: h=0
-		return f"{h:02d}:{mi:02d}:00"
-	if re.match(r"^\d{2}:\d{2}(:\d{2})?$", t):
-		return t if t.count(':')==2 else f"{t}:00"
-	return None
+	return parse_time(s)
 
 @router.post("/parse_booking")
 def nlp_parse_booking(payload: dict = Body(...)):
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.db import get_db
+from app.db import get_db, get_async_db
 from app import models
 from app.schemas import PatientIn, PatientOut
 from sqlalchemy.sql import func as sa_func
@@ -9,8 +11,10 @@ from sqlalchemy.sql import func as sa_func
 router = APIRouter(prefix="/patients", tags=["patients"])
 
 @router.get("", response_model=List[PatientOut])
-def list_patients(db: Session = Depends(get_db)):
-	return db.query(models.Patient).all()
+async def list_patients(db: AsyncSession = Depends(get_async_db)):
+	# insurance is serialized too; load it up front (no lazy loads under asyncio)
+	rows = await db.execute(select(models.Patient).options(selectinload(models.Patient.insurance)))
+	return rows.scalars().all()
 
 @router.post("", response_model=PatientOut)
 def create_patient(payload: PatientIn, db: Session = Depends(get_db)):
@@ -36,8 +40,8 @@ def create_patient(payload: PatientIn, db: Session = Depends(get_db)):
 	return patient
 
 @router.get("/lookup/by_email/{email}")
-def get_patient_id_by_email(email: str, db: Session = Depends(get_db)):
-	p = db.query(models.Patient).filter(sa_func.lower(models.Patient.email) == email.lower()).first()
+async def get_patient_id_by_email(email: str, db: AsyncSession = Depends(get_async_db)):
+	p = (await db.execute(select(models.Patient.patient_id).where(sa_func.lower(models.Patient.email) == email.lower()).limit(1))).first()
 	if not p:
 		raise HTTPException(status_code=404, detail="Patient not found")
 	return {"patient_id": p.patient_id}
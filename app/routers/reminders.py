@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Body
 from datetime import datetime, timedelta
-from app.workers.celery_app import send_reminder_task
 
 router = APIRouter(prefix="/reminders", tags=["reminders"])
 
@@ -10,6 +9,7 @@ def schedule_reminders(
 	to_value: str = Body(...),
 	appointment_datetime: str = Body(...),
 ):
+	from app.workers.celery_app import send_reminder_task
 	# Schedule 3 reminders: 48h, 24h, and 2h before
 	when = datetime.fromisoformat(appointment_datetime)
 	for hours in (48, 24, 2):
@@ -47,7 +47,7 @@ class DoctorOut(DoctorIn):
 		from_attributes = True
 
 class AvailabilityOut(BaseModel):
-	availability_id: int
+	availability_id: Optional[int] = None  # None for template slots not yet booked
 	available_date: date
 	start_time: time
 	end_time: time
@@ -56,6 +56,35 @@ class AvailabilityOut(BaseModel):
 	class Config:
 		from_attributes = True
 
+class ScheduleTemplateIn(BaseModel):
+	weekday: int = Field(ge=0, le=6)  # 0 = Monday
+	start_time: time
+	end_time: time
+	slot_minutes: int = Field(default=30, gt=0)
+	effective_from: Optional[date] = None
+	effective_to: Optional[date] = None
+
+class ScheduleTemplateOut(ScheduleTemplateIn):
+	template_id: int
+	doctor_id: int
+
+	class Config:
+		from_attributes = True
+
+class ScheduleExceptionIn(BaseModel):
+	exception_date: date
+	start_time: Optional[time] = None  # both null: the whole day
+	end_time: Optional[time] = None
+	kind: str = "leave"
+	reason: Optional[str] = None
+
+class ScheduleExceptionOut(ScheduleExceptionIn):
+	exception_id: int
+	doctor_id: Optional[int] = None
+
+	class Config:
+		from_attributes = True
+
 class AppointmentIn(BaseModel):
 	doctor_id: int
 	patient_id: int
@@ -96,3 +125,33 @@ class BookingRequest(BaseModel):
 	start_time: str
 	reason: Optional[str] = None
 
+
+class BookingIntent(BaseModel):
+	doctor_id: int
+	patient_id: int
+	date: date
+	start_time: time
+	duration_minutes: Optional[int] = Field(default=None, gt=0, le=480)  # default: the duration policy
+	reason: Optional[str] = None
+	location: Optional[str] = None
+
+class BatchBookingIn(BaseModel):
+	items: List[BookingIntent] = Field(min_length=1, max_length=200)
+	mode: str = Field(default="all_or_nothing", pattern="^(all_or_nothing|best_effort)$")
+
+class BatchBookingItemOut(BaseModel):
+	index: int
+	booked: bool
+	doctor_id: int
+	patient_id: int
+	date: date
+	start_time: time
+	end_time: Optional[time] = None
+	appointment_id: Optional[int] = None
+	error: Optional[str] = None
+
+class BatchBookingOut(BaseModel):
+	mode: str
+	booked: int
+	failed: int
+	results: List[BatchBookingItemOut]
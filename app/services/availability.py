@@ -0,0 +1,239 @@
+import heapq
+from datetime import date, time, timedelta
+from functools import lru_cache
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+from app.config import settings
+from app.services.schedule import split_hours
+from app.services.intervals import DAY_MINUTES, IntervalSet, to_minutes, to_time
+from app.services.temporal import PERIODS
+
+# Free slots = explicit doctor_availability rows + slots from recurring templates, minus exceptions,
+# booked rows and active appointments. Template slots have no row until booked (materialize_slot),
+# so storage grows with bookings rather than with calendar size. Four queries for any date range.
+# Each doctor-day is reduced to two interval sets (open hours, busy spans) so any [start, end) of any
+# length is checked with a bisect instead of by matching slot rows.
+
+T = models.DoctorScheduleTemplate
+X = models.DoctorScheduleException
+DA = models.DoctorAvailability
+A = models.Appointment
+
+
+@lru_cache(maxsize=1024)
+def _template_slots(start: time, end: time, slot_minutes: int) -> tuple[tuple[time, time], ...]:
+	return split_hours([(start, end)], slot_minutes)
+
+
+def _span(start: time | None, end: time | None) -> tuple[int, int]:
+	# Missing bounds mean the whole day (exceptions)
+	return (to_minutes(start) if start else 0, to_minutes(end) if end else DAY_MINUTES)
+
+
+def _is_active(appt) -> bool:
+	return (appt.confirmation_status or "").lower() != "cancelled" and (appt.status or "").lower() != "cancelled"
+
+
+class DaySchedule:
+	__slots__ = ("open", "busy", "step")
+
+	def __init__(self, open_: IntervalSet, busy: IntervalSet, step: int):
+		self.open, self.busy, self.step = open_, busy, step
+
+	def can_book(self, start: int, end: int) -> bool:
+		return end > start and self.open.covers(start, end) and not self.busy.overlaps(start, end)
+
+	def earliest(self, length: int, after: int = 0, limit: int | None = None, step: int | None = None) -> list[int]:
+		# the grid follows the opening hours, so starts stay on slot boundaries after a booking or buffer
+		return self.open.minus(self.busy).gaps(length, step or self.step, after, limit, grid=self.open)
+
+
+class DayPlan:
+	# Everything needed to answer availability for a set of doctors over [start, end], loaded up front.
+	# `buffer` minutes are kept clear on both sides of every existing booking.
+	def __init__(self, db: Session, doctor_ids: list[int], start: date, end: date, buffer: int | None = None):
+		self.db = db
+		self.start, self.end = start, end
+		self.buffer = settings.booking_buffer_minutes if buffer is None else buffer
+		self.templates: dict[tuple[int, int], list] = {}
+		for t in db.query(T).filter(
+			T.doctor_id.in_(doctor_ids),
+			or_(T.effective_from.is_(None), T.effective_from <= end),
+			or_(T.effective_to.is_(None), T.effective_to >= start),
+		).order_by(T.start_time):
+			self.templates.setdefault((t.doctor_id, t.weekday), []).append(t)
+		self.blocked: dict[tuple, list] = {}
+		for x in db.query(X).filter(X.exception_date >= start, X.exception_date <= end, or_(X.doctor_id.is_(None), X.doctor_id.in_(doctor_ids))):
+			self.blocked.setdefault((x.doctor_id, x.exception_date), []).append(_span(x.start_time, x.end_time))
+		self.rows: dict[tuple[int, date], list] = {}
+		for r in db.query(DA).filter(DA.doctor_id.in_(doctor_ids), DA.available_date >= start, DA.available_date <= end).order_by(DA.start_time):
+			self.rows.setdefault((r.doctor_id, r.available_date), []).append(r)
+		self.booked: dict[tuple[int, date], list] = {}
+		for a in db.query(A).filter(A.doctor_id.in_(doctor_ids), A.appointment_date >= start, A.appointment_date <= end):
+			if _is_active(a) and a.start_time and a.end_time:
+				self.booked.setdefault((a.doctor_id, a.appointment_date), []).append(_span(a.start_time, a.end_time))
+		self._schedules: dict[tuple[int, date], DaySchedule] = {}
+
+	def _active_templates(self, doctor_id: int, day: date):
+		for t in self.templates.get((doctor_id, day.weekday()), ()):
+			if (t.effective_from and day < t.effective_from) or (t.effective_to and day > t.effective_to):
+				continue
+			yield t
+
+	def template_slots(self, doctor_id: int, day: date) -> list[tuple[time, time]]:
+		out = []
+		for t in self._active_templates(doctor_id, day):
+			out.extend(_template_slots(t.start_time, t.end_time, t.slot_minutes or 30))
+		return out
+
+	def schedule(self, doctor_id: int, day: date) -> DaySchedule:
+		key = (doctor_id, day)
+		sched = self._schedules.get(key)
+		if sched is None:
+			templates = list(self._active_templates(doctor_id, day))
+			open_ = IntervalSet(_span(t.start_time, t.end_time) for t in templates)
+			busy = IntervalSet()
+			for r in self.rows.get(key, ()):
+				s, e = _span(r.start_time, r.end_time)
+				if r.is_booked:
+					busy.add(s - self.buffer, e + self.buffer)
+				else:
+					open_.add(s, e)
+			for s, e in self.booked.get(key, ()):
+				busy.add(s - self.buffer, e + self.buffer)
+			for s, e in self.blocked.get(key, []) + self.blocked.get((None, day), []):
+				open_.subtract(s, e)
+			step = min((t.slot_minutes or 30 for t in templates), default=30)
+			sched = self._schedules[key] = DaySchedule(open_, busy, step)
+		return sched
+
+	def free_slots(self, doctor_id: int, day: date) -> list[dict]:
+		sched = self.schedule(doctor_id, day)
+		rows = self.rows.get((doctor_id, day), [])
+		# Explicit rows own their time range, booked or not; templates only fill the gaps
+		taken = IntervalSet(_span(r.start_time, r.end_time) for r in rows)
+		out = [
+			{"availability_id": r.availability_id, "start_time": r.start_time, "end_time": r.end_time}
+			for r in rows
+			if not r.is_booked and sched.can_book(*_span(r.start_time, r.end_time))
+		]
+		for st, et in self.template_slots(doctor_id, day):
+			s, e = _span(st, et)
+			if not taken.overlaps(s, e) and sched.can_book(s, e):
+				out.append({"availability_id": None, "start_time": st, "end_time": et})
+		out.sort(key=lambda s: s["start_time"])
+		return out
+
+	def openings(self, doctor_id: int, day: date, minutes: int, after: time | None = None, limit: int | None = None) -> list[tuple[time, time]]:
+		# Earliest free [start, end) runs of `minutes` on the day's slot grid
+		starts = self.schedule(doctor_id, day).earliest(minutes, to_minutes(after) if after else 0, limit)
+		return [(to_time(s), to_time(s + minutes)) for s in starts if s + minutes < DAY_MINUTES]
+
+	def claim(self, doctor_id: int, day: date, start: time, end: time):
+		# Books [start, end) if it is free and returns its doctor_availability row, else None.
+		# Free explicit rows inside the range are marked booked; a new row is added only for the part
+		# that came from templates. The plan stays current for further claims; the caller commits.
+		s, e = _span(start, end)
+		key = (doctor_id, day)
+		if not self.schedule(doctor_id, day).can_book(s, e):
+			return None
+		rows = self.rows.setdefault(key, [])
+		overlapping = [r for r in rows if _span(r.start_time, r.end_time)[0] < e and s < _span(r.start_time, r.end_time)[1]]
+		covered = IntervalSet(_span(r.start_time, r.end_time) for r in overlapping)
+		for r in overlapping:
+			r.is_booked = True
+		exact = [r for r in overlapping if (r.start_time, r.end_time) == (start, end)]
+		if exact or (overlapping and covered.covers(s, e)):
+			claimed = (exact or overlapping)[0]
+		else:
+			claimed = DA(doctor_id=doctor_id, available_date=day, start_time=start, end_time=end, is_booked=True)
+			self.db.add(claimed)
+			rows.append(claimed)
+		self._schedules.pop(key, None)
+		return claimed
+
+
+def free_slots(db: Session, doctor_id: int, start: date, end: date | None = None) -> dict[date, list[dict]]:
+	# {date: [{"availability_id" (None for template slots), "start_time", "end_time"}]} for days with free slots
+	end = end or start
+	plan = DayPlan(db, [doctor_id], start, end)
+	out = {}
+	for i in range((end - start).days + 1):
+		day = start + timedelta(days=i)
+		slots = plan.free_slots(doctor_id, day)
+		if slots:
+			out[day] = slots
+	return out
+
+
+def materialize_slot(db: Session, doctor_id: int, day: date, start: time, end: time, buffer: int | None = None):
+	# Returns a booked doctor_availability row for [start, end) if it is free (any length), None if not
+	# bookable. The caller commits. The claim is flushed in a savepoint: a concurrent booking that
+	# materialized the same template slot first trips uq_doctor_availability_slot, which means taken.
+	plan = DayPlan(db, [doctor_id], day, day, buffer)
+	try:
+		with db.begin_nested():
+			return plan.claim(doctor_id, day, start, end)
+	except IntegrityError:
+		return None
+
+
+def _next_free_row_day(db: Session, doctor_ids: list[int] | None, start: date, end: date) -> date | None:
+	# Uses ix_doctor_availability_date_start: the scan stops at the first free row in date order
+	q = db.query(DA.available_date).filter(DA.is_booked.is_(False), DA.available_date >= start, DA.available_date <= end)
+	if doctor_ids is not None:
+		q = q.filter(DA.doctor_id.in_(doctor_ids))
+	row = q.order_by(DA.available_date, DA.start_time).limit(1).first()
+	return row[0] if row else None
+
+
+def earliest_slots(db: Session, minutes: int, start: date, days: int = 14, k: int = 5, specialization: str | None = None, period: str | None = None, doctor_ids: list[int] | None = None, per_doctor: int | None = None) -> list[dict]:
+	# First fit across doctors: the k earliest free [start, start + minutes) runs in (date, time) order.
+	# Days are planned in doubling windows and each day's per-doctor openings are merged by start time,
+	# so the scan ends as soon as k options exist. Days with no template for any matching doctor and
+	# no free explicit row are skipped without being planned.
+	q = db.query(models.Doctor.doctor_id, models.Doctor.name, models.Doctor.specialization)
+	if doctor_ids:
+		q = q.filter(models.Doctor.doctor_id.in_(doctor_ids))
+	if specialization:
+		q = q.filter(models.Doctor.specialization.ilike(f"%{specialization.strip()}%"))
+	doctors = {d.doctor_id: d for d in q.order_by(models.Doctor.doctor_id)}
+	if not doctors:
+		return []
+	ids = list(doctors)
+	row_filter = ids if doctor_ids or specialization else None
+	weekdays = {w for (w,) in db.query(T.weekday).filter(T.doctor_id.in_(ids)).distinct()}
+	lo, hi = PERIODS.get((period or "").lower(), (0, 24))
+	after, before = time(lo) if lo else None, hi * 60
+	end = start + timedelta(days=days - 1)
+	cap = min(k, per_doctor or k)
+	taken: dict[int, int] = {}
+	out: list[dict] = []
+	day, window = start, 1
+	while day <= end:
+		week = (day + timedelta(days=i) for i in range(min(7, (end - day).days + 1)))
+		candidates = [d for d in (_next_free_row_day(db, row_filter, day, end), next((d for d in week if d.weekday() in weekdays), None)) if d]
+		if not candidates:
+			break
+		day = min(candidates)
+		last = min(day + timedelta(days=window - 1), end)
+		plan = DayPlan(db, ids, day, last)
+		for i in range((last - day).days + 1):
+			d = day + timedelta(days=i)
+			runs = [
+				[(st, did, et) for st, et in plan.openings(did, d, minutes, after=after, limit=cap) if to_minutes(st) < before]
+				for did in ids
+				if taken.get(did, 0) < cap
+			]
+			for st, did, et in heapq.merge(*runs):
+				if taken.get(did, 0) >= cap:
+					continue
+				taken[did] = taken.get(did, 0) + 1
+				doc = doctors[did]
+				out.append({"doctor_id": did, "doctor_name": doc.name, "specialization": doc.specialization, "date": d, "start_time": st, "end_time": et})
+				if len(out) >= k:
+					return out
+		day, window = last + timedelta(days=1), window * 2
+	return out
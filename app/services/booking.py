@@ -1,69 +1,154 @@
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from app import models
+from app.config import settings
+from app.services.availability import DayPlan, materialize_slot
+from app.services.visit_summary import is_returning, returning_patients
 
 NEW_PATIENT_MINUTES = 60
 RETURNING_PATIENT_MINUTES = 30
+BATCH_MODES = ("all_or_nothing", "best_effort")
+
+
+class DurationPolicy:
+	# Visit length by patient type; BOOKING_DURATION_POLICY picks one of POLICIES
+	__slots__ = ("name", "new_minutes", "returning_minutes")
+
+	def __init__(self, name: str, new_minutes: int, returning_minutes: int):
+		self.name, self.new_minutes, self.returning_minutes = name, new_minutes, returning_minutes
+
+	def minutes(self, returning: bool) -> int:
+		return self.returning_minutes if returning else self.new_minutes
+
+
+POLICIES = {
+	p.name: p
+	for p in (
+		DurationPolicy("standard", NEW_PATIENT_MINUTES, RETURNING_PATIENT_MINUTES),
+		DurationPolicy("uniform30", 30, 30),
+		DurationPolicy("short", 30, 15),
+		DurationPolicy("extended", 90, 45),
+	)
+}
+
+
+def get_policy(name: str | None = None) -> DurationPolicy:
+	name = name or settings.booking_duration_policy
+	if name not in POLICIES:
+		raise ValueError(f"Unknown duration policy {name!r} (expected one of {', '.join(POLICIES)})")
+	return POLICIES[name]
 
 
 def is_returning_patient(db: Session, patient_id: int) -> bool:
-	prev = db.query(models.Appointment).filter(models.Appointment.patient_id == patient_id).first()
-	return prev is not None
-
-
-def compute_end_time(start_time: str, minutes: int) -> str:
-	st = datetime.strptime(start_time, "%H:%M:%S" if len(start_time.split(':')) == 3 else "%H:%M")
-	et = st + timedelta(minutes=minutes)
-	return et.strftime("%H:%M:%S")
-
-
-def book_slot(db: Session, doctor_id: int, patient_id: int, date_str: str, start_time: str, reason: str | None = None) -> models.Appointment:
-	# Normalize start_time to HH:MM:SS
-	start_ts = start_time if len(start_time.split(':')) == 3 else f"{start_time}:00"
-	is_returning = is_returning_patient(db, patient_id)
-	minutes = RETURNING_PATIENT_MINUTES if is_returning else NEW_PATIENT_MINUTES
-
-	# First 30-min slot
-	first_end = compute_end_time(start_ts, 30)
-	first_slot = db.query(models.DoctorAvailability).filter(
-		models.DoctorAvailability.doctor_id == doctor_id,
-		models.DoctorAvailability.available_date == date_str,
-		models.DoctorAvailability.start_time == start_ts,
-		models.DoctorAvailability.end_time == first_end,
-		models.DoctorAvailability.is_booked == False,
-	).first()
-	if not first_slot:
-		raise ValueError("First half-hour slot not available")
-
-	end_ts = first_end
-	if minutes == 60:
-		second_start = first_end
-		second_end = compute_end_time(second_start, 30)
-		second_slot = db.query(models.DoctorAvailability).filter(
-			models.DoctorAvailability.doctor_id == doctor_id,
-			models.DoctorAvailability.available_date == date_str,
-			models.DoctorAvailability.start_time == second_start,
-			models.DoctorAvailability.end_time == second_end,
-			models.DoctorAvailability.is_booked == False,
-		).first()
-		if not second_slot:
-			raise ValueError("Second half-hour slot not available for 60-min new patient appointment")
-		first_slot.is_booked = True
-		second_slot.is_booked = True
-		end_ts = second_end
-	else:
-		first_slot.is_booked = True
+	# patient_visit_summary through the in-process cache (app/services/visit_summary.py)
+	return is_returning(db, patient_id)
+
+
+def book_slot(db: Session, doctor_id: int, patient_id: int, date_str: str, start_time: str, reason: str | None = None, duration_minutes: int | None = None, policy: str | None = None, location: str | None = None) -> models.Appointment:
+	# duration_minutes overrides the policy's length for this patient
+	start = time.fromisoformat(start_time if len(start_time.split(':')) == 3 else f"{start_time}:00")
+	day = date.fromisoformat(date_str)
+	returning = is_returning_patient(db, patient_id)
+	minutes = duration_minutes or get_policy(policy).minutes(returning)
+	end_dt = datetime.combine(day, start) + timedelta(minutes=minutes)
+	if minutes <= 0 or end_dt.date() != day:
+		raise ValueError(f"A {minutes}-minute visit at {start:%H:%M} does not fit within {date_str}")
+
+	# Any free [start, end) is booked, whether it comes from explicit availability rows or the doctor's template
+	if materialize_slot(db, doctor_id, day, start, end_dt.time()) is None:
+		db.rollback()
+		raise ValueError(f"No free {minutes}-minute slot at {start:%H:%M} on {date_str}")
 
 	appt = models.Appointment(
 		doctor_id=doctor_id,
 		patient_id=patient_id,
-		appointment_date=date_str,
-		start_time=start_ts,
-		end_time=end_ts,
+		appointment_date=day,
+		start_time=start,
+		end_time=end_dt.time(),
 		reason=reason or "General",
+		location=location,
+		visit_type="returning" if returning else "new",
 		status="Scheduled",
 	)
 	db.add(appt)
 	db.commit()
 	db.refresh(appt)
 	return appt
+
+
+def book_batch(db: Session, intents: list[dict], mode: str = "all_or_nothing", policy: str | None = None) -> list[dict]:
+	# Books many intents ({doctor_id, patient_id, date, start_time, duration_minutes?, reason?, location?})
+	# against one snapshot: doctor/patient existence and returning status are one query each, one DayPlan
+	# covers every doctor and date, and all rows go out in a single flush and commit. Items are taken in
+	# order, so later items see earlier ones: a series can't overlap itself and a new patient's first
+	# visit makes the rest returning. all_or_nothing writes nothing if any item fails.
+	if mode not in BATCH_MODES:
+		raise ValueError(f"mode must be one of {', '.join(BATCH_MODES)}")
+	if not intents:
+		return []
+	lengths = get_policy(policy)
+	doctor_ids = {i["doctor_id"] for i in intents}
+	patient_ids = {i["patient_id"] for i in intents}
+	doctors = {d for (d,) in db.query(models.Doctor.doctor_id).filter(models.Doctor.doctor_id.in_(doctor_ids))}
+	patients = {p for (p,) in db.query(models.Patient.patient_id).filter(models.Patient.patient_id.in_(patient_ids))}
+	returning = returning_patients(db, patient_ids)
+	plan = DayPlan(db, sorted(doctors), min(i["date"] for i in intents), max(i["date"] for i in intents))
+
+	results, booked = [], []
+	for n, it in enumerate(intents):
+		day, start = it["date"], it["start_time"]
+		res = {"index": n, "booked": False, "doctor_id": it["doctor_id"], "patient_id": it["patient_id"], "date": day, "start_time": start, "end_time": None, "appointment_id": None, "error": None}
+		results.append(res)
+		if it["doctor_id"] not in doctors:
+			res["error"] = "Doctor not found"
+			continue
+		if it["patient_id"] not in patients:
+			res["error"] = "Patient not found"
+			continue
+		is_returning = it["patient_id"] in returning
+		minutes = it.get("duration_minutes") or lengths.minutes(is_returning)
+		end_dt = datetime.combine(day, start) + timedelta(minutes=minutes)
+		if end_dt.date() != day:
+			res["error"] = f"A {minutes}-minute visit at {start:%H:%M} does not fit within {day}"
+			continue
+		if plan.claim(it["doctor_id"], day, start, end_dt.time()) is None:
+			res["error"] = f"No free {minutes}-minute slot at {start:%H:%M} on {day}"
+			continue
+		appt = models.Appointment(
+			doctor_id=it["doctor_id"],
+			patient_id=it["patient_id"],
+			appointment_date=day,
+			start_time=start,
+			end_time=end_dt.time(),
+			reason=it.get("reason") or "General",
+			location=it.get("location"),
+			visit_type="returning" if is_returning else "new",
+			status="Scheduled",
+		)
+		db.add(appt)
+		booked.append((res, appt))
+		returning.add(it["patient_id"])
+		res["end_time"] = end_dt.time()
+
+	if mode == "all_or_nothing" and any(r["error"] for r in results):
+		db.rollback()
+		for r in results:
+			if not r["error"]:
+				r["end_time"], r["error"] = None, "Not booked: another item in the batch failed"
+		return results
+	# ids are read after the flush, before commit expires the objects. One savepoint covers every claim:
+	# a slot materialized by a concurrent booking since the plan was loaded trips
+	# uq_doctor_availability_slot, and the batch then books nothing
+	try:
+		with db.begin_nested():
+			db.flush()
+	except IntegrityError:
+		db.rollback()
+		for res, _ in booked:
+			res["end_time"], res["error"] = None, f"No free slot at {res['start_time']:%H:%M} on {res['date']}: taken by a concurrent booking"
+		return results
+	for res, appt in booked:
+		res["booked"], res["appointment_id"] = True, appt.appointment_id
+	db.commit()
+	return results
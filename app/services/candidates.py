@@ -0,0 +1,97 @@
+import re
+import json
+import heapq
+from difflib import SequenceMatcher
+from app.integrations.llm import estimate_tokens
+
+# Per kind: id key, fields matched against the query, fields shown to the LLM
+KINDS = {
+	"doctors": ("doctor_id", ("name",), ("name", "specialization")),
+	"patients": ("patient_id", ("email", "name"), ("email", "name")),
+}
+
+_TITLE = re.compile(r"\b(dr|doctor)\b\.?")
+_NOISE = re.compile(r"[^a-z0-9@.+ ]+")
+
+
+def normalize(s: str | None) -> str:
+	s = _TITLE.sub(" ", (s or "").lower())
+	return " ".join(_NOISE.sub(" ", s).split())
+
+
+class Matcher:
+	# seq2 is the side SequenceMatcher indexes, so the query is analysed once per ranking
+	def __init__(self, query: str):
+		self.query = query
+		self._sm = SequenceMatcher(None, autojunk=False)
+		self._sm.set_seq2(query)
+
+	def score(self, text: str, floor: float = 0.0) -> float:
+		# Inputs are normalized; results at or below floor may be underestimates (cheap bounds only)
+		q = self.query
+		if not q or not text:
+			return 0.0
+		if q == text:
+			return 1.0
+		boost = 0.0
+		short, long_ = (q, text) if len(q) <= len(text) else (text, q)
+		if short in long_.split() or (len(short) >= 4 and short in long_):
+			# "ahuja" in "ahuja kapoor", or an email local part
+			boost = 0.8 + 0.2 * len(short) / len(long_)
+		sm = self._sm
+		sm.set_seq1(text)
+		if sm.real_quick_ratio() <= floor or sm.quick_ratio() <= floor:
+			return boost
+		return max(boost, sm.ratio())
+
+
+def similarity(query: str, text: str) -> float:
+	return Matcher(query).score(text)
+
+
+def rank(query: str, candidates: list[dict], kind: str, k: int | None = None) -> list[tuple[float, dict]]:
+	# Top-k by best field score; once k are held, candidates that cannot beat the k-th are rejected on upper bounds
+	_, fields, _ = KINDS[kind]
+	q = normalize(query)
+	full = Matcher(q)
+	local = Matcher(q.split("@", 1)[0]) if "@" in q else None
+	k = k or len(candidates)
+	heap: list[tuple[float, int, dict]] = []
+	for n, c in enumerate(candidates):
+		floor = heap[0][0] if len(heap) >= k else 0.0
+		best = 0.0
+		for f in fields:
+			t = normalize(c.get(f))
+			best = max(best, full.score(t, max(floor, best)))
+			if local is not None and "@" in t:
+				best = max(best, 0.95 * local.score(t.split("@", 1)[0], max(floor, best) / 0.95))
+		if len(heap) < k:
+			heapq.heappush(heap, (best, -n, c))
+		elif best > floor:
+			heapq.heapreplace(heap, (best, -n, c))
+	return [(sc, c) for sc, _, c in sorted(heap, key=lambda e: (e[0], e[1]), reverse=True)]
+
+
+def clear_winner(ranked: list[tuple[float, dict]], min_score: float, margin: float) -> dict | None:
+	if not ranked or ranked[0][0] < min_score:
+		return None
+	if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < margin:
+		return None
+	return ranked[0][1]
+
+
+def build_choice_prompt(query: str, ranked: list[tuple[float, dict]], kind: str, token_budget: int) -> tuple[str, int, int]:
+	# Best-first candidates, compactly serialized, until the prompt would exceed token_budget
+	id_key, _, fields = KINDS[kind]
+	head = f"From this {kind} list, return ONLY a JSON with id field for the best match to: {query}.\nCandidates: "
+	used = estimate_tokens(head) + 1
+	rows = []
+	for _, c in ranked:
+		row = json.dumps({"id": c.get(id_key), **{f: c.get(f) for f in fields if c.get(f)}}, separators=(",", ":"))
+		cost = estimate_tokens(row) + 1
+		if rows and used + cost > token_budget:
+			break
+		rows.append(row)
+		used += cost
+	prompt = head + "[" + ",".join(rows) + "]"
+	return prompt, len(rows), estimate_tokens(prompt)
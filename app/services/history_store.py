@@ -0,0 +1,289 @@
+import os
+import gzip
+import json
+import atexit
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta, date as dt_date
+from app.config import settings
+from app.logger import get_logger
+
+log = get_logger("history")
+
+SCHEMA = (
+	"CREATE TABLE IF NOT EXISTS prompts (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT, prompt TEXT, response TEXT, created_at TEXT, doctor_id INTEGER)",
+	"CREATE TABLE IF NOT EXISTS notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, channel TEXT, message TEXT, created_at TEXT)",
+)
+
+# Columns added after the first release; applied with ALTER TABLE on older files
+MIGRATIONS = {
+	"prompts": {"doctor_id": "INTEGER"},
+}
+
+INDEXES = (
+	"CREATE INDEX IF NOT EXISTS idx_prompts_created_at ON prompts(created_at)",
+	"CREATE INDEX IF NOT EXISTS idx_prompts_role_id ON prompts(role, id)",
+	"CREATE INDEX IF NOT EXISTS idx_prompts_doctor_id ON prompts(doctor_id, id)",
+	"CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at)",
+	"CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user, id)",
+)
+
+INSERTS = {
+	"prompts": "INSERT INTO prompts(role, prompt, response, created_at, doctor_id) VALUES (?,?,?,?,?)",
+	"notifications": "INSERT INTO notifications(user, channel, message, created_at) VALUES (?,?,?,?)",
+}
+
+COLUMNS = {
+	"prompts": ("id", "role", "prompt", "response", "created_at", "doctor_id"),
+	"notifications": ("id", "user", "channel", "message", "created_at"),
+}
+
+
+class _Job:
+	def __init__(self, fn):
+		self.fn = fn
+		self.done = threading.Event()
+		self.result = None
+		self.error: Exception | None = None
+
+
+def _day_bounds(start_date: str | None, end_date: str | None) -> tuple[str | None, str | None]:
+	# created_at is stored as ISO text, so date filters compare as strings
+	lo = dt_date.fromisoformat(start_date).isoformat() if start_date else None
+	hi = (dt_date.fromisoformat(end_date) + timedelta(days=1)).isoformat() if end_date else None
+	return lo, hi
+
+
+# Reads use one connection per thread; writes are queued and applied in batches
+# by a single writer thread so request threads never wait on the SQLite write lock.
+class HistoryStore:
+	def __init__(self, path: str, batch_size: int = 200):
+		self.path = path
+		self.batch_size = batch_size
+		self._local = threading.local()
+		self._queue: queue.Queue = queue.Queue()
+		self._lock = threading.Lock()
+		self._writer: threading.Thread | None = None
+		self._retention: threading.Thread | None = None
+		self._stop = threading.Event()
+		self._closed = False
+
+	def _connect(self) -> sqlite3.Connection:
+		conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+		conn.execute("PRAGMA journal_mode=WAL")
+		conn.execute("PRAGMA synchronous=NORMAL")
+		return conn
+
+	def _conn(self) -> sqlite3.Connection:
+		self._ensure_started()
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = self._connect()
+			self._local.conn = conn
+		return conn
+
+	def _migrate(self, conn: sqlite3.Connection):
+		for stmt in SCHEMA:
+			conn.execute(stmt)
+		for table, cols in MIGRATIONS.items():
+			existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+			for col, typ in cols.items():
+				if col not in existing:
+					conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+		for stmt in INDEXES:
+			conn.execute(stmt)
+		conn.commit()
+
+	def _ensure_started(self):
+		if self._writer is not None:
+			return
+		with self._lock:
+			if self._writer is not None:
+				return
+			conn = self._connect()
+			self._migrate(conn)
+			self._writer = threading.Thread(target=self._write_loop, args=(conn,), name="history-writer", daemon=True)
+			self._writer.start()
+
+	def _write_loop(self, conn: sqlite3.Connection):
+		while True:
+			item = self._queue.get()
+			batch = [item]
+			while len(batch) < self.batch_size:
+				try:
+					batch.append(self._queue.get_nowait())
+				except queue.Empty:
+					break
+			rows: dict[str, list[tuple]] = {}
+			markers: list[threading.Event] = []
+			jobs: list[_Job] = []
+			stop = False
+			for entry in batch:
+				if entry is None:
+					stop = True
+				elif isinstance(entry, threading.Event):
+					markers.append(entry)
+				elif isinstance(entry, _Job):
+					jobs.append(entry)
+				else:
+					rows.setdefault(entry[0], []).append(entry[1])
+			try:
+				with conn:
+					for table, values in rows.items():
+						conn.executemany(INSERTS[table], values)
+			except Exception as exc:
+				log.exception("History batch write failed (%d rows): %s", sum(len(v) for v in rows.values()), exc)
+			# Maintenance jobs run on the writer connection so they never race inserts
+			for job in jobs:
+				try:
+					job.result = job.fn(conn)
+				except Exception as exc:
+					job.error = exc
+				job.done.set()
+			for marker in markers:
+				marker.set()
+			for _ in batch:
+				self._queue.task_done()
+			if stop:
+				conn.close()
+				return
+
+	def _enqueue(self, table: str, values: tuple):
+		self._ensure_started()
+		self._queue.put((table, values))
+
+	def _run_on_writer(self, fn, timeout: float | None = None):
+		self._ensure_started()
+		job = _Job(fn)
+		self._queue.put(job)
+		if not job.done.wait(timeout):
+			raise TimeoutError("history writer did not finish the job in time")
+		if job.error:
+			raise job.error
+		return job.result
+
+	def log_prompt(self, role: str, prompt: str, response: str = "", doctor_id: int | None = None):
+		self._enqueue("prompts", (role, prompt, response, datetime.utcnow().isoformat(), doctor_id))
+
+	def log_notification(self, user: str, channel: str, message: str):
+		self._enqueue("notifications", (user, channel, message, datetime.utcnow().isoformat()))
+
+	def flush(self, timeout: float | None = None) -> bool:
+		# Waits only for writes queued before this call, not for later traffic
+		if self._writer is None:
+			return True
+		marker = threading.Event()
+		self._queue.put(marker)
+		return marker.wait(timeout)
+
+	def _page(self, table: str, where: list[str], params: list, limit: int, before_id: int | None) -> list[dict]:
+		self.flush(timeout=1.0)
+		if before_id:
+			where.append("id < ?")
+			params.append(before_id)
+		cols = COLUMNS[table]
+		sql = f"SELECT {', '.join(cols)} FROM {table}"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += " ORDER BY id DESC LIMIT ?"
+		params.append(limit)
+		cur = self._conn().execute(sql, params)
+		return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+	def list_prompts(self, limit: int = 50, before_id: int | None = None, role: str | None = None, doctor_id: int | None = None, start_date: str | None = None, end_date: str | None = None) -> list[dict]:
+		where: list[str] = []
+		params: list = []
+		if role:
+			where.append("role = ?")
+			params.append(role)
+		if doctor_id is not None:
+			where.append("doctor_id = ?")
+			params.append(doctor_id)
+		lo, hi = _day_bounds(start_date, end_date)
+		if lo:
+			where.append("created_at >= ?")
+			params.append(lo)
+		if hi:
+			where.append("created_at < ?")
+			params.append(hi)
+		return self._page("prompts", where, params, limit, before_id)
+
+	def list_notifications(self, user: str, limit: int = 50, before_id: int | None = None, channel: str | None = None) -> list[dict]:
+		where = ["user = ?"]
+		params: list = [user]
+		if channel:
+			where.append("channel = ?")
+			params.append(channel)
+		return self._page("notifications", where, params, limit, before_id)
+
+	def compact(self, retention_days: int, archive_dir: str, chunk_size: int = 5000) -> dict:
+		cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+		stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+
+		def job(conn: sqlite3.Connection) -> dict:
+			archived: dict[str, int] = {}
+			for table, cols in COLUMNS.items():
+				count = 0
+				last_id = 0
+				path = os.path.join(archive_dir, f"{table}-{stamp}.jsonl.gz")
+				out = None
+				while True:
+					rows = conn.execute(
+						f"SELECT {', '.join(cols)} FROM {table} WHERE created_at < ? AND id > ? ORDER BY id LIMIT ?",
+						(cutoff, last_id, chunk_size),
+					).fetchall()
+					if not rows:
+						break
+					if out is None:
+						os.makedirs(archive_dir, exist_ok=True)
+						out = gzip.open(path, "wt", encoding="utf-8")
+					for r in rows:
+						out.write(json.dumps(dict(zip(cols, r))) + "\n")
+					last_id = rows[-1][0]
+					count += len(rows)
+				if out is not None:
+					out.close()
+					with conn:
+						conn.execute(f"DELETE FROM {table} WHERE created_at < ? AND id <= ?", (cutoff, last_id))
+				archived[table] = count
+			if any(archived.values()):
+				conn.execute("VACUUM")
+			return archived
+
+		result = self._run_on_writer(job)
+		log.info("History compaction archived %s (cutoff %s)", result, cutoff)
+		return result
+
+	def start_retention(self, retention_days: int, archive_dir: str, interval_seconds: float):
+		if self._retention is not None:
+			return
+
+		def loop():
+			while not self._stop.wait(interval_seconds):
+				try:
+					self.compact(retention_days, archive_dir)
+				except Exception as exc:
+					log.exception("History compaction failed: %s", exc)
+
+		self._retention = threading.Thread(target=loop, name="history-retention", daemon=True)
+		self._retention.start()
+
+	def close(self):
+		if self._closed or self._writer is None:
+			return
+		self._closed = True
+		self._stop.set()
+		self._queue.put(None)
+		self._writer.join(timeout=5)
+
+
+_store: HistoryStore | None = None
+
+
+def get_history_store() -> HistoryStore:
+	global _store
+	if _store is None:
+		_store = HistoryStore(settings.history_db, batch_size=settings.history_batch_size)
+		atexit.register(_store.close)
+	return _store
@@ -0,0 +1,101 @@
+from bisect import bisect_left, bisect_right
+from datetime import time
+
+# Disjoint half-open [start, end) intervals in minutes since midnight, kept as two sorted arrays.
+# Adds merge overlapping/adjacent intervals, so every lookup is a bisect over the starts.
+
+DAY_MINUTES = 24 * 60
+
+
+def to_minutes(t: time) -> int:
+	return t.hour * 60 + t.minute
+
+
+def to_time(m: int) -> time:
+	# 24:00 (end of day) is clamped to the last representable minute
+	m = min(m, DAY_MINUTES - 1)
+	return time(m // 60, m % 60)
+
+
+class IntervalSet:
+	__slots__ = ("starts", "ends")
+
+	def __init__(self, intervals=()):
+		self.starts: list[int] = []
+		self.ends: list[int] = []
+		for s, e in sorted(intervals):
+			self.add(s, e)
+
+	def __iter__(self):
+		return iter(zip(self.starts, self.ends))
+
+	def __len__(self):
+		return len(self.starts)
+
+	def __bool__(self):
+		return bool(self.starts)
+
+	def __repr__(self):
+		return f"IntervalSet({list(self)})"
+
+	def add(self, start: int, end: int):
+		if end <= start:
+			return
+		# every interval touching [start, end] is folded into one
+		lo = bisect_left(self.ends, start)
+		hi = bisect_right(self.starts, end)
+		if lo < hi:
+			start = min(start, self.starts[lo])
+			end = max(end, self.ends[hi - 1])
+		self.starts[lo:hi] = [start]
+		self.ends[lo:hi] = [end]
+
+	def subtract(self, start: int, end: int):
+		if end <= start:
+			return
+		lo = bisect_right(self.ends, start)
+		hi = bisect_left(self.starts, end)
+		if lo >= hi:
+			return
+		keep = []
+		if self.starts[lo] < start:
+			keep.append((self.starts[lo], start))
+		if self.ends[hi - 1] > end:
+			keep.append((end, self.ends[hi - 1]))
+		self.starts[lo:hi] = [s for s, _ in keep]
+		self.ends[lo:hi] = [e for _, e in keep]
+
+	def overlaps(self, start: int, end: int) -> bool:
+		# Any interval intersecting [start, end); only the last interval starting before end can
+		i = bisect_left(self.starts, end) - 1
+		return i >= 0 and self.ends[i] > start
+
+	def covers(self, start: int, end: int) -> bool:
+		# [start, end) lies inside a single interval
+		i = bisect_right(self.starts, start) - 1
+		return i >= 0 and self.ends[i] >= end
+
+	def minus(self, other: "IntervalSet") -> "IntervalSet":
+		out = IntervalSet()
+		out.starts, out.ends = self.starts[:], self.ends[:]
+		for s, e in other:
+			out.subtract(s, e)
+		return out
+
+	def gaps(self, length: int, step: int = 1, after: int = 0, limit: int | None = None, grid: "IntervalSet | None" = None) -> list[int]:
+		# Earliest start minutes of free runs of `length`, on a `step` grid anchored at the start of the
+		# enclosing interval of `grid` (default: each interval's own start)
+		out = []
+		i = bisect_right(self.ends, after)
+		while i < len(self.starts):
+			s, e = self.starts[i], self.ends[i]
+			origin = s if grid is None else grid.starts[bisect_right(grid.starts, s) - 1]
+			first = max(s, after)
+			s = origin + -(-(first - origin) // step) * step
+			while s + length <= e:
+				out.append(s)
+				if limit is not None and len(out) >= limit:
+					return out
+				s += step
+			i += 1
+		return out
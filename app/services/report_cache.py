@@ -0,0 +1,202 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import date as dt_date
+from sqlalchemy import event, inspect, text, bindparam
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.metrics import REPORT_CACHE_REQUESTS, REPORT_CACHE_INVALIDATIONS
+from app.services.report_query import run_query
+
+# /stats/query results keyed on the compiled request. Entries are dropped when an appointment or
+# patient report for an overlapping (doctor, date) is committed through any ORM session in this
+# process. Bulk writers that bypass the ORM (seed scripts, CSV importer) bump the shared "reports" stamp
+# in cache_versions instead; each process compares it at most every REPORT_CACHE_VERSION_CHECK_SECONDS
+# and clears on a change. ORM writes from other processes are left to expiry: ranges touching
+# today/future after REPORT_CACHE_TTL_SECONDS, ranges that end before today (rarely rewritten) after
+# the longer REPORT_CACHE_HISTORICAL_TTL_SECONDS.
+
+
+_VERSION = text("SELECT version FROM cache_versions WHERE name = 'reports'")
+
+
+def bump_sql(schema: str | None = None) -> str:
+	q = f"{schema}." if schema else ""
+	return f"INSERT INTO {q}cache_versions (name, version) VALUES ('reports', 1) ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1"
+
+
+class _Entry:
+	__slots__ = ("result", "doctor_id", "start", "end", "reads_reports", "expires")
+
+	def __init__(self, result: dict, doctor_id, start, end, reads_reports: bool, expires):
+		self.result = result
+		self.doctor_id = doctor_id
+		self.start = start
+		self.end = end
+		self.reads_reports = reads_reports
+		self.expires = expires
+
+	def affected_by(self, doctor_id, day: str, table: str) -> bool:
+		if table == "patient_reports" and not self.reads_reports:
+			return False
+		return (self.doctor_id is None or self.doctor_id == doctor_id) and (self.start is None or self.start <= day) and (self.end is None or day <= self.end)
+
+
+def cache_key(spec: dict) -> tuple:
+	return (
+		spec.get("doctor_id") or None,
+		spec.get("start_date") or None,
+		spec.get("end_date") or None,
+		tuple(spec.get("metrics") or ["appointments"]),
+		tuple(spec.get("group_by") or []),
+		(spec.get("keyword") or "").strip().lower() or None,
+		spec.get("status") or None,
+	)
+
+
+class ReportCache:
+	def __init__(self, max_entries: int, ttl_seconds: float, historical_ttl_seconds: float, version_check_seconds: float | None = None):
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self.historical_ttl_seconds = historical_ttl_seconds
+		# None: no shared stamp (standalone caches)
+		self.version_check_seconds = version_check_seconds
+		self._version = None
+		self._next_check = 0.0
+		self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+		self._lock = threading.Lock()
+		# Bumped on every invalidation; a result computed across one is not stored
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+		self.invalidated = 0
+
+	def sync(self, db: Session):
+		# Clears everything when a bulk writer has bumped the shared stamp since the last check
+		now = time.monotonic()
+		with self._lock:
+			if self.version_check_seconds is None or now < self._next_check:
+				return
+			self._next_check = now + self.version_check_seconds
+		version = db.execute(_VERSION).scalar() or 0
+		with self._lock:
+			if version != self._version:
+				self._version = version
+				self._generation += 1
+				self._entries.clear()
+
+	def get_or_compute(self, spec: dict, compute, db: Session | None = None) -> tuple[dict, bool]:
+		if db is not None:
+			self.sync(db)
+		key = cache_key(spec)
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry and entry.expires > now:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				REPORT_CACHE_REQUESTS.inc(result="hit")
+				return entry.result, True
+			self.misses += 1
+			generation = self._generation
+		REPORT_CACHE_REQUESTS.inc(result="miss")
+		result = compute()
+		if self.max_entries <= 0:
+			return result, False
+		start, end = key[1], key[2]
+		historical = end is not None and end < dt_date.today().isoformat()
+		expires = now + (self.historical_ttl_seconds if historical else self.ttl_seconds)
+		with self._lock:
+			if generation == self._generation:
+				self._entries[key] = _Entry(result, key[0], start, end, "symptom" in key[3], expires)
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.max_entries:
+					self._entries.popitem(last=False)
+		return result, False
+
+	def invalidate(self, touched: set[tuple]):
+		# touched: {(doctor_id, "YYYY-MM-DD", table)}; entries without a doctor filter match any doctor,
+		# and patient_reports writes only matter to entries counting symptoms
+		if not touched:
+			return 0
+		with self._lock:
+			self._generation += 1
+			stale = [k for k, e in self._entries.items() if any(e.affected_by(*t) for t in touched)]
+			for k in stale:
+				del self._entries[k]
+			self.invalidated += len(stale)
+		REPORT_CACHE_INVALIDATIONS.inc(len(stale))
+		return len(stale)
+
+	def clear(self):
+		# also forgets the stamp, so the next lookup re-reads it
+		with self._lock:
+			self._generation += 1
+			self._entries.clear()
+			self._version, self._next_check = None, 0.0
+
+	def stats(self) -> dict:
+		with self._lock:
+			total = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"hits": self.hits,
+				"misses": self.misses,
+				"hit_rate": round(self.hits / total, 4) if total else None,
+				"invalidated": self.invalidated,
+			}
+
+
+report_cache = ReportCache(
+	settings.report_cache_size,
+	settings.report_cache_ttl_seconds,
+	settings.report_cache_historical_ttl_seconds,
+	settings.report_cache_version_check_seconds,
+)
+
+
+def cached_query(db: Session, spec: dict) -> tuple[dict, bool]:
+	return report_cache.get_or_compute(spec, lambda: run_query(db, spec), db)
+
+
+def bump_version(conn):
+	# For writers that bypass the ORM; the caller's transaction commits
+	conn.execute(text(bump_sql()))
+	report_cache.clear()
+
+
+def _values(obj, attr: str) -> set:
+	# Current and pre-update values, so moving an appointment invalidates both days
+	hist = inspect(obj).attrs[attr].history
+	return {v for v in (*hist.added, *hist.unchanged, *hist.deleted) if v is not None}
+
+
+_REPORT_APPOINTMENTS = text("SELECT doctor_id, appointment_date FROM appointments WHERE appointment_id IN :ids").bindparams(bindparam("ids", expanding=True))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched(session: Session, flush_context):
+	touched = session.info.setdefault("report_cache_touched", set())
+	report_ids = set()
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		table = getattr(obj, "__tablename__", None)
+		if table == "appointments":
+			days = _values(obj, "appointment_date")
+			touched.update((d, str(day), table) for d in _values(obj, "doctor_id") for day in days)
+		elif table == "patient_reports":
+			report_ids |= _values(obj, "appointment_id")
+	if report_ids:
+		rows = session.connection().execute(_REPORT_APPOINTMENTS, {"ids": list(report_ids)}).all()
+		touched.update((d, str(day), "patient_reports") for d, day in rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session):
+	touched = session.info.pop("report_cache_touched", None)
+	if touched:
+		report_cache.invalidate(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_touched(session: Session):
+	session.info.pop("report_cache_touched", None)
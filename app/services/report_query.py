@@ -0,0 +1,92 @@
+from datetime import date as dt_date
+from sqlalchemy import select, func as sa_func, case
+from sqlalchemy.orm import Session
+from app import models
+
+# Compiles a report request (metrics x filters x date range x group-by) into one aggregate SELECT.
+# Request: {"metrics": [...], "start_date", "end_date", "doctor_id", "status", "keyword", "group_by": [...]}
+
+A = models.Appointment
+R = models.PatientReport
+D = models.Doctor
+
+# Additive metrics can be summed across groups for the totals row; distinct patients cannot
+METRICS = {"appointments": True, "patients": False, "symptom": True}
+# Group name -> (output key, column) pairs; "slot" lists individual appointment times
+GROUPS = {
+	"day": (("date", A.appointment_date),),
+	"doctor": (("doctor_id", A.doctor_id), ("doctor_name", D.name)),
+	"status": (("status", A.status),),
+	"slot": (("date", A.appointment_date), ("start_time", A.start_time), ("end_time", A.end_time)),
+}
+
+
+def _metric_column(name: str, keyword: str | None):
+	if name == "appointments":
+		return sa_func.count(sa_func.distinct(A.appointment_id)).label(name)
+	if name == "patients":
+		return sa_func.count(sa_func.distinct(A.patient_id)).label(name)
+	hit = sa_func.lower(R.symptoms).like(f"%{keyword.lower()}%")
+	return sa_func.count(sa_func.distinct(case((hit, A.appointment_id)))).label(name)
+
+
+def compile_query(spec: dict):
+	metrics = list(dict.fromkeys(spec.get("metrics") or ["appointments"]))
+	group_by = list(dict.fromkeys(spec.get("group_by") or []))
+	unknown = [m for m in metrics if m not in METRICS] + [g for g in group_by if g not in GROUPS]
+	if unknown:
+		raise ValueError(f"Unsupported metric/group: {', '.join(unknown)}")
+	keyword = (spec.get("keyword") or "").strip()
+	if "symptom" in metrics and not keyword:
+		raise ValueError("symptom metric requires keyword")
+	start = dt_date.fromisoformat(spec["start_date"]) if spec.get("start_date") else None
+	end = dt_date.fromisoformat(spec["end_date"]) if spec.get("end_date") else None
+
+	# day + slot share the date column; each output key is selected once
+	dims = dict(kv for g in group_by for kv in GROUPS[g])
+	q = select(*dims.values(), *[_metric_column(m, keyword) for m in metrics]).select_from(A)
+	if "symptom" in metrics:
+		q = q.outerjoin(R, R.appointment_id == A.appointment_id)
+	if "doctor" in group_by:
+		q = q.join(D, D.doctor_id == A.doctor_id)
+	if start:
+		q = q.where(A.appointment_date >= start)
+	if end:
+		q = q.where(A.appointment_date <= end)
+	if spec.get("doctor_id"):
+		q = q.where(A.doctor_id == spec["doctor_id"])
+	if spec.get("status"):
+		q = q.where(A.status == spec["status"])
+	if dims:
+		q = q.group_by(*dims.values()).order_by(*dims.values())
+	return q, metrics, group_by, list(dims)
+
+
+def _jsonable(v):
+	return v.isoformat() if isinstance(v, dt_date) else str(v) if v is not None and not isinstance(v, (int, float, str)) else v
+
+
+def run_query(db: Session, spec: dict) -> dict:
+	q, metrics, group_by, keys = compile_query(spec)
+	rows = db.execute(q).all()
+	out = {
+		"start_date": spec.get("start_date"),
+		"end_date": spec.get("end_date"),
+		"doctor_id": spec.get("doctor_id"),
+		"metrics": metrics,
+		"group_by": group_by,
+	}
+	if not group_by:
+		row = rows[0] if rows else None
+		out["totals"] = {m: int(row._mapping[m] or 0) if row else 0 for m in metrics}
+		out["groups"] = []
+		return out
+	groups = []
+	for row in rows:
+		vals = tuple(row)
+		g = {k: _jsonable(v) for k, v in zip(keys, vals[:len(keys)])}
+		g.update({m: int(v or 0) for m, v in zip(metrics, vals[len(keys):])})
+		groups.append(g)
+	out["groups"] = groups
+	out["totals"] = {m: (sum(g[m] for g in groups) if METRICS[m] else None) for m in metrics}
+	return out
@@ -0,0 +1,130 @@
+import io
+from datetime import date, time, timedelta
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app import models
+from app.logger import get_logger
+from app.services.temporal import WEEKDAYS
+
+# Weekly schedule templates expanded into doctor_availability rows in bulk.
+# A template is weekly working hours (weekday -> [(start, end)]), a slot length and per-date exceptions
+# (date -> [] for a day off, or replacement hours). Rows are (doctor_id, date, start_time, end_time).
+
+SLOT_KEY = ("doctor_id", "available_date", "start_time", "end_time")
+_CHUNK = 50000
+
+log = get_logger("schedule")
+
+
+def _minutes(t) -> int:
+	if isinstance(t, str):
+		t = time.fromisoformat(t)
+	return t.hour * 60 + t.minute
+
+
+def split_hours(hours, slot_minutes: int) -> tuple[tuple[time, time], ...]:
+	out = []
+	for start, end in hours:
+		m, stop = _minutes(start), _minutes(end)
+		while m + slot_minutes <= stop:
+			out.append((time(m // 60, m % 60), time((m + slot_minutes) // 60 % 24, (m + slot_minutes) % 60)))
+			m += slot_minutes
+	return tuple(out)
+
+
+class WeeklyTemplate:
+	def __init__(self, hours: dict, slot_minutes: int = 30, exceptions: dict | None = None):
+		if slot_minutes <= 0:
+			raise ValueError("slot_minutes must be positive")
+		self.slot_minutes = slot_minutes
+		# Slot tuples are built once per weekday / exception date and reused for every matching day
+		self._weekly = {WEEKDAYS[k.lower()] if isinstance(k, str) else int(k): split_hours(v, slot_minutes) for k, v in hours.items()}
+		self._exceptions = {date.fromisoformat(d) if isinstance(d, str) else d: split_hours(v or [], slot_minutes) for d, v in (exceptions or {}).items()}
+
+	@classmethod
+	def from_dict(cls, spec: dict) -> "WeeklyTemplate":
+		# {"hours": {"mon": [["09:00", "12:00"], ["14:00", "17:00"]], ...}, "slot_minutes": 30, "exceptions": {"2025-12-25": []}}
+		return cls(spec.get("hours") or {}, int(spec.get("slot_minutes") or 30), spec.get("exceptions"))
+
+	def slots(self, day: date) -> tuple[tuple[time, time], ...]:
+		found = self._exceptions.get(day)
+		return found if found is not None else self._weekly.get(day.weekday(), ())
+
+
+def expand(templates: dict[int, WeeklyTemplate], start: date, end: date) -> list[tuple]:
+	# Inclusive date range; one list extend per (doctor, day)
+	days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+	rows = []
+	for doctor_id, tpl in templates.items():
+		for day in days:
+			rows.extend([(doctor_id, day, st, et) for st, et in tpl.slots(day)])
+	return rows
+
+
+def _slot_index_sql(table: str) -> str:
+	return f"CREATE UNIQUE INDEX IF NOT EXISTS uq_doctor_availability_slot ON {table} ({', '.join(SLOT_KEY)})"
+
+
+_KEY_MATCH = " AND ".join(f"k.{c} = d.{c}" for c in SLOT_KEY)
+_DUPLICATE_SLOTS = f"SELECT {', '.join(SLOT_KEY)}, count(*) FROM doctor_availability GROUP BY {', '.join(SLOT_KEY)} HAVING count(*) > 1"
+# Keeps one row per slot: a booked one if any, else the lowest id
+_DROP_DUPLICATE_SLOTS = (
+	f"DELETE FROM doctor_availability WHERE availability_id IN (SELECT d.availability_id FROM doctor_availability d "
+	f"JOIN doctor_availability k ON {_KEY_MATCH} WHERE coalesce(k.is_booked, false) > coalesce(d.is_booked, false) "
+	f"OR (coalesce(k.is_booked, false) = coalesce(d.is_booked, false) AND k.availability_id < d.availability_id))"
+)
+
+
+def ensure_slot_key(conn) -> int:
+	# Unique slot key for ON CONFLICT, added once by init_db (create_all only adds it to new tables).
+	# Older databases can hold duplicate slots, which would fail the index; they are removed first and
+	# logged. Returns the number of rows removed.
+	if any(ix["name"] == "uq_doctor_availability_slot" for ix in inspect(conn).get_indexes("doctor_availability")):
+		return 0
+	dupes = conn.execute(text(_DUPLICATE_SLOTS)).all()
+	removed = 0
+	if dupes:
+		removed = conn.execute(text(_DROP_DUPLICATE_SLOTS)).rowcount
+		log.warning(
+			"Removed %d duplicate doctor_availability rows before adding uq_doctor_availability_slot: %s",
+			removed, "; ".join(f"doctor {d} {day} {st}-{et} x{n}" for d, day, st, et, n in dupes),
+		)
+	conn.execute(text(_slot_index_sql("doctor_availability")))
+	return removed
+
+
+def copy_slots(cur, rows: list[tuple], schema: str = "public") -> int:
+	# psycopg2 cursor: COPY into a temp table, then one INSERT ... ON CONFLICT DO NOTHING per chunk.
+	# Works with autocommit connections too (no ON COMMIT DROP). Needs uq_doctor_availability_slot
+	# (create_tables.sql, or init_db / scripts/migrate.py).
+	cur.execute("CREATE TEMP TABLE IF NOT EXISTS _slot_stage (doctor_id integer, available_date date, start_time time, end_time time)")
+	added = 0
+	for i in range(0, len(rows), _CHUNK):
+		buf = io.StringIO("".join(f"{d}\t{day.isoformat()}\t{st.isoformat()}\t{et.isoformat()}\n" for d, day, st, et in rows[i:i + _CHUNK]))
+		cur.execute("TRUNCATE _slot_stage")
+		cur.copy_expert("COPY _slot_stage FROM STDIN", buf)
+		cur.execute(
+			f'INSERT INTO "{schema}".doctor_availability ({", ".join(SLOT_KEY)}, is_booked) '
+			f"SELECT {', '.join(SLOT_KEY)}, false FROM _slot_stage ON CONFLICT ({', '.join(SLOT_KEY)}) DO NOTHING"
+		)
+		added += cur.rowcount
+	cur.execute("DROP TABLE IF EXISTS _slot_stage")
+	return added
+
+
+def write_slots(conn, rows: list[tuple]) -> int:
+	# SQLAlchemy connection; returns the number of new rows (existing slots are left untouched).
+	# Needs uq_doctor_availability_slot, which init_db creates.
+	if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+		cur = conn.connection.driver_connection.cursor()
+		try:
+			return copy_slots(cur, rows, conn.execute(text("SELECT current_schema()")).scalar())
+		finally:
+			cur.close()
+	insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+	stmt = insert(models.DoctorAvailability.__table__).on_conflict_do_nothing(index_elements=list(SLOT_KEY))
+	added = 0
+	for i in range(0, len(rows), _CHUNK):
+		chunk = [{"doctor_id": d, "available_date": day, "start_time": st, "end_time": et, "is_booked": False} for d, day, st, et in rows[i:i + _CHUNK]]
+		added += conn.execute(stmt, chunk).rowcount
+	return added
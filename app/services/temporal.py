@@ -0,0 +1,227 @@
+import re
+import calendar
+from functools import lru_cache
+from datetime import date, timedelta
+
+# Shared date/time phrase parser for the agents and the NLP endpoints.
+# Dates come back as YYYY-MM-DD, times as HH:MM:SS (or HH:MM), ranges as (start, end) inclusive.
+
+WEEKDAYS = {
+	"monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+	"mon": 0, "tue": 1, "tues": 1, "wed": 2, "thu": 3, "thur": 3, "thurs": 3, "fri": 4, "sat": 5, "sun": 6,
+}
+MONTHS = {
+	"january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6, "july": 7,
+	"august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+	"jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+# Hour ranges [start, end) for period words
+PERIODS = {"morning": (0, 12), "afternoon": (12, 17), "evening": (17, 24), "night": (17, 24)}
+RELATIVE = {"today": 0, "todays": 0, "tonight": 0, "now": 0, "tomorrow": 1, "tmrw": 1, "tomorrows": 1, "yesterday": -1}
+UNITS = {"day": 1, "days": 1, "week": 7, "weeks": 7}
+
+# One pass over the phrase: ISO dates, numeric d/m/y, 4-digit years, day numbers with optional ordinal, words
+_TOKEN = re.compile(
+	r"(?P<iso>\d{4}-\d{1,2}-\d{1,2})"
+	r"|(?P<dmy>\d{1,2}[/-]\d{1,2}(?:[/-]\d{4})?)\b"
+	r"|(?P<year>\d{4})\b"
+	r"|(?P<num>\d{1,3})(?:st|nd|rd|th)?\b"
+	r"|(?P<word>[a-z]+)"
+)
+_TIME = re.compile(r"^(\d{1,2})(?:[:.](\d{2}))?(?::(\d{2}))?(am|pm)?$")
+_TIME_WORDS = {"noon": (12, 0), "midday": (12, 0), "midnight": (0, 0)}
+
+
+def tokenize(phrase: str) -> list[tuple[str, str]]:
+	return [(m.lastgroup, m.group(m.lastgroup)) for m in _TOKEN.finditer((phrase or "").lower())]
+
+
+def _safe_date(y: int, m: int, d: int) -> date | None:
+	try:
+		return date(y, m, d)
+	except ValueError:
+		return None
+
+
+def _dmy(val: str, today: date) -> date | None:
+	parts = [int(x) for x in val.replace("/", "-").split("-")]
+	return _safe_date(parts[2] if len(parts) == 3 else today.year, parts[1], parts[0])
+
+
+def _day_of_month(today: date, day: int, prefer: str) -> date | None:
+	# Bare "26th": this month, or the next (previous, when looking back) month if that side of today
+	if not 1 <= day <= 31:
+		return None
+	y, m = today.year, today.month
+	cand = date(y, m, min(day, calendar.monthrange(y, m)[1]))
+	if prefer == "future" and cand < today:
+		y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+	elif prefer == "past" and cand > today:
+		y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+	else:
+		return cand
+	return date(y, m, min(day, calendar.monthrange(y, m)[1]))
+
+
+def _weekday(today: date, target: int, direction: str) -> date:
+	# Never today itself: "friday" on a Friday means a week away (past: a week ago)
+	if direction == "past":
+		return today - timedelta(days=(today.weekday() - target) % 7 or 7)
+	return today + timedelta(days=(target - today.weekday()) % 7 or 7)
+
+
+def _week_start(today: date, offset: int) -> date:
+	return today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+
+
+def _month_day(toks: list, i: int, today: date) -> date | None:
+	# "august 26 [2025]" / "26 [of] august [2025]" starting at toks[i]; year defaults to the current one
+	kind, val = toks[i]
+	j = i + 2 if toks[i + 1:i + 2] == [("word", "of")] else i + 1
+	nxt = toks[j] if j < len(toks) else (None, None)
+	if kind == "word" and val in MONTHS and nxt[0] == "num":
+		month, day = MONTHS[val], int(nxt[1])
+	elif kind == "num" and nxt[0] == "word" and nxt[1] in MONTHS:
+		month, day = MONTHS[nxt[1]], int(val)
+	else:
+		return None
+	year = int(toks[j + 1][1]) if j + 1 < len(toks) and toks[j + 1][0] == "year" else today.year
+	return _safe_date(year, month, day)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(phrase: str, today: date, prefer: str) -> date | None:
+	toks = tokenize(phrase)
+	n = len(toks)
+	for i, (kind, val) in enumerate(toks):
+		prev = toks[i - 1][1] if i else None
+		nxt = toks[i + 1] if i + 1 < n else (None, None)
+		if kind == "iso":
+			y, m, d = (int(x) for x in val.split("-"))
+			return _safe_date(y, m, d)
+		if kind == "dmy":
+			return _dmy(val, today)
+		if kind == "word":
+			if val == "day" and toks[i + 1:i + 3] == [("word", "after"), ("word", "tomorrow")]:
+				return today + timedelta(days=2)
+			if val in RELATIVE:
+				return today + timedelta(days=RELATIVE[val])
+			if val in WEEKDAYS:
+				direction = "past" if prev in ("last", "past", "previous") else "future" if prev in ("next", "coming", "this") else prefer
+				return _weekday(today, WEEKDAYS[val], direction)
+			if val == "week" and prev in ("next", "last", "this", "previous"):
+				return _week_start(today, {"next": 1, "this": 0}.get(prev, -1))
+			if val in MONTHS:
+				d = _month_day(toks, i, today)
+				if d:
+					return d
+		if kind == "num":
+			d = _month_day(toks, i, today)
+			if d:
+				return d
+			if nxt[0] == "word" and nxt[1] in UNITS:
+				delta = int(val) * UNITS[nxt[1]]
+				after = toks[i + 2][1] if i + 2 < n else None
+				if prev == "in" or after in ("later", "from"):
+					return today + timedelta(days=delta)
+				if after in ("ago", "back", "before"):
+					return today - timedelta(days=delta)
+				continue
+			if n == 1 or prev in ("on", "the"):
+				return _day_of_month(today, int(val), prefer)
+	return None
+
+
+def parse_date(phrase: str | None, today: date | None = None, prefer: str = "future") -> str | None:
+	# prefer="past" resolves bare weekdays / day numbers backwards (reports), "future" forwards (booking)
+	if not phrase:
+		return None
+	d = _parse_date(phrase.strip().lower(), today or date.today(), prefer)
+	return d.isoformat() if d else None
+
+
+@lru_cache(maxsize=1024)
+def _parse_range(phrase: str, today: date) -> tuple[date, date] | None:
+	toks = tokenize(phrase)
+	if ("word", "between") in toks or ("word", "from") in toks:
+		ends = [_parse_date(v, today, "future") for k, v in toks if k in ("iso", "dmy")]
+		if len(ends) == 2 and all(ends):
+			return min(ends), max(ends)
+	for i, (kind, val) in enumerate(toks):
+		prev = toks[i - 1][1] if i else None
+		nxt = toks[i + 1] if i + 1 < len(toks) else (None, None)
+		if kind == "num" and prev in ("last", "past", "previous") and nxt[1] in UNITS:
+			days = int(val) * UNITS[nxt[1]]
+			return today - timedelta(days=days - 1), today
+		if kind == "num" and prev == "next" and nxt[1] in UNITS:
+			days = int(val) * UNITS[nxt[1]]
+			return today, today + timedelta(days=days - 1)
+		if kind == "word" and val == "week" and prev in ("next", "last", "this", "previous"):
+			start = _week_start(today, {"next": 1, "this": 0}.get(prev, -1))
+			return start, start + timedelta(days=6)
+	return None
+
+
+def parse_range(phrase: str | None, today: date | None = None) -> tuple[str, str] | None:
+	# "last 7 days" (inclusive of today), "next 3 days", "this/next/last week" (Monday-Sunday),
+	# "between 2025-08-24 and 2025-08-30"
+	if not phrase:
+		return None
+	r = _parse_range(phrase.strip().lower(), today or date.today())
+	return (r[0].isoformat(), r[1].isoformat()) if r else None
+
+
+@lru_cache(maxsize=1024)
+def _parse_time(t: str) -> tuple[int, int, int] | None:
+	if t in _TIME_WORDS:
+		return (*_TIME_WORDS[t], 0)
+	m = _TIME.match(t)
+	if not m:
+		return None
+	h, mi, sec, ap = int(m.group(1)), int(m.group(2) or 0), int(m.group(3) or 0), m.group(4)
+	if ap:
+		if not 1 <= h <= 12:
+			return None
+		h = h % 12 + (12 if ap == "pm" else 0)
+	if h > 23 or mi > 59 or sec > 59:
+		return None
+	return h, mi, sec
+
+
+def parse_time(s: str | None, seconds: bool = True) -> str | None:
+	# "10", "10am", "10:30 pm", "10.30", "14:00:00", "noon"
+	if not s:
+		return None
+	hms = _parse_time(s.strip().lower().replace(" ", ""))
+	if hms is None:
+		return None
+	return f"{hms[0]:02d}:{hms[1]:02d}:{hms[2]:02d}" if seconds else f"{hms[0]:02d}:{hms[1]:02d}"
+
+
+def period_of(phrase: str | None) -> str | None:
+	for kind, val in tokenize(phrase or ""):
+		if kind == "word" and val in PERIODS:
+			return val
+	return None
+
+
+def in_period(start_time: str, period: str | None) -> bool:
+	# Unknown or missing periods match everything
+	bounds = PERIODS.get((period or "").lower())
+	if not bounds:
+		return True
+	try:
+		hour = int(start_time.split(":")[0])
+	except (ValueError, AttributeError):
+		return True
+	return bounds[0] <= hour < bounds[1]
+
+
+def cache_info() -> dict:
+	return {"date": _parse_date.cache_info()._asdict(), "range": _parse_range.cache_info()._asdict(), "time": _parse_time.cache_info()._asdict()}
+
+
+def cache_clear():
+	_parse_date.cache_clear()
+	_parse_range.cache_clear()
+	_parse_time.cache_clear()
@@ -0,0 +1,197 @@
+import time
+import threading
+from collections import OrderedDict
+from sqlalchemy import Date, Integer, event, inspect, text, bindparam
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.metrics import VISIT_SUMMARY_CACHE_REQUESTS
+
+# patient_visit_summary: first/last visit, visit count and last doctor per patient, counting appointments
+# that aren't cancelled. A patient's row is rebuilt (one indexed aggregate) inside the flush that writes
+# their appointments, through any ORM session and either model set, so it commits or rolls back with the
+# booking. Reads go through a per-process cache: commits here drop the patient's entry, and
+# VISIT_SUMMARY_TTL_SECONDS bounds staleness from other processes. Core bulk loads call rebuild().
+# On Postgres the patients' rows are locked (FOR NO KEY UPDATE) before aggregating: under READ COMMITTED
+# two concurrent bookings for one patient would otherwise each miss the other's appointment and undercount.
+# FOR UPDATE would deadlock them, since each appointment INSERT's FK check already holds KEY SHARE on the
+# patient row; NO KEY UPDATE doesn't conflict with KEY SHARE but does with itself, so rebuilders queue.
+
+FIELDS = ("patient_id", "first_visit", "last_visit", "visit_count", "last_doctor_id")
+_TRACKED = ("patient_id", "doctor_id", "appointment_date", "start_time", "status", "confirmation_status")
+
+
+def _active(alias: str) -> str:
+	return f"lower(coalesce({alias}.status, '')) <> 'cancelled' AND lower(coalesce({alias}.confirmation_status, '')) <> 'cancelled'"
+
+
+def rebuild_sql(schema: str | None = None, where: str = "1 = 1") -> str:
+	# Upserts one row per patient matching `where` (alias p = patients); patients with no visits get count 0.
+	# The WHERE clause is required by SQLite's INSERT ... SELECT ... ON CONFLICT grammar.
+	q = f"{schema}." if schema else ""
+	return (
+		f"INSERT INTO {q}patient_visit_summary (patient_id, first_visit, last_visit, visit_count, last_doctor_id, updated_at) "
+		f"SELECT p.patient_id, min(a.appointment_date), max(a.appointment_date), count(a.appointment_id), "
+		f"(SELECT b.doctor_id FROM {q}appointments b WHERE b.patient_id = p.patient_id AND {_active('b')} "
+		f"ORDER BY b.appointment_date DESC, b.start_time DESC LIMIT 1), CURRENT_TIMESTAMP "
+		f"FROM {q}patients p LEFT JOIN {q}appointments a ON a.patient_id = p.patient_id AND {_active('a')} "
+		f"WHERE {where} GROUP BY p.patient_id "
+		f"ON CONFLICT (patient_id) DO UPDATE SET first_visit = excluded.first_visit, last_visit = excluded.last_visit, "
+		f"visit_count = excluded.visit_count, last_doctor_id = excluded.last_doctor_id, updated_at = excluded.updated_at"
+	)
+
+
+_REBUILD_FOR = text(rebuild_sql(where="p.patient_id IN :ids")).bindparams(bindparam("ids", expanding=True))
+_LOCK = (
+	text("SELECT patient_id FROM patients WHERE patient_id IN :ids ORDER BY patient_id FOR NO KEY UPDATE")
+	.bindparams(bindparam("ids", expanding=True))
+)
+_SELECT = (
+	text(f"SELECT {', '.join(FIELDS)} FROM patient_visit_summary WHERE patient_id IN :ids")
+	.bindparams(bindparam("ids", expanding=True))
+	.columns(patient_id=Integer, first_visit=Date, last_visit=Date, visit_count=Integer, last_doctor_id=Integer)
+)
+
+
+def _rebuild_for(conn, patient_ids):
+	ids = sorted(patient_ids)
+	# SQLite serializes writers already; the lock waits out other open bookings for these patients,
+	# and the aggregate that follows then sees their committed appointments
+	if conn.dialect.name == "postgresql":
+		conn.execute(_LOCK, {"ids": ids})
+	conn.execute(_REBUILD_FOR, {"ids": ids})
+
+
+def rebuild(conn, patient_ids=None):
+	# Whole table when patient_ids is None (backfill, bulk loads); the caller's transaction commits
+	if patient_ids is None:
+		conn.execute(text(rebuild_sql()))
+		summary_cache.clear()
+	elif patient_ids:
+		_rebuild_for(conn, patient_ids)
+		summary_cache.invalidate(patient_ids)
+
+
+def ensure_visit_summary(conn):
+	# Backfills an empty summary table on databases that already have appointments
+	if conn.execute(text("SELECT 1 FROM patient_visit_summary LIMIT 1")).first() is None and conn.execute(text("SELECT 1 FROM appointments LIMIT 1")).first() is not None:
+		rebuild(conn)
+
+
+class _Entry:
+	__slots__ = ("summary", "expires")
+
+	def __init__(self, summary: dict | None, expires: float):
+		self.summary = summary
+		self.expires = expires
+
+
+class VisitSummaryCache:
+	def __init__(self, max_entries: int, ttl_seconds: float):
+		self.max_entries = max_entries
+		self.ttl_seconds = ttl_seconds
+		self._entries: OrderedDict[int, _Entry] = OrderedDict()
+		self._lock = threading.Lock()
+		# Bumped on every invalidation; rows read across one are not stored
+		self._generation = 0
+		self.hits = 0
+		self.misses = 0
+
+	def get_many(self, db: Session, patient_ids) -> dict[int, dict | None]:
+		now = time.monotonic()
+		out, missing = {}, []
+		with self._lock:
+			for pid in set(patient_ids):
+				entry = self._entries.get(pid)
+				if entry and entry.expires > now:
+					self._entries.move_to_end(pid)
+					out[pid] = entry.summary
+				else:
+					missing.append(pid)
+			self.hits += len(out)
+			self.misses += len(missing)
+			generation = self._generation
+		if out:
+			VISIT_SUMMARY_CACHE_REQUESTS.inc(len(out), result="hit")
+		if not missing:
+			return out
+		VISIT_SUMMARY_CACHE_REQUESTS.inc(len(missing), result="miss")
+		rows = {r.patient_id: dict(r._mapping) for r in db.execute(_SELECT, {"ids": sorted(missing)})}
+		# this session's own uncommitted changes are returned but never cached
+		pending = db.info.get("visit_summary_touched") or set()
+		with self._lock:
+			for pid in missing:
+				out[pid] = rows.get(pid)
+				if self.max_entries > 0 and generation == self._generation and pid not in pending:
+					self._entries[pid] = _Entry(out[pid], now + self.ttl_seconds)
+					self._entries.move_to_end(pid)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+		return out
+
+	def invalidate(self, patient_ids):
+		with self._lock:
+			self._generation += 1
+			for pid in patient_ids:
+				self._entries.pop(pid, None)
+
+	def clear(self):
+		with self._lock:
+			self._generation += 1
+			self._entries.clear()
+
+	def stats(self) -> dict:
+		with self._lock:
+			total = self.hits + self.misses
+			return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 4) if total else None}
+
+
+summary_cache = VisitSummaryCache(settings.visit_summary_cache_size, settings.visit_summary_ttl_seconds)
+
+
+def get_summary(db: Session, patient_id: int) -> dict | None:
+	return summary_cache.get_many(db, [patient_id])[patient_id]
+
+
+def returning_patients(db: Session, patient_ids) -> set[int]:
+	return {pid for pid, s in summary_cache.get_many(db, patient_ids).items() if s and s["visit_count"]}
+
+
+def is_returning(db: Session, patient_id: int) -> bool:
+	return bool(returning_patients(db, [patient_id]))
+
+
+def _patients(obj) -> set:
+	# current and pre-update patient, so moving an appointment between patients fixes both rows
+	hist = inspect(obj).attrs["patient_id"].history
+	return {v for v in (*hist.added, *hist.unchanged, *hist.deleted) if v is not None}
+
+
+def _relevant_change(obj) -> bool:
+	attrs = inspect(obj).attrs
+	return any(a in attrs.keys() and attrs[a].history.has_changes() for a in _TRACKED)
+
+
+@event.listens_for(Session, "after_flush")
+def _rebuild_on_flush(session: Session, flush_context):
+	changed = set()
+	for objs, check in ((session.new, False), (session.deleted, False), (session.dirty, True)):
+		for obj in objs:
+			if getattr(obj, "__tablename__", None) == "appointments" and (not check or _relevant_change(obj)):
+				changed |= _patients(obj)
+	if changed:
+		_rebuild_for(session.connection(), changed)
+		session.info.setdefault("visit_summary_touched", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session):
+	touched = session.info.pop("visit_summary_touched", None)
+	if touched:
+		summary_cache.invalidate(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_touched(session: Session):
+	touched = session.info.pop("visit_summary_touched", None)
+	if touched:
+		summary_cache.invalidate(touched)
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import queue
+import threading
+import contextvars
+from contextlib import contextmanager
+from app.config import settings
+from app.logger import get_logger
+
+log = get_logger("tracing")
+
+# OTLP span kinds
+INTERNAL, CLIENT = 1, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+	__slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status")
+
+	def __init__(self, trace: "Trace", name: str, parent_id: str | None, kind: int = INTERNAL, attributes: dict | None = None, start_ns: int | None = None):
+		self.trace = trace
+		self.span_id = os.urandom(8).hex()
+		self.parent_id = parent_id
+		self.name = name
+		self.kind = kind
+		self.start_ns = start_ns or time.time_ns()
+		self.end_ns = None
+		self.attributes = dict(attributes or {})
+		self.status = STATUS_OK
+
+	def set(self, **attributes):
+		self.attributes.update(attributes)
+
+	def add(self, key: str, amount: int | float):
+		self.attributes[key] = self.attributes.get(key, 0) + amount
+
+	def end(self, end_ns: int | None = None):
+		self.end_ns = end_ns or time.time_ns()
+		self.trace._append(self)
+
+	@property
+	def duration_ms(self) -> float:
+		return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+	def to_otlp(self) -> dict:
+		out = {
+			"traceId": self.trace.trace_id,
+			"spanId": self.span_id,
+			"name": self.name,
+			"kind": self.kind,
+			"startTimeUnixNano": str(self.start_ns),
+			"endTimeUnixNano": str(self.end_ns),
+			"attributes": [_attr(k, v) for k, v in self.attributes.items() if v is not None],
+			"status": {"code": self.status},
+		}
+		if self.parent_id:
+			out["parentSpanId"] = self.parent_id
+		return out
+
+
+def _attr(key: str, value) -> dict:
+	if isinstance(value, bool):
+		return {"key": key, "value": {"boolValue": value}}
+	if isinstance(value, int):
+		return {"key": key, "value": {"intValue": str(value)}}
+	if isinstance(value, float):
+		return {"key": key, "value": {"doubleValue": value}}
+	return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+	def __init__(self):
+		self.trace_id = os.urandom(16).hex()
+		self.spans: list[Span] = []
+		self._lock = threading.Lock()
+
+	def _append(self, span: Span):
+		with self._lock:
+			self.spans.append(span)
+
+	def to_otlp(self) -> dict:
+		return {"resourceSpans": [{
+			"resource": {"attributes": [_attr("service.name", settings.trace_service_name)]},
+			"scopeSpans": [{"scope": {"name": "clinic.agent"}, "spans": [s.to_otlp() for s in self.spans]}],
+		}]}
+
+	def summary(self) -> dict:
+		# Roll each LLM/HTTP/tool span up into its nearest enclosing graph node
+		with self._lock:
+			spans = list(self.spans)
+		by_id = {s.span_id: s for s in spans}
+		nodes: dict[str, dict] = {}
+		totals = {"llm_calls": 0, "tokens_in": 0, "tokens_out": 0, "http_calls": 0, "db_queries": 0}
+
+		def owner(s: Span) -> Span | None:
+			p = by_id.get(s.parent_id)
+			while p is not None and "graph.node" not in p.attributes:
+				p = by_id.get(p.parent_id)
+			return p
+
+		for s in spans:
+			if "graph.node" in s.attributes:
+				n = nodes.setdefault(s.span_id, {"node": s.attributes["graph.node"], "duration_ms": 0.0, "llm_calls": 0, "llm_ms": 0.0, "tokens_in": 0, "tokens_out": 0, "http_calls": 0, "http_ms": 0.0, "db_queries": 0})
+				n["duration_ms"] = round(s.duration_ms, 2)
+		for s in spans:
+			if "graph.node" in s.attributes:
+				continue
+			node = owner(s)
+			n = nodes.get(node.span_id) if node else None
+			if s.name == "llm.invoke":
+				vals = {"llm_calls": 1, "tokens_in": s.attributes.get("llm.tokens_in", 0), "tokens_out": s.attributes.get("llm.tokens_out", 0)}
+				if n:
+					n["llm_ms"] = round(n["llm_ms"] + s.duration_ms, 2)
+			elif s.kind == CLIENT:
+				vals = {"http_calls": 1, "db_queries": s.attributes.get("db.queries", 0)}
+				if n:
+					n["http_ms"] = round(n["http_ms"] + s.duration_ms, 2)
+			else:
+				continue
+			for k, v in vals.items():
+				totals[k] += v
+				if n:
+					n[k] += v
+		root = next((s for s in spans if s.parent_id is None), None)
+		ordered = sorted(nodes.values(), key=lambda n: n["duration_ms"], reverse=True)
+		return {
+			"trace_id": self.trace_id,
+			"duration_ms": round(root.duration_ms, 2) if root else None,
+			"dominant_node": ordered[0]["node"] if ordered else None,
+			"nodes": ordered,
+			"totals": totals,
+		}
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+	return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes):
+	# No-op outside an active trace, so instrumented helpers cost nothing on plain requests
+	parent = _current.get()
+	if parent is None:
+		yield None
+		return
+	s = Span(parent.trace, name, parent.span_id, kind, attributes)
+	token = _current.set(s)
+	try:
+		yield s
+	except BaseException:
+		s.status = STATUS_ERROR
+		raise
+	finally:
+		_current.reset(token)
+		s.end()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, kind: int = CLIENT, **attributes):
+	# For calls timed after the fact (e.g. requests response hooks)
+	parent = _current.get()
+	if parent is None:
+		return None
+	s = Span(parent.trace, name, parent.span_id, kind, attributes, start_ns=start_ns)
+	s.end(end_ns)
+	return s
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+	trace = Trace()
+	root = Span(trace, name, None, INTERNAL, attributes)
+	token = _current.set(root)
+	try:
+		yield trace
+	except BaseException:
+		root.status = STATUS_ERROR
+		raise
+	finally:
+		_current.reset(token)
+		root.end()
+		if settings.trace_export:
+			get_exporter().submit(trace)
+
+
+class Exporter:
+	# Writes finished traces off the request path: OTLP/JSON lines to a file, or POST to a collector
+	def __init__(self, target: str):
+		self.target = target
+		self._queue: queue.Queue = queue.Queue(maxsize=10000)
+		self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+		self._thread.start()
+
+	def submit(self, trace: Trace):
+		try:
+			self._queue.put_nowait(trace)
+		except queue.Full:
+			log.warning("Trace export queue full; dropping trace %s", trace.trace_id)
+
+	def flush(self, timeout: float = 5.0) -> bool:
+		deadline = time.time() + timeout
+		while self._queue.unfinished_tasks and time.time() < deadline:
+			time.sleep(0.01)
+		return not self._queue.unfinished_tasks
+
+	def _run(self):
+		while True:
+			trace = self._queue.get()
+			try:
+				self._export(trace.to_otlp())
+			except Exception as e:
+				log.warning("Trace export to %s failed: %s", self.target, e)
+			finally:
+				self._queue.task_done()
+
+	def _export(self, payload: dict):
+		if self.target.startswith(("http://", "https://")):
+			import requests
+			requests.post(self.target, json=payload, timeout=5)
+			return
+		os.makedirs(os.path.dirname(os.path.abspath(self.target)), exist_ok=True)
+		with open(self.target, "a", encoding="utf-8") as f:
+			f.write(json.dumps(payload) + "\n")
+
+
+_exporter: Exporter | None = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> Exporter:
+	global _exporter
+	with _exporter_lock:
+		if _exporter is None or _exporter.target != settings.trace_export:
+			_exporter = Exporter(settings.trace_export)
+		return _exporter
@@ -25,6 +25,36 @@ CREATE TABLE IF NOT EXISTS doctor_availability (
     is_booked BOOLEAN DEFAULT FALSE
 );
 
+CREATE UNIQUE INDEX IF NOT EXISTS uq_doctor_availability_slot
+    ON doctor_availability (doctor_id, available_date, start_time, end_time);
+CREATE INDEX IF NOT EXISTS ix_doctor_availability_date_start ON doctor_availability (available_date, start_time);
+
+-- Recurring weekly hours (weekday 0 = Monday); free slots are computed from these on request
+CREATE TABLE IF NOT EXISTS doctor_schedule_templates (
+    template_id SERIAL PRIMARY KEY,
+    doctor_id INTEGER NOT NULL REFERENCES doctors(doctor_id),
+    weekday INTEGER NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    slot_minutes INTEGER NOT NULL DEFAULT 30,
+    effective_from DATE,
+    effective_to DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_doctor_schedule_templates_doctor ON doctor_schedule_templates (doctor_id, weekday);
+
+-- Leave / holidays; null times block the whole day, null doctor_id applies to every doctor
+CREATE TABLE IF NOT EXISTS doctor_schedule_exceptions (
+    exception_id SERIAL PRIMARY KEY,
+    doctor_id INTEGER REFERENCES doctors(doctor_id),
+    exception_date DATE NOT NULL,
+    start_time TIME,
+    end_time TIME,
+    kind VARCHAR(50) DEFAULT 'leave',
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_doctor_schedule_exceptions_date ON doctor_schedule_exceptions (exception_date, doctor_id);
+
 CREATE TABLE IF NOT EXISTS appointments (
     appointment_id SERIAL PRIMARY KEY,
     doctor_id INTEGER REFERENCES doctors(doctor_id),
@@ -36,6 +66,23 @@ CREATE TABLE IF NOT EXISTS appointments (
     status VARCHAR(50) DEFAULT 'Scheduled',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+CREATE INDEX IF NOT EXISTS ix_appointments_patient ON appointments (patient_id);
+
+-- Per-patient rollup of non-cancelled appointments, rebuilt for a patient whenever their appointments change
+CREATE TABLE IF NOT EXISTS patient_visit_summary (
+    patient_id INTEGER PRIMARY KEY REFERENCES patients(patient_id),
+    first_visit DATE,
+    last_visit DATE,
+    visit_count INTEGER NOT NULL DEFAULT 0,
+    last_doctor_id INTEGER REFERENCES doctors(doctor_id),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Shared stamps for per-process caches; bulk writers that bypass the ORM bump them
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
 
 CREATE TABLE IF NOT EXISTS patient_reports (
     report_id SERIAL PRIMARY KEY,
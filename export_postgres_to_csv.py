@@ -3,7 +3,9 @@ import sys
 import argparse
 import psycopg2
 from psycopg2 import sql
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from scripts.export_files import IMPORT_LOG, EXTENSIONS, PARQUET_PARTITIONS, ExportWriter, ParquetTableWriter, arrow_type, write_manifest, load_manifest, latest_export
 
 
 def parse_args() -> argparse.Namespace:
@@ -15,10 +17,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--dbname", default=os.getenv("PGDATABASE", "clinicdb"), help="Database name (default: clinicdb)")
     parser.add_argument("--schema", default=os.getenv("PGSCHEMA", "public"), help="Schema to export (default: public). Use '*' for all non-system schemas.")
     parser.add_argument("--outdir", default="exports", help="Output directory for CSV files")
+    parser.add_argument("--parallel", type=int, default=1, help="Worker connections; all read the same exported snapshot")
+    parser.add_argument("--compress", choices=sorted(EXTENSIONS), default="none", help="Stream output through gzip or zstd")
+    parser.add_argument("--level", type=int, default=None, help="Compression level (gzip 1-9, zstd 1-22)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="csv (importable) or parquet (typed, month-partitioned, for analytics)")
+    parser.add_argument("--batch-rows", type=int, default=50000, help="Rows fetched per batch for --format parquet")
+    parser.add_argument("--incremental", action="store_true", help="Export only rows added/changed since the previous export under --outdir")
+    parser.add_argument("--base", default=None, help="Previous export directory to diff against (default: latest for this database)")
     return parser.parse_args()
 
 
-def connect_db(args: argparse.Namespace):
+def connect_db(args: argparse.Namespace, snapshot: str | None = None):
     password = os.getenv("PGPASSWORD", args.password)
     conn = psycopg2.connect(
         host=args.host,
@@ -27,7 +36,11 @@ def connect_db(args: argparse.Namespace):
         password=password,
         dbname=args.dbname,
     )
-    conn.autocommit = True
+    # One REPEATABLE READ transaction per connection; workers adopt the coordinator's snapshot
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    if snapshot:
+        with conn.cursor() as cur:
+            cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
     return conn
 
 
@@ -53,21 +66,116 @@ def get_tables(cur, schema: str):
             FROM information_schema.tables
             WHERE table_type = 'BASE TABLE'
               AND table_schema = %s
+              AND table_name <> %s
             ORDER BY table_name
             """
         ),
-        [schema],
+        [schema, IMPORT_LOG],
     )
     return [r[0] for r in cur.fetchall()]
 
 
-def export_table(cur, schema: str, table: str, out_path: str):
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    query = sql.SQL("COPY {}.{} TO STDOUT WITH CSV HEADER").format(
-        sql.Identifier(schema), sql.Identifier(table)
+def watermark_columns(cur, schema: str, table: str) -> tuple[str | None, bool]:
+    # (single-column integer primary key or None, whether the table has created_at)
+    cur.execute(
+        """
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s::regclass AND i.indisprimary
+        """,
+        [f'"{schema}"."{table}"'],
+    )
+    pk_cols = cur.fetchall()
+    pk = pk_cols[0][0] if len(pk_cols) == 1 and pk_cols[0][1] in ("integer", "bigint", "smallint") else None
+    cur.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = %s AND table_name = %s AND column_name = 'created_at'",
+        [schema, table],
     )
-    with open(out_path, "w", encoding="utf-8", newline="") as f:
-        cur.copy_expert(query, f)
+    return pk, cur.fetchone() is not None
+
+
+def high_water(cur, schema: str, table: str, pk: str | None, has_created: bool) -> dict:
+    cols = [sql.SQL("max({})").format(sql.Identifier(pk)) if pk else sql.SQL("NULL"), sql.SQL("max(created_at)::text") if has_created else sql.SQL("NULL")]
+    cur.execute(sql.SQL("SELECT {} FROM {}.{}").format(sql.SQL(", ").join(cols), sql.Identifier(schema), sql.Identifier(table)))
+    max_pk, max_created = cur.fetchone()
+    return {"pk": max_pk, "created_at": max_created}
+
+
+def delta_filter(pk: str | None, has_created: bool, since: dict | None, since_xmin: int | None):
+    # New rows: past the previous primary key / created_at marks. Changed rows: written by a transaction
+    # newer than the previous snapshot's xmin (age() compares 32-bit xids wraparound-safely).
+    # Deleted rows are not carried by deltas.
+    if since is None:
+        return None
+    conds = []
+    if pk and since.get("pk") is not None:
+        conds.append(sql.SQL("{} > {}").format(sql.Identifier(pk), sql.Literal(since["pk"])))
+    if has_created and since.get("created_at"):
+        conds.append(sql.SQL("created_at > {}::timestamp").format(sql.Literal(since["created_at"])))
+    if since_xmin is not None:
+        conds.append(sql.SQL("age(xmin) <= age({}::text::xid)").format(sql.Literal(str(since_xmin % (1 << 32)))))
+    return sql.SQL(" OR ").join(conds) if conds else None
+
+
+def export_table(cur, schema: str, table: str, out_path: str, compression: str = "none", level: int | None = None, where=None) -> dict:
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    if where is None:
+        query = sql.SQL("COPY {}.{} TO STDOUT WITH CSV HEADER").format(
+            sql.Identifier(schema), sql.Identifier(table)
+        )
+    else:
+        query = sql.SQL("COPY (SELECT * FROM {}.{} WHERE {}) TO STDOUT WITH CSV HEADER").format(
+            sql.Identifier(schema), sql.Identifier(table), where
+        )
+    with ExportWriter(out_path, compression, level) as f:
+        cur.copy_expert(query, f, size=1 << 20)
+        rows = cur.rowcount
+        info = f.close()
+    return {"rows": rows, **info}
+
+
+def export_table_parquet(conn, schema: str, table: str, out_dir: str, batch_rows: int = 50000, where=None) -> dict:
+    # Server-side cursor inside the worker's snapshot transaction; each batch becomes Parquet row groups
+    query = sql.SQL("SELECT * FROM {}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+    if where is not None:
+        query = sql.SQL("{} WHERE {}").format(query, where)
+    with conn.cursor(name=f"export_{schema}_{table}") as cur:
+        cur.itersize = batch_rows
+        cur.execute(query)
+        rows = cur.fetchmany(batch_rows)
+        columns = [d.name for d in cur.description]
+        writer = ParquetTableWriter(out_dir, columns, [arrow_type(d.type_code) for d in cur.description], PARQUET_PARTITIONS.get(table))
+        while rows:
+            writer.write_rows(rows)
+            rows = cur.fetchmany(batch_rows)
+    return {"format": "parquet", **writer.close()}
+
+
+def _worker(args: argparse.Namespace, snapshot: str, jobs: list[tuple]) -> list[tuple]:
+    # Runs a share of the tables on its own connection inside the shared snapshot
+    conn = connect_db(args, snapshot)
+    out = []
+    error = None
+    try:
+        with conn.cursor() as cur:
+            for schema, table, out_path, where in jobs:
+                if error is not None:
+                    # a failed statement aborts the snapshot transaction; the rest of this share cannot run
+                    out.append((schema, table, out_path, None, error))
+                    continue
+                try:
+                    if args.format == "parquet":
+                        info = export_table_parquet(conn, schema, table, out_path, args.batch_rows, where)
+                    else:
+                        info = export_table(cur, schema, table, out_path, args.compress, args.level, where)
+                    out.append((schema, table, out_path, info, None))
+                except Exception as ex:
+                    error = ex
+                    out.append((schema, table, out_path, None, ex))
+    finally:
+        conn.close()
+    return out
 
 
 def main():
@@ -77,6 +185,18 @@ def main():
     outdir = os.path.join(base_outdir, f"{args.dbname}-{ts}")
     os.makedirs(outdir, exist_ok=True)
 
+    if args.format == "parquet" and args.incremental:
+        print("--incremental is only supported for CSV exports; Parquet exports are full snapshots.")
+        sys.exit(2)
+
+    base = None
+    if args.incremental:
+        found = load_manifest(args.base) if args.base else latest_export(base_outdir, args.dbname, exclude=outdir)
+        if not found:
+            print("No previous export with a manifest found; writing a full export.")
+        else:
+            base = found
+
     try:
         conn = connect_db(args)
     except Exception as e:
@@ -85,29 +205,60 @@ def main():
 
     try:
         with conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot(), txid_snapshot_xmin(txid_current_snapshot())")
+            snapshot, xmin = cur.fetchone()
             schemas = get_schemas(cur, args.schema == "*", args.schema)
-            total_tables = 0
-            print(f"Exporting from database '{args.dbname}' -> {outdir}")
+            jobs = []
+            marks = {}
+            base_tables = base[1].get("tables", {}) if base else {}
             for schema in schemas:
-                tables = get_tables(cur, schema)
-                if not tables:
-                    continue
-                schema_dir = os.path.join(outdir, schema)
-                os.makedirs(schema_dir, exist_ok=True)
-                for table in tables:
-                    out_path = os.path.join(schema_dir, f"{table}.csv")
-                    try:
-                        export_table(cur, schema, table, out_path)
-                        print(f"- {schema}.{table} -> {out_path}")
-                        total_tables += 1
-                    except Exception as ex:
-                        print(f"! Failed to export {schema}.{table}: {ex}")
-            print(f"Done. Exported {total_tables} tables.")
+                for table in get_tables(cur, schema):
+                    key = f"{schema}.{table}"
+                    pk, has_created = watermark_columns(cur, schema, table)
+                    marks[key] = high_water(cur, schema, table, pk, has_created)
+                    prev = base_tables.get(key)
+                    where = delta_filter(pk, has_created, prev.get("high_water") if prev else None, base[1].get("xmin") if prev else None)
+                    name = table if args.format == "parquet" else f"{table}{EXTENSIONS[args.compress]}"
+                    jobs.append((schema, table, os.path.join(outdir, schema, name), where))
+            kind = "delta" if base else "full"
+            print(f"Exporting {kind} from database '{args.dbname}' -> {outdir} (snapshot {snapshot}, {args.parallel} workers, {args.compress})")
+            workers = max(1, min(args.parallel, len(jobs) or 1))
+            shares = [jobs[i::workers] for i in range(workers)]
+            # The coordinator transaction stays open until every worker has finished, keeping the snapshot valid
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = [r for rs in pool.map(lambda share: _worker(args, snapshot, share), shares) for r in rs]
+        conn.rollback()
     finally:
         conn.close()
 
+    manifest = {
+        "database": args.dbname,
+        "export_id": os.path.basename(outdir),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "snapshot": snapshot,
+        "xmin": xmin,
+        "kind": kind,
+        # sibling directory this delta applies on top of
+        "base": os.path.basename(base[0]) if base else None,
+        "format": args.format,
+        "compression": "zstd" if args.format == "parquet" else args.compress,
+        "tables": {},
+    }
+    wheres = {(schema, table): where for schema, table, _, where in jobs}
+    failed = 0
+    for schema, table, out_path, info, ex in results:
+        if ex is not None:
+            print(f"! Failed to export {schema}.{table}: {ex}")
+            failed += 1
+            continue
+        mode = "full" if wheres[(schema, table)] is None else "delta"
+        manifest["tables"][f"{schema}.{table}"] = {"file": os.path.relpath(out_path, outdir).replace(os.sep, "/"), "mode": mode, "high_water": marks[f"{schema}.{table}"], **info}
+        print(f"- {schema}.{table} -> {out_path} ({info['rows']} rows)")
+    write_manifest(outdir, manifest)
+    print(f"Done. Exported {len(manifest['tables'])} tables.")
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
-
-
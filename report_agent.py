@@ -2,13 +2,8 @@ import os
 import json
 import re
 import requests
-from datetime import datetime, timedelta, date as dt_date
-from langchain_groq import ChatGroq
-
-# LLM config (env-based, fast and deterministic)
-GROQ_MODEL = os.getenv("GROQ_MODEL", "llama3-8b-8192")
-llm = ChatGroq(model=GROQ_MODEL, temperature=0.0)
-
+from datetime import datetime, date as dt_date
+from app.services.temporal import parse_date, parse_range
 BASE_URL = "http://localhost:8000"
 
 # WhatsApp config (Meta Graph API)
@@ -18,10 +13,9 @@ WA_TEMPLATE = os.getenv("WHATSAPP_TEMPLATE", "hello_world")
 WA_LANG = os.getenv("WHATSAPP_LANG", "en_US")
 WA_DEFAULT_TO = os.getenv("WHATSAPP_TO", "")
 
-WEEKDAYS = {
-    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-    'friday': 4, 'saturday': 5, 'sunday': 6
-}
+_TIMES_WORD = re.compile(r"\btimes\b")
+
+
 def _today() -> dt_date:
     override = os.getenv("REPORT_AGENT_TEST_TODAY")
     if override:
@@ -33,157 +27,107 @@ def _today() -> dt_date:
 
 
 
-def _strip_ordinal(s: str) -> str:
-    return re.sub(r"(\d+)(st|nd|rd|th)", r"\1", s, flags=re.IGNORECASE)
+def _parse_date_phrase(s: str) -> str | None:
+    # Reports look back: a bare weekday or day number means the most recent one
+    return parse_date(s, _today(), prefer="past")
 
 
-def _parse_date_phrase(s: str) -> str | None:
-    if not s:
-        return None
-    s = _strip_ordinal(s.strip().lower())
-    today = _today()
-    if s in ("today",):
-        return today.isoformat()
-    if s in ("yesterday",):
-        return (today - timedelta(days=1)).isoformat()
-    if s in ("tomorrow",):
-        return (today + timedelta(days=1)).isoformat()
-    if s in WEEKDAYS:
-        target = WEEKDAYS[s]
-        delta = (today.weekday() - target) % 7
-        if delta == 0:
-            delta = 7
-        return (today - timedelta(days=delta)).isoformat()
-    for fmt in ("%Y-%m-%d", "%d %B %Y", "%B %d %Y", "%d %B", "%B %d", "%d-%m-%Y", "%d/%m/%Y"):
-        try:
-            dt = datetime.strptime(s.title() if "%B" in fmt else s, fmt)
-            if "%Y" not in fmt:
-                dt = dt.replace(year=today.year)
-            return dt.date().isoformat()
-        except Exception:
-            continue
-    return None
+SYMPTOMS = ["fever", "cough", "flu", "cold", "fatigue", "headache"]
+# Phrases that add a group-by to the stats query
+GROUP_WORDS = {
+    "day": ("per day", "by day", "daily", "each day", "busiest"),
+    "doctor": ("per doctor", "by doctor", "each doctor"),
+    "status": ("by status", "per status"),
+}
 
 
 def _interpret_query(text: str) -> dict:
     t = (text or "").strip().lower()
     # detect symptom keywords (extendable)
-    symptoms = ["fever", "cough", "flu", "cold", "fatigue", "headache"]
-    is_symptom = any(k in t for k in symptoms)
-    keyword = None
-    for k in symptoms:
-        if k in t:
-            keyword = k
-            break
+    keyword = next((k for k in SYMPTOMS if k in t), None)
     # list times intents (include bare 'times' for follow-ups like 'times?')
-    if any(p in t for p in ["show times", "tell times", "list times", "time slots", "appointment times"]) or re.search(r"\btimes\b", t):
-        # detect date phrase
-        m_date = re.search(r"(on|for)\s+([\w\s\-/]+)$", t)
-        d = _parse_date_phrase(m_date.group(2)) if m_date else None
-        d = d or _today().isoformat()
-        return {"type": "list_times", "date": d}
-
-    m = re.search(r"last\s+(\d+)\s+days", t)
-    if m:
-        n = int(m.group(1))
-        end = _today()
-        start = end - timedelta(days=n-1)
-        return {"type": "count_symptom" if is_symptom else "count_appointments", "keyword": keyword, "start_date": start.isoformat(), "end_date": end.isoformat()}
-    for phrase in ("yesterday", "today", "tomorrow") + tuple(WEEKDAYS.keys()):
-        if phrase in t:
-            d = _parse_date_phrase(phrase)
-            return {"type": "count_symptom" if is_symptom else "count_appointments", "keyword": keyword, "date": d}
-    m2 = re.search(r"on\s+([\w\s\-/]+)", t)
-    if m2:
-        d = _parse_date_phrase(m2.group(1))
-        if d:
-            return {"type": "count_symptom" if is_symptom else "count_appointments", "keyword": keyword, "date": d}
-    return {"type": "count_symptom" if is_symptom else "count_appointments", "keyword": keyword, "date": dt_date.today().isoformat()}
-
-
-def _count_appointments_for_day(doctor_id: int | None, day: str) -> int:
-    # Use new count-on-date endpoint when available, fallback to limited periods
+    if any(p in t for p in ["show times", "tell times", "list times", "time slots", "appointment times"]) or _TIMES_WORD.search(t):
+        d = _parse_date_phrase(t) or _today().isoformat()
+        return {"type": "list_times", "date": d, "metrics": ["appointments"], "group_by": ["slot"]}
+
+    # Compound questions ("appointments and fever cases") ask for several metrics in one query
+    metrics = []
+    if "appointment" in t or not (keyword or "patient" in t):
+        metrics.append("appointments")
+    if "patient" in t and not keyword:
+        metrics.append("patients")
+    if keyword:
+        metrics.append("symptom")
+    group_by = [g for g, words in GROUP_WORDS.items() if any(w in t for w in words)]
+    kind = "busiest_day" if "busiest" in t else "count_symptom" if keyword else "count_appointments"
+    parsed = {"type": kind, "keyword": keyword, "metrics": metrics, "group_by": group_by}
+    rng = parse_range(t, _today())
+    if rng:
+        return {**parsed, "start_date": rng[0], "end_date": rng[1]}
+    return {**parsed, "date": _parse_date_phrase(t) or _today().isoformat()}
+
+
+def plan_query(parsed: dict, doctor_id: int | None) -> dict:
+    # Interpreted request -> /stats/query body; a single date is a one-day range
+    start = parsed.get("start_date") or parsed.get("date")
+    end = parsed.get("end_date") or parsed.get("date")
+    spec = {"metrics": parsed.get("metrics") or ["appointments"], "group_by": parsed.get("group_by") or [], "start_date": start, "end_date": end}
+    if doctor_id:
+        spec["doctor_id"] = doctor_id
+    if parsed.get("keyword"):
+        spec["keyword"] = parsed["keyword"]
+    return spec
+
+
+def call_stats_interpreted(parsed: dict, doctor_id: int | None) -> dict:
+    spec = plan_query(parsed, doctor_id)
     try:
-        r = requests.get(f"{BASE_URL}/stats/appointments_count_on", params={"doctor_id": doctor_id, "date": day}, timeout=10)
+        r = requests.post(f"{BASE_URL}/stats/query", json=spec, timeout=10)
         if r.status_code == 200:
-            return r.json().get("count", 0)
-    except Exception:
-        pass
-    today = _today()
-    period_map = {
-        (today - timedelta(days=1)).isoformat(): "yesterday",
-        today.isoformat(): "today",
-        (today + timedelta(days=1)).isoformat(): "tomorrow",
-    }
-    period = period_map.get(day)
-    if period:
-        rr = requests.get(f"{BASE_URL}/stats/appointments_count", params={"doctor_id": doctor_id, "period": period})
-        return rr.json().get("count", 0)
-    return 0
+            return {"type": parsed.get("type"), **r.json()}
+        error = r.text[:200]
+    except Exception as e:
+        error = str(e)
+    return {"type": parsed.get("type"), **spec, "totals": {}, "groups": [], "error": error}
 
 
-def call_stats_interpreted(parsed: dict, doctor_id: int | None) -> dict:
-    if parsed.get("type") == "list_times":
-        d = parsed.get("date") or _today().isoformat()
-        r = requests.get(f"{BASE_URL}/stats/appointments_times", params={"doctor_id": doctor_id, "date": d})
-        times = r.json() if r.status_code == 200 else []
-        # also fetch count for consistency checks
-        try:
-            rc = requests.get(f"{BASE_URL}/stats/appointments_count_on", params={"doctor_id": doctor_id, "date": d}, timeout=10)
-            cnt = rc.json().get("count", 0) if rc.status_code == 200 else 0
-        except Exception:
-            cnt = 0
-        return {"type": "list_times", "date": d, "times": times, "count": cnt}
-    if parsed.get("type") == "count_symptom":
-        params = {"keyword": parsed.get("keyword", "fever")}
-        if doctor_id:
-            params["doctor_id"] = doctor_id
-        if parsed.get("start_date") and parsed.get("end_date"):
-            params["start_date"] = parsed["start_date"]
-            params["end_date"] = parsed["end_date"]
-        elif parsed.get("date"):
-            params["start_date"] = parsed["date"]
-            params["end_date"] = parsed["date"]
-        r = requests.get(f"{BASE_URL}/stats/symptom_count", params=params)
-        return {"type": "count_symptom", "keyword": params["keyword"], "count": r.json().get("count", 0), "range": {k: params.get(k) for k in ("start_date","end_date","date") if params.get(k)}}
-    else:
-        if parsed.get("start_date") and parsed.get("end_date"):
-            start = datetime.strptime(parsed["start_date"], "%Y-%m-%d").date()
-            end = datetime.strptime(parsed["end_date"], "%Y-%m-%d").date()
-            total = 0
-            d = start
-            while d <= end:
-                total += _count_appointments_for_day(doctor_id, d.isoformat())
-                d += timedelta(days=1)
-            return {"type": "count_appointments", "count": total, "range": {"start_date": parsed["start_date"], "end_date": parsed["end_date"]}}
-        else:
-            day = parsed.get("date") or _today().isoformat()
-            c = _count_appointments_for_day(doctor_id, day)
-            return {"type": "count_appointments", "count": c, "date": day}
+def _when(stats: dict) -> str:
+    s, e = stats.get("start_date"), stats.get("end_date")
+    return f"on {s}" if s == e else f"between {s} and {e}"
+
+
+def _metric_phrase(metric: str, n: int, keyword: str | None) -> str:
+    if metric == "symptom":
+        return f"{n} patients with {keyword}"
+    return f"{n} {metric}"
 
 
 def summarize(parsed: dict, stats: dict) -> str:
+    if stats.get("error"):
+        return f"Could not compute the report {_when(stats)}."
+    totals, groups = stats.get("totals", {}), stats.get("groups", [])
     if stats.get("type") == "list_times":
-        times = stats.get("times", [])
-        if times:
-            human = ", ".join([f"{t['start_time']}–{t['end_time']}" for t in times])
-            return f"Appointments on {stats.get('date')}: {human}."
-        # fallback to count if available
-        cnt = stats.get("count", 0)
-        if cnt > 0:
-            return f"{cnt} appointments on {stats.get('date')}."
-        return f"No appointments on {stats.get('date')}."
-    if stats.get("type") == "count_symptom":
-        rng = stats.get("range", {})
-        if rng.get("start_date") and rng.get("end_date"):
-            return f"{stats['count']} patients with {stats['keyword']} between {rng['start_date']} and {rng['end_date']}."
-        d = rng.get("date") or parsed.get("date")
-        return f"{stats['count']} patients with {stats['keyword']} on {d}."
-    else:
-        if stats.get("range"):
-            r = stats["range"]
-            return f"{stats['count']} appointments between {r['start_date']} and {r['end_date']}."
-        return f"{stats['count']} appointments on {stats.get('date')}."
+        if groups:
+            human = ", ".join([f"{g['start_time']}–{g['end_time']}" for g in groups])
+            return f"Appointments {_when(stats)}: {human}."
+        return f"No appointments {_when(stats)}."
+    if stats.get("type") == "busiest_day" and "day" in stats.get("group_by", []):
+        metric = stats["metrics"][0]
+        best = max(groups, key=lambda g: g[metric], default=None)
+        if not best or not best[metric]:
+            return f"No {metric} {_when(stats)}."
+        return f"Busiest day {_when(stats)}: {best['date']} ({_metric_phrase(metric, best[metric], parsed.get('keyword'))})."
+    parts = [_metric_phrase(m, totals.get(m) or 0, parsed.get("keyword")) for m in stats.get("metrics", []) if totals.get(m) is not None]
+    if not parts and not groups:
+        return f"No data {_when(stats)}."
+    # distinct patients have no grouped total, so the breakdown carries the answer on its own
+    summary = f"{' and '.join(parts)} {_when(stats)}." if parts else f"{stats['metrics'][0].capitalize()} {_when(stats)} by {stats['group_by'][0]}:"
+    if groups and stats.get("group_by"):
+        metric = stats["metrics"][0]
+        label = {"day": "date", "doctor": "doctor_name", "status": "status"}
+        key = label.get(stats["group_by"][0], "date")
+        summary += " " + "; ".join(f"{g.get(key)}: {g[metric]}" for g in groups) + "."
+    return summary
 
 
 def _wa_send_text(to_number: str, message: str) -> requests.Response:
@@ -239,7 +183,7 @@ def run_report(prompt: str, doctor_id: int | None, channel: str = "in_app", to_n
     if channel == "whatsapp":
         notify("whatsapp", summary, to_number)
     try:
-        requests.post(f"{BASE_URL}/history/log", json={"role":"doctor","prompt":prompt,"response":summary})
+        requests.post(f"{BASE_URL}/history/log", json={"role":"doctor","prompt":prompt,"response":summary,"doctor_id":doctor_id})
     except Exception:
         pass
     return summary
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as dt_date
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Offline throughput of the patient agent LangGraph workflow using the stub LLM backend.")
+    p.add_argument("--turns", type=int, default=200, help="Single-turn conversations to run")
+    p.add_argument("--workers", type=int, default=8, help="Concurrent graph invocations")
+    p.add_argument("--doctors", type=int, default=10)
+    p.add_argument("--days", type=int, default=7)
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Artificial latency per stubbed LLM call")
+    p.add_argument("--llm-fixtures", default=None, help="Replay recorded fixtures (LLM_BACKEND=record output) instead of generated responses")
+    p.add_argument("--database-url", default=None, help="Defaults to a temporary seeded SQLite file")
+    p.add_argument("--port", type=int, default=8000, help="app.py port; the agent calls back to localhost:8000")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+
+    from langchain_core.messages import HumanMessage
+    from scripts.seed_synthetic import seed_synthetic
+    from scripts.loadtest import Workload, install_stub_llm, load_entities, _load_app_py, _serve
+    import agent
+
+    start = dt_date.today()
+    seed_synthetic(args.doctors, 50, args.days, start, history_days=0, reset=True)
+    doctor_ids, doctor_names, patient_ids = load_entities()
+    workload = Workload(doctor_ids, doctor_names, patient_ids, start, args.days, seed=7)
+    stub = install_stub_llm(workload, args.llm_fixtures, args.llm_latency_ms)
+    _serve(_load_app_py(), args.port)
+
+    def turn(i: int) -> float:
+        msg = workload.messages[i % len(workload.messages)]
+        t0 = time.perf_counter()
+        agent.app.invoke({"messages": [HumanMessage(content=msg)]}, {"recursion_limit": 50})
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        latencies = sorted(pool.map(turn, range(args.turns)))
+    elapsed = time.perf_counter() - t0
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+    print(json.dumps({
+        "turns": args.turns,
+        "workers": args.workers,
+        "seconds": round(elapsed, 3),
+        "turns_per_s": round(args.turns / elapsed, 2),
+        "p50_ms": pct(0.5),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "llm_calls": stub.hits + stub.misses,
+        "llm_fixture_misses": stub.misses,
+    }, indent=2))
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+from datetime import date as dt_date
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# What the LLM would return for each scenario message in scripts/patient_agent_assert_tests.py
+PARSES = {
+    "What doctors are available today?": {"intent": "list_doctors", "date": "today"},
+    "Show me availability next week": {"intent": "list_doctors"},
+    "Who is available on 2025-08-25 between 10am and 3pm?": {"intent": "list_doctors", "date": "2025-08-25"},
+    "Is Dr. Nobody available tomorrow?": {"intent": "check_availability", "doctor_name": "Dr. Nobody", "date": "tomorrow"},
+    "I want to see Dr. Ahuja": {"intent": "check_availability", "doctor_name": "Dr. Ahuja"},
+    "tomorrow morning": {"intent": "check_availability", "date": "tomorrow", "time_period": "morning"},
+    "Book Dr. Nobody tomorrow at 10am for ghost@example.com": {"intent": "book_appointment", "doctor_name": "Dr. Nobody", "date": "tomorrow", "start_time": "10am", "patient_email": "ghost@example.com"},
+}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Count LLM invocations per patient-agent scenario (regression gate for redundant calls).")
+    p.add_argument("--max-calls-per-turn", type=int, default=None, help="Fail if any turn exceeds this (default AGENT_LLM_BUDGET)")
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Artificial latency per stubbed LLM call, to compare turn time with call count")
+    p.add_argument("--port", type=int, default=None, help="Port for the in-process app.py server (default: a free port)")
+    return p.parse_args()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    args = parse_args()
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+
+    from app.config import settings
+    from app.db import engine
+    from app import models
+    from app.integrations.llm import StubLLM, use_llm
+    from scripts.seed_synthetic import seed_synthetic
+    from scripts.loadtest import _load_app_py, _serve
+    import agent
+    from scripts.patient_agent_assert_tests import SCENARIOS, invoke_turns
+
+    seed_synthetic(3, 10, 3, dt_date.today(), history_days=0, reset=True)
+    with engine.begin() as conn:
+        conn.execute(models.Doctor.__table__.insert().values(name="Dr. Ahuja", specialization="General"))
+    port = args.port or _free_port()
+    _serve(_load_app_py(), port)
+    agent.BASE_URL = f"http://127.0.0.1:{port}"
+
+    stub = StubLLM({}, latency_ms=args.llm_latency_ms)
+    for msg, parsed in PARSES.items():
+        stub.add(agent.parse_prompt(msg), json.dumps(parsed))
+    use_llm(stub)
+
+    limit = args.max_calls_per_turn or settings.agent_llm_budget
+    report = {"max_calls_per_turn": limit, "scenarios": {}}
+    failed = []
+    for name, turns in SCENARIOS.items():
+        before = stub.hits + stub.misses
+        t0 = time.perf_counter()
+        error = None
+        try:
+            state = invoke_turns(turns)
+            last = state['messages'][-1].content if state.get('messages') else ""
+        except Exception as e:
+            error, last = f"{type(e).__name__}: {e}"[:200], None
+        calls = stub.hits + stub.misses - before
+        report["scenarios"][name] = {"turns": len(turns), "llm_calls": calls, "seconds": round(time.perf_counter() - t0, 3), "last_message": last, "error": error}
+        if error or calls > limit * len(turns):
+            failed.append(name)
+    report["failed"] = failed
+    print(json.dumps(report, indent=2))
+    tmp.cleanup()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
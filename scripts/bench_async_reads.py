@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from datetime import date, time as dt_time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Compare sync (threadpool) vs async read endpoints under concurrent load.")
+    p.add_argument("--clients", type=int, default=500, help="Concurrent clients")
+    p.add_argument("--requests", type=int, default=10, help="Requests per client")
+    p.add_argument("--database-url", default=None, help="Defaults to a temporary seeded SQLite file")
+    p.add_argument("--doctors", type=int, default=20)
+    p.add_argument("--patients", type=int, default=200)
+    return p.parse_args()
+
+
+def seed(n_doctors: int, n_patients: int):
+    from app.db import SessionLocal, init_db
+    from app import models
+    init_db()
+    db = SessionLocal()
+    try:
+        if db.query(models.Doctor).count():
+            return
+        docs = [models.Doctor(name=f"Dr. Bench {i}", specialization="General") for i in range(n_doctors)]
+        db.add_all(docs)
+        db.add_all([models.Patient(name=f"Patient {i}", email=f"bench{i}@example.com") for i in range(n_patients)])
+        db.flush()
+        today = date.today()
+        for d in docs:
+            for h in range(9, 17):
+                db.add(models.DoctorAvailability(doctor_id=d.doctor_id, available_date=today, start_time=dt_time(h, 0), end_time=dt_time(h, 30), is_booked=False))
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync_app():
+    # Baseline: the same reads as plain `def` endpoints on the blocking session
+    from fastapi import FastAPI, Depends
+    from sqlalchemy import func as sa_func
+    from app.db import get_db
+    from app import models
+
+    api = FastAPI()
+
+    @api.get("/doctors")
+    def doctors(db=Depends(get_db)):
+        return [{"doctor_id": d.doctor_id, "name": d.name} for d in db.query(models.Doctor).all()]
+
+    @api.get("/doctors/{doctor_id}/availability/{day}")
+    def availability(doctor_id: int, day: date, db=Depends(get_db)):
+        rows = db.query(models.DoctorAvailability).filter(models.DoctorAvailability.doctor_id == doctor_id, models.DoctorAvailability.available_date == day, models.DoctorAvailability.is_booked == False).all()
+        return [{"start_time": str(r.start_time)} for r in rows]
+
+    @api.get("/analytics/count")
+    def count(date: date, db=Depends(get_db)):
+        return {"count": db.query(sa_func.count(models.Appointment.appointment_id)).filter(models.Appointment.appointment_date == date).scalar()}
+
+    return api
+
+
+async def drive(api, clients: int, per_client: int) -> dict:
+    import httpx
+    today = date.today().isoformat()
+    paths = ["/doctors", f"/doctors/1/availability/{today}", f"/analytics/count?date={today}"]
+    latencies: list[float] = []
+    errors = 0
+
+    async def client(i: int):
+        nonlocal errors
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api), base_url="http://bench") as c:
+            for j in range(per_client):
+                t0 = time.perf_counter()
+                r = await c.get(paths[(i + j) % len(paths)])
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+    return {"requests": len(latencies), "errors": errors, "seconds": round(elapsed, 3), "rps": round(len(latencies) / elapsed, 1), "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+
+def main():
+    args = parse_args()
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    # Size pools for the load so the comparison measures threadpool vs event loop, not pool starvation
+    os.environ.setdefault("DB_POOL_SIZE", "20")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "40")
+    seed(args.doctors, args.patients)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from app.main import app as async_app
+    results = {"clients": args.clients, "requests_per_client": args.requests}
+    results["sync"] = asyncio.run(drive(sync_app(), args.clients, args.requests))
+    results["async"] = asyncio.run(drive(async_app, args.clients, args.requests))
+    print(json.dumps(results, indent=2))
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.config import settings
+from app.integrations.llm import estimate_tokens
+from app.services.candidates import rank, clear_winner, build_choice_prompt
+from scripts.generate_data import patient_rows, doctor_rows
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Compare llm_choose_id prompt size (full list vs ranked, budgeted) and local skip rate.")
+    p.add_argument("--patients", type=int, default=5000)
+    p.add_argument("--doctors", type=int, default=200)
+    p.add_argument("--queries", type=int, default=50, help="Lookups per kind")
+    p.add_argument("--seed", type=int, default=7)
+    return p.parse_args()
+
+
+def _typo(s: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(s))
+    return s[:i] + s[i + 1:]
+
+
+def _bench(kind: str, rows: list, queries: list[str]) -> dict:
+    legacy = f"From this {kind} list, return ONLY a JSON with id field for the best match to: {queries[0]}.\nCandidates: {json.dumps(rows)}"
+    ms, tokens, skipped = [], [], 0
+    for q in queries:
+        t0 = time.perf_counter()
+        ranked = rank(q, rows, kind, settings.agent_choose_top_k)
+        if clear_winner(ranked, settings.agent_choose_min_score, settings.agent_choose_margin) is not None:
+            skipped += 1
+        else:
+            tokens.append(build_choice_prompt(q, ranked, kind, settings.agent_choose_token_budget)[2])
+        ms.append((time.perf_counter() - t0) * 1000)
+    ms.sort()
+    return {
+        "candidates": len(rows),
+        "legacy_prompt_tokens": estimate_tokens(legacy),
+        "budgeted_prompt_tokens_max": max(tokens) if tokens else 0,
+        "llm_skip_rate": round(skipped / len(queries), 3),
+        "rank_ms_p50": round(ms[len(ms) // 2], 2),
+        "rank_ms_max": round(ms[-1], 2),
+    }
+
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    patients = [{"patient_id": i + 1, **r} for i, r in enumerate(patient_rows(args.patients))]
+    doctors = [{"doctor_id": i + 1, **r} for i, r in enumerate(doctor_rows(args.doctors))]
+    p_queries = [_typo(p["email"], rnd) for p in rnd.sample(patients, args.queries)]
+    d_queries = [_typo(d["name"], rnd) for d in rnd.sample(doctors, args.queries)]
+    report = {
+        "token_budget": settings.agent_choose_token_budget,
+        "top_k": settings.agent_choose_top_k,
+        "patients": _bench("patients", patients, p_queries),
+        "doctors": _bench("doctors", doctors, d_queries),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
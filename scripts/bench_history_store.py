@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.history_store import HistoryStore, SCHEMA
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark prompt-history write throughput (connect-per-call vs HistoryStore).")
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--writes", type=int, default=500, help="Writes per thread")
+    return p.parse_args()
+
+
+def run_threads(n_threads: int, fn) -> float:
+    threads = [threading.Thread(target=fn) for _ in range(n_threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def bench_connect_per_call(path: str, n_threads: int, writes: int) -> float:
+    # Mirrors the previous app.py behaviour: open, insert, commit, close per call
+    conn = sqlite3.connect(path)
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    conn.commit()
+    conn.close()
+
+    def worker():
+        for i in range(writes):
+            c = sqlite3.connect(path, timeout=30)
+            c.execute("INSERT INTO prompts(role, prompt, response, created_at) VALUES (?,?,?,?)", ("doctor", f"prompt {i}", "ok", datetime.utcnow().isoformat()))
+            c.commit()
+            c.close()
+
+    return run_threads(n_threads, worker)
+
+
+def bench_store(path: str, n_threads: int, writes: int) -> float:
+    store = HistoryStore(path)
+
+    def worker():
+        for i in range(writes):
+            store.log_prompt("doctor", f"prompt {i}", "ok")
+
+    elapsed = run_threads(n_threads, worker)
+    t0 = time.perf_counter()
+    store.flush()
+    elapsed += time.perf_counter() - t0
+    store.close()
+    return elapsed
+
+
+def main():
+    args = parse_args()
+    total = args.threads * args.writes
+    results = {"threads": args.threads, "writes": total}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in (("connect_per_call", bench_connect_per_call), ("history_store", bench_store)):
+            elapsed = fn(os.path.join(tmp, f"{name}.db"), args.threads, args.writes)
+            results[name] = {"seconds": round(elapsed, 4), "writes_per_sec": round(total / elapsed, 1)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import date as dt_date, timedelta
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Slots/sec for template expansion + bulk write vs the old SELECT-then-INSERT per slot.")
+    p.add_argument("--doctors", type=int, default=200)
+    p.add_argument("--days", type=int, default=90)
+    p.add_argument("--legacy-doctors", type=int, default=5, help="Doctors to run through the row-by-row path (it is slow)")
+    p.add_argument("--database-url", default=None, help="Target database (default: a temporary SQLite file). Tables are recreated.")
+    return p.parse_args()
+
+
+def legacy_insert(conn, rows: list[tuple]) -> int:
+    # What ensure_slot / ensure_availability did: one SELECT and one INSERT per slot
+    from app import models
+    t = models.DoctorAvailability.__table__
+    added = 0
+    for did, day, st, et in rows:
+        found = conn.execute(
+            t.select().with_only_columns(t.c.availability_id).where(t.c.doctor_id == did, t.c.available_date == day, t.c.start_time == st, t.c.end_time == et)
+        ).first()
+        if found:
+            continue
+        conn.execute(t.insert().values(doctor_id=did, available_date=day, start_time=st, end_time=et, is_booked=False))
+        added += 1
+    return added
+
+
+def run(url: str, doctors: int, days: int, legacy_doctors: int) -> dict:
+    os.environ["DATABASE_URL"] = url
+    from app.db import engine, Base, init_db
+    from app import models
+    from app.services.schedule import WeeklyTemplate, expand, write_slots
+
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(models.Doctor.__table__.insert(), [{"name": f"Dr. Bench{i:04d}", "specialization": "General"} for i in range(doctors)])
+        doc_ids = [r[0] for r in conn.execute(models.Doctor.__table__.select().with_only_columns(models.Doctor.doctor_id))]
+
+    tpl = WeeklyTemplate({d: [("09:00", "13:00"), ("14:00", "17:00")] for d in ("mon", "tue", "wed", "thu", "fri")}, 30)
+    start = dt_date.today()
+    end = start + timedelta(days=days - 1)
+    out = {"doctors": doctors, "days": days}
+
+    t0 = time.perf_counter()
+    rows = expand({did: tpl for did in doc_ids}, start, end)
+    expand_s = time.perf_counter() - t0
+    out["expand"] = {"slots": len(rows), "seconds": round(expand_s, 4), "slots_per_sec": round(len(rows) / expand_s, 1)}
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        added = write_slots(conn, rows)
+    write_s = time.perf_counter() - t0
+    out["bulk_write"] = {"added": added, "seconds": round(write_s, 4), "slots_per_sec": round(len(rows) / write_s, 1)}
+
+    # Re-running is a no-op thanks to ON CONFLICT DO NOTHING
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        again = write_slots(conn, rows)
+    out["bulk_rewrite"] = {"added": again, "seconds": round(time.perf_counter() - t0, 4)}
+
+    legacy_rows = expand({did: tpl for did in doc_ids[:legacy_doctors]}, end + timedelta(days=1), end + timedelta(days=days))
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        legacy_insert(conn, legacy_rows)
+    legacy_s = time.perf_counter() - t0
+    out["legacy_row_by_row"] = {"slots": len(legacy_rows), "seconds": round(legacy_s, 4), "slots_per_sec": round(len(legacy_rows) / legacy_s, 1) if legacy_s else None}
+    engine.dispose()
+    return out
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        print(json.dumps(run(args.database_url, args.doctors, args.days, args.legacy_doctors), indent=2))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        print(json.dumps(run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.doctors, args.days, args.legacy_doctors), indent=2))
+
+
+if __name__ == "__main__":
+    main()
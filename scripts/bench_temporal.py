@@ -0,0 +1,68 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta, date as dt_date
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.temporal import parse_date, parse_time, cache_clear
+
+PHRASES = ["today", "tomorrow", "2025-08-25", "26th", "August 26", "26 august 2025", "25/08/2025", "friday", "next week", "in 3 days"]
+TIMES = ["10am", "10:30", "2:30 pm", "14:00:00", "noon"]
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Parses/sec for the shared temporal parser vs the old strptime loop.")
+    p.add_argument("--iterations", type=int, default=20000)
+    return p.parse_args()
+
+
+def legacy_normalize_date(s):
+    # The per-call strptime loop the callers used before app/services/temporal.py
+    sl = re.sub(r"(\d+)(st|nd|rd|th)", r"\1", s.strip().lower())
+    today = dt_date.today()
+    if sl == "today":
+        return today.isoformat()
+    if sl == "tomorrow":
+        return (today + timedelta(days=1)).isoformat()
+    for fmt in ["%Y-%m-%d", "%d %B %Y", "%B %d %Y", "%d %B", "%B %d", "%d-%m-%Y", "%d/%m/%Y"]:
+        try:
+            dt = datetime.strptime(sl.title() if "%B" in fmt else sl, fmt)
+            if "%Y" not in fmt:
+                dt = dt.replace(year=today.year)
+            return dt.date().isoformat()
+        except Exception:
+            continue
+    return None
+
+
+def _rate(fn, inputs, n, before=None) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        if before:
+            before()
+        fn(inputs[i % len(inputs)])
+    return round(n / (time.perf_counter() - t0))
+
+
+def main():
+    args = parse_args()
+    n = args.iterations
+    report = {
+        "iterations": n,
+        "legacy_dates_per_sec": _rate(legacy_normalize_date, PHRASES, n),
+        "dates_per_sec_uncached": _rate(parse_date, PHRASES, n, before=cache_clear),
+        "dates_per_sec_cached": _rate(parse_date, PHRASES, n),
+        "times_per_sec_cached": _rate(parse_time, TIMES, n),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import io
+import os
+import gzip
+import json
+import hashlib
+
+# File layout shared by export_postgres_to_csv.py and import_csv_to_postgres.py:
+# <export>/manifest.json + <export>/<schema>/<table>.csv[.gz|.zst]
+
+MANIFEST = "manifest.json"
+# Table in the target schema recording which exports have been applied (never exported itself)
+IMPORT_LOG = "_import_log"
+EXTENSIONS = {"none": ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+CHUNK = 1 << 20
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard)") from e
+    return zstandard
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs the 'pyarrow' package (pip install pyarrow)") from e
+    return pyarrow
+
+
+# Postgres type OIDs -> Arrow types; anything else is exported as text
+PG_ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32", 700: "float32", 701: "float64", 1700: "float64",
+    1082: "date32", 1083: "time_us", 1114: "timestamp_us", 1184: "timestamp_us_utc",
+}
+# Tables written as month partitions (<table>/month=YYYY-MM/part-N.parquet) on this date column
+PARQUET_PARTITIONS = {"appointments": "appointment_date", "doctor_availability": "available_date"}
+
+
+def arrow_type(oid: int):
+    pa = _pyarrow()
+    name = PG_ARROW_TYPES.get(oid)
+    if name == "time_us":
+        return pa.time64("us")
+    if name == "timestamp_us":
+        return pa.timestamp("us")
+    if name == "timestamp_us_utc":
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, name)() if name else pa.string()
+
+
+def compression_of(path: str) -> str:
+    for name, ext in EXTENSIONS.items():
+        if name != "none" and path.endswith(ext):
+            return name
+    return "none"
+
+
+class _HashingFile:
+    # Hashes and counts the bytes that actually reach disk (i.e. after compression)
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+class ExportWriter:
+    # Binary sink for COPY ... TO STDOUT that compresses on the fly; use as a context manager
+    def __init__(self, path: str, compression: str = "none", level: int | None = None):
+        self.path = path
+        self._raw = open(path, "wb")
+        self._hashed = _HashingFile(self._raw)
+        if compression == "gzip":
+            self._sink = gzip.GzipFile(fileobj=self._hashed, mode="wb", compresslevel=level or 6, mtime=0)
+        elif compression == "zstd":
+            self._sink = _zstd().ZstdCompressor(level=level or 3).stream_writer(self._hashed, closefd=False)
+        else:
+            self._sink = self._hashed
+
+    def write(self, data) -> int:
+        return self._sink.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def close(self) -> dict:
+        if self._sink is not self._hashed:
+            self._sink.close()
+        self._raw.close()
+        return {"sha256": self._hashed.sha256.hexdigest(), "bytes": self._hashed.bytes}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self._raw.closed:
+            self.close()
+
+
+class ParquetTableWriter:
+    # Streams row batches into typed Parquet files, split into month partitions when partition_by is set
+    def __init__(self, out_dir: str, columns: list[str], types: list, partition_by: str | None = None, compression: str = "zstd"):
+        pa = _pyarrow()
+        self.out_dir = out_dir
+        self.schema = pa.schema([pa.field(c, t) for c, t in zip(columns, types)])
+        self.partition_by = partition_by if partition_by in columns else None
+        self.compression = compression
+        self.rows = 0
+        self._writers = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _writer(self, part: str):
+        w = self._writers.get(part)
+        if w is None:
+            pq = _pyarrow().parquet
+            rel = f"{part}/part-0.parquet" if part else "part-0.parquet"
+            path = os.path.join(self.out_dir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            w = self._writers[part] = (rel, pq.ParquetWriter(path, self.schema, compression=self.compression))
+        return w[1]
+
+    def write_rows(self, rows: list[tuple]):
+        if not rows:
+            return
+        pa = _pyarrow()
+        pc = pa.compute
+        arrays = []
+        for field, col in zip(self.schema, zip(*rows)):
+            # numeric -> float and unmapped types -> text; everything else converts natively
+            if pa.types.is_floating(field.type):
+                col = [None if v is None else float(v) for v in col]
+            elif pa.types.is_string(field.type):
+                col = [None if v is None else str(v) for v in col]
+            arrays.append(pa.array(col, type=field.type))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self.rows += table.num_rows
+        if not self.partition_by:
+            self._writer("").write_table(table)
+            return
+        months = pc.strftime(pc.cast(table[self.partition_by], pa.timestamp("s")), format="%Y-%m")
+        for month in pc.unique(months).to_pylist():
+            mask = pc.is_null(months) if month is None else pc.equal(months, month)
+            self._writer(f"month={month or 'null'}").write_table(table.filter(mask))
+
+    def close(self) -> dict:
+        if not self._writers:
+            # keep the typed schema readable for empty tables
+            self._writer("").write_table(self.schema.empty_table())
+        files = {}
+        for rel, w in self._writers.values():
+            w.close()
+            files[rel] = file_sha256(os.path.join(self.out_dir, rel))
+        return {"rows": self.rows, "files": files, "partition_by": self.partition_by}
+
+
+def open_export(path: str):
+    # Text stream over a plain or compressed CSV, decompressed lazily
+    compression = compression_of(path)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    if compression == "zstd":
+        raw = open(path, "rb")
+        return io.TextIOWrapper(_zstd().ZstdDecompressor().stream_reader(raw, closefd=True), encoding="utf-8-sig", newline="")
+    return open(path, newline="", encoding="utf-8-sig")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_manifest(export_dir: str, manifest: dict):
+    tmp = os.path.join(export_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(export_dir, MANIFEST))
+
+
+def load_manifest(path: str) -> tuple[str, dict] | None:
+    # Accepts the export root or its <schema> subdirectory; returns (export root, manifest)
+    for root in (path, os.path.dirname(os.path.abspath(path))):
+        candidate = os.path.join(root, MANIFEST)
+        if os.path.isfile(candidate):
+            with open(candidate, encoding="utf-8") as f:
+                return root, json.load(f)
+    return None
+
+
+def latest_export(base_outdir: str, dbname: str | None = None, exclude: str | None = None) -> tuple[str, dict] | None:
+    # Newest export under base_outdir that has a manifest, optionally for one database
+    best = None
+    if not os.path.isdir(base_outdir):
+        return None
+    for name in os.listdir(base_outdir):
+        root = os.path.join(base_outdir, name)
+        if not os.path.isdir(root) or (exclude and os.path.abspath(root) == os.path.abspath(exclude)):
+            continue
+        found = load_manifest(root)
+        if not found or found[0] != root or (dbname and found[1].get("database") != dbname):
+            continue
+        if best is None or found[1].get("created_at", "") > best[1].get("created_at", ""):
+            best = found
+    return best
+
+
+def export_chain(root: str) -> list[tuple[str, dict]]:
+    # [(full export), delta, delta, ..., root]: follows each manifest's "base" to a sibling directory
+    chain = []
+    seen = set()
+    found = load_manifest(root)
+    while found:
+        path, manifest = found
+        if path in seen:
+            raise ValueError(f"Export chain loops at {path}")
+        seen.add(path)
+        chain.append(found)
+        if manifest.get("kind") != "delta":
+            break
+        base = manifest.get("base")
+        parent = os.path.join(os.path.dirname(os.path.abspath(path)), base) if base else None
+        found = load_manifest(parent) if parent and os.path.isdir(parent) else None
+        if found is None or found[0] != parent:
+            raise ValueError(f"{path}: base export {base!r} not found next to it")
+    chain.reverse()
+    return chain
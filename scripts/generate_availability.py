@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date as dt_date, datetime, timedelta, time as dt_time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Templates file: {"default": {...}, "doctors": {"<doctor_id>": {...}}}, each template being
+# {"hours": {"mon": [["09:00", "13:00"], ["14:00", "17:00"]], ...}, "slot_minutes": 30, "exceptions": {"2025-12-25": []}}
+# With --store-templates, "exceptions" may only close whole days ([]) and a top-level "holidays": ["2025-12-25"]
+# closes a day for every doctor.
+DEFAULT_TEMPLATE = {"hours": {d: [["09:00", "17:00"]] for d in ("mon", "tue", "wed", "thu", "fri")}, "slot_minutes": 30}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Expand weekly schedule templates into doctor_availability rows in bulk.")
+    p.add_argument("--templates", default=None, help="JSON templates file (default: Mon-Fri 09:00-17:00, 30-minute slots)")
+    p.add_argument("--start", default=None, help="First day (YYYY-MM-DD, default today)")
+    p.add_argument("--days", type=int, default=91)
+    p.add_argument("--store-templates", action="store_true", help="Save the templates in doctor_schedule_templates/exceptions instead of writing slot rows; slots are then computed on request")
+    p.add_argument("--database-url", default=None, help="Overrides DATABASE_URL")
+    return p.parse_args()
+
+
+def store_templates(spec: dict, start: dt_date, days: int) -> dict:
+    # Replaces each doctor's templates with ones effective from start for `days` days, and the doctors'
+    # exceptions and clinic holidays in that window (or on the dates being written), so reruns don't duplicate
+    from app.db import SessionLocal
+    from app import models
+    from app.services.temporal import WEEKDAYS
+    from sqlalchemy import or_
+    T, X = models.DoctorScheduleTemplate, models.DoctorScheduleException
+    end = start + timedelta(days=days - 1)
+    db = SessionLocal()
+    try:
+        doctor_ids = [d for (d,) in db.query(models.Doctor.doctor_id)]
+        templates, exceptions = [], []
+        for did in doctor_ids:
+            tpl = (spec.get("doctors") or {}).get(str(did)) or spec.get("default")
+            if not tpl:
+                continue
+            for day, spans in (tpl.get("hours") or {}).items():
+                weekday = WEEKDAYS[day.lower()] if isinstance(day, str) and not day.isdigit() else int(day)
+                for st, et in spans:
+                    templates.append(T(doctor_id=did, weekday=weekday, start_time=dt_time.fromisoformat(st), end_time=dt_time.fromisoformat(et), slot_minutes=int(tpl.get("slot_minutes") or 30), effective_from=start, effective_to=end))
+            for d, hours in (tpl.get("exceptions") or {}).items():
+                if hours:
+                    raise SystemExit("--store-templates only supports whole-day exceptions ([])")
+                exceptions.append(X(doctor_id=did, exception_date=dt_date.fromisoformat(d), kind="leave"))
+        exceptions += [X(doctor_id=None, exception_date=dt_date.fromisoformat(d), kind="holiday") for d in spec.get("holidays") or []]
+        db.query(T).filter(T.doctor_id.in_(doctor_ids)).delete(synchronize_session=False)
+        dates = {x.exception_date for x in exceptions}
+        in_window = or_(X.exception_date.between(start, end), X.exception_date.in_(dates))
+        db.query(X).filter(or_(X.doctor_id.in_(doctor_ids), X.doctor_id.is_(None)), in_window).delete(synchronize_session=False)
+        db.add_all(templates + exceptions)
+        db.commit()
+        return {"doctors": len(doctor_ids), "templates": len(templates), "exceptions": len(exceptions)}
+    finally:
+        db.close()
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from app.db import engine, init_db
+    from app import models
+    from app.services.schedule import WeeklyTemplate, expand, write_slots
+
+    spec = {"default": DEFAULT_TEMPLATE}
+    if args.templates:
+        with open(args.templates, encoding="utf-8") as f:
+            spec = json.load(f)
+    default = WeeklyTemplate.from_dict(spec["default"]) if spec.get("default") else None
+    per_doctor = {int(k): WeeklyTemplate.from_dict(v) for k, v in (spec.get("doctors") or {}).items()}
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else dt_date.today()
+
+    init_db()
+    if args.store_templates:
+        print(json.dumps(store_templates(spec, start, args.days)))
+        return
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        doctor_ids = [r[0] for r in conn.execute(models.Doctor.__table__.select().with_only_columns(models.Doctor.doctor_id))]
+        templates = {d: per_doctor.get(d, default) for d in doctor_ids if per_doctor.get(d, default)}
+        rows = expand(templates, start, start + timedelta(days=args.days - 1))
+        added = write_slots(conn, rows)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"doctors": len(templates), "slots": len(rows), "added": added, "seconds": round(elapsed, 3), "slots_per_sec": round(len(rows) / elapsed, 1) if elapsed else None}))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,24 +3,56 @@ from datetime import datetime, timedelta
 
 random.seed(42)
 
+SPECIALIZATIONS = ('General', 'Pediatrics', 'Cardiology', 'Dermatology', 'Orthopedics')
+REPORT_TOPICS = (
+	("Fever and cough", "Viral infection suspected"),
+	("Back pain", "Muscle strain"),
+	("Headache", "Migraine"),
+	("Sore throat", "Pharyngitis"),
+	("Fatigue", "Anemia workup suggested"),
+	("Skin rash", "Allergic reaction"),
+	("Stomach ache", "Gastritis"),
+)
+
+
+def patient_rows(n: int = 50) -> list[dict]:
+	return [{'name': f'Patient {i}', 'email': f'patient{i}@example.com', 'phone': f'+9100000{i:04d}'} for i in range(1, n+1)]
+
+
+def doctor_rows(n: int) -> list[dict]:
+	# Names are unique substrings so name lookups resolve to exactly one doctor
+	return [{'name': f'Dr. Synth{i:03d}', 'specialization': SPECIALIZATIONS[i % len(SPECIALIZATIONS)], 'email': f'synth{i:03d}@clinic.example'} for i in range(1, n+1)]
+
+
+def slot_times(day_start: int = 9, day_end: int = 17, slot_minutes: int = 30) -> list[tuple[str, str]]:
+	out = []
+	t = datetime(2000, 1, 1, day_start)
+	end = datetime(2000, 1, 1, day_end)
+	while t + timedelta(minutes=slot_minutes) <= end:
+		nxt = t + timedelta(minutes=slot_minutes)
+		out.append((t.strftime('%H:%M:%S'), nxt.strftime('%H:%M:%S')))
+		t = nxt
+	return out
+
+
 def generate_patients_csv(path: str, n: int = 50):
 	with open(path, 'w', newline='', encoding='utf-8') as f:
 		w = csv.writer(f)
 		w.writerow(['name','email','phone'])
-		for i in range(1, n+1):
-			w.writerow([f'Patient {i}', f'patient{i}@example.com', f'+9100000{i:04d}'])
+		for r in patient_rows(n):
+			w.writerow([r['name'], r['email'], r['phone']])
 
 
-def generate_schedule_csv(path: str):
+def generate_schedule_csv(path: str, doctors=('Dr. Ahuja','Dr. Mehra'), days: int = 5, hours=(9,10,11,14,15,16)):
 	with open(path, 'w', newline='', encoding='utf-8') as f:
 		w = csv.writer(f)
 		w.writerow(['doctor_name','date','start_time','end_time'])
 		start = datetime.utcnow().date()
-		for doc in ('Dr. Ahuja','Dr. Mehra'):
-			for day in range(0,5):
+		for doc in doctors:
+			for day in range(0,days):
 				dt = start + timedelta(days=day)
-				for hh in (9,10,11,14,15,16):
-					w.writerow([doc, dt.isoformat(), f"{hh:02d}:00:00", f"{hh:02d}:30:00"]) 
+				for hh in hours:
+					w.writerow([doc, dt.isoformat(), f"{hh:02d}:00:00", f"{hh:02d}:30:00"])
 
 if __name__ == '__main__':
 	generate_patients_csv('patients.csv')
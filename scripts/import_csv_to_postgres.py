@@ -1,26 +1,61 @@
 import os
 import sys
-import argparse
 import csv
-from typing import List, Dict, Any
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import psycopg2
-from psycopg2.extras import execute_values
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.export_files import EXTENSIONS, IMPORT_LOG, open_export, load_manifest, file_sha256, export_chain
+from app.services.visit_summary import rebuild_sql
+from app.services.report_cache import bump_sql
+from app.services.schedule import SLOT_KEY
 
 
 TABLE_ORDER = [
     "doctors",
     "patients",
     "doctor_availability",
+    "doctor_schedule_templates",
+    "doctor_schedule_exceptions",
     "appointments",
     "patient_reports",
+    "patient_visit_summary",
 ]
 
 PRIMARY_KEYS = {
     "doctors": "doctor_id",
     "patients": "patient_id",
     "doctor_availability": "availability_id",
+    "doctor_schedule_templates": "template_id",
+    "doctor_schedule_exceptions": "exception_id",
     "appointments": "appointment_id",
     "patient_reports": "report_id",
+    "patient_visit_summary": "patient_id",
+}
+
+# Unique keys besides the primary key; ON CONFLICT takes a single target, so staged rows that collide
+# on one of these under a different primary key are skipped (and reported) instead of failing the table
+UNIQUE_KEYS = {
+    "doctor_availability": SLOT_KEY,
+}
+
+# Parent tables each table references; tables on the same level load in parallel
+FOREIGN_KEYS = {
+    "doctors": (),
+    "patients": (),
+    "doctor_availability": ("doctors",),
+    "doctor_schedule_templates": ("doctors",),
+    "doctor_schedule_exceptions": ("doctors",),
+    "appointments": ("doctors", "patients"),
+    "patient_reports": ("appointments",),
+    "patient_visit_summary": ("patients", "doctors"),
 }
 
 
@@ -37,17 +72,18 @@ def parse_args() -> argparse.Namespace:
         help="Directory that contains public/*.csv. If not provided, auto-select the latest under exports/",
     )
     parser.add_argument("--schema", default=os.getenv("PGSCHEMA", "public"), help="Target schema (default: public)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Processes loading independent tables concurrently")
+    parser.add_argument("--json", action="store_true", help="Print the per-table report as JSON")
+    parser.add_argument("--no-verify", action="store_true", help="Skip manifest checksum / row count verification")
     return parser.parse_args()
 
 
+def conn_params(args: argparse.Namespace) -> dict:
+    return {"host": args.host, "port": args.port, "user": args.user, "password": args.password, "dbname": args.dbname}
+
+
 def connect_db(args: argparse.Namespace):
-    conn = psycopg2.connect(
-        host=args.host,
-        port=args.port,
-        user=args.user,
-        password=args.password,
-        dbname=args.dbname,
-    )
+    conn = psycopg2.connect(**conn_params(args))
     conn.autocommit = True
     return conn
 
@@ -66,38 +102,112 @@ def find_latest_export_dir(base: str = "exports") -> str | None:
     return cand if os.path.isdir(cand) else None
 
 
-def coerce_value(table: str, col: str, value: str) -> Any:
-    if value == "":
-        return None
-    low = value.strip().lower()
-    if table == "doctor_availability" and col == "is_booked":
-        if low in ("true", "t", "1", "yes"):
-            return True
-        if low in ("false", "f", "0", "no"):
-            return False
-    return value
-
-
-def read_csv_rows(csv_path: str, table: str) -> tuple[list[str], list[list[Any]]]:
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        cols = reader.fieldnames or []
-        rows: list[list[Any]] = []
-        for r in reader:
-            rows.append([coerce_value(table, c, r.get(c, "")) for c in cols])
-        return cols, rows
-
-
-def insert_rows(conn, schema: str, table: str, columns: List[str], rows: List[List[Any]]):
-    if not rows:
-        return 0
+def fk_levels(tables: list[str]) -> list[list[str]]:
+    # Group tables so every table's parents are loaded in an earlier level
+    done: set[str] = set()
+    levels = []
+    pending = [t for t in TABLE_ORDER if t in tables]
+    while pending:
+        level = [t for t in pending if all(p in done or p not in tables for p in FOREIGN_KEYS.get(t, ()))]
+        if not level:
+            raise ValueError(f"Circular foreign keys among: {', '.join(pending)}")
+        levels.append(level)
+        done.update(level)
+        pending = [t for t in pending if t not in done]
+    return levels
+
+
+def read_header(f) -> list[str]:
+    # Only the header line is parsed in Python; the rest of the file is streamed to COPY untouched
+    return next(csv.reader([f.readline()]), [])
+
+
+def _quote(cols: list[str]) -> str:
+    return ", ".join(f'"{c}"' for c in cols)
+
+
+def staging_sql(schema: str, table: str, columns: list[str]) -> str:
+    # Column types only (no constraints); dropped with the transaction
+    return f'CREATE TEMP TABLE "stg_{table}" ON COMMIT DROP AS SELECT {_quote(columns)} FROM {schema}."{table}" WITH NO DATA'
+
+
+def copy_sql(table: str, columns: list[str]) -> str:
+    # Empty fields, quoted or not, become NULL (what coerce_value used to do per cell);
+    # booleans like True/f/yes are accepted by Postgres' own input parser
+    return f'COPY "stg_{table}" ({_quote(columns)}) FROM STDIN WITH (FORMAT csv, FORCE_NULL ({_quote(columns)}))'
+
+
+def merge_sql(schema: str, table: str, columns: list[str], upsert: bool = False) -> str:
+    # Full exports only fill gaps; deltas carry changed rows, so they overwrite by primary key
     pk = PRIMARY_KEYS.get(table)
-    cols_sql = ", ".join([f'"{c}"' for c in columns])
-    conflict_sql = f"ON CONFLICT (\"{pk}\") DO NOTHING" if pk and pk in columns else ""
-    sql = f"INSERT INTO {schema}.\"{table}\" ({cols_sql}) VALUES %s {conflict_sql}".strip()
-    with conn.cursor() as cur:
-        execute_values(cur, sql, rows, page_size=1000)
-    return len(rows)
+    rest = [c for c in columns if c != pk]
+    if pk and pk in columns and upsert and rest:
+        conflict = f'ON CONFLICT ("{pk}") DO UPDATE SET ' + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in rest)
+    elif pk and pk in columns:
+        conflict = f'ON CONFLICT ("{pk}") DO NOTHING'
+    else:
+        conflict = "ON CONFLICT DO NOTHING"
+    return f'INSERT INTO {schema}."{table}" ({_quote(columns)}) SELECT {_quote(columns)} FROM "stg_{table}" {conflict}'
+
+
+def skip_conflicts_sql(schema: str, table: str, columns: list[str]) -> str | None:
+    # Drops staged rows whose unique key is already held by a different row; returns their primary keys
+    pk, key = PRIMARY_KEYS.get(table), UNIQUE_KEYS.get(table)
+    if not pk or not key or any(c not in columns for c in (pk, *key)):
+        return None
+    match = " AND ".join(f's."{c}" = t."{c}"' for c in key)
+    return f'DELETE FROM "stg_{table}" s USING {schema}."{table}" t WHERE {match} AND s."{pk}" <> t."{pk}" RETURNING s."{pk}"'
+
+
+def find_table_files(target_dir: str, schema: str) -> dict[str, tuple[str, dict | None]]:
+    # table -> (path, manifest entry); the manifest is authoritative when the export has one
+    found = load_manifest(target_dir)
+    if found:
+        root, manifest = found
+        return {
+            t: (os.path.join(root, entry["file"]), entry)
+            for t in TABLE_ORDER
+            for entry in [manifest.get("tables", {}).get(f"{schema}.{t}")]
+            if entry
+        }
+    files = {}
+    for table in TABLE_ORDER:
+        for ext in EXTENSIONS.values():
+            path = os.path.join(target_dir, f"{table}{ext}")
+            if os.path.isfile(path):
+                files[table] = (path, None)
+                break
+    return files
+
+
+def import_table(params: dict, schema: str, table: str, csv_path: str, expected: dict | None = None, upsert: bool = False) -> dict:
+    # Runs in a worker process: COPY the file into a temp staging table, then merge, in one transaction.
+    # With a manifest entry the file checksum is checked first and the copied row count after COPY.
+    started = time.perf_counter()
+    if expected and expected.get("sha256") and file_sha256(csv_path) != expected["sha256"]:
+        raise ValueError(f"{csv_path}: checksum does not match manifest")
+    conn = psycopg2.connect(**params)
+    try:
+        with open_export(csv_path) as f, conn, conn.cursor() as cur:
+            columns = read_header(f)
+            if not columns:
+                return {"table": table, "copied": 0, "inserted": 0, "seconds": 0.0, "rows_per_sec": 0}
+            cur.execute(staging_sql(schema, table, columns))
+            cur.copy_expert(copy_sql(table, columns), f, size=1 << 20)
+            copied = cur.rowcount
+            if expected and expected.get("rows") is not None and copied != expected["rows"]:
+                raise ValueError(f"{csv_path}: copied {copied} rows, manifest says {expected['rows']}")
+            skipped = []
+            skip = skip_conflicts_sql(schema, table, columns)
+            if skip:
+                cur.execute(skip)
+                skipped = sorted(r[0] for r in cur.fetchall())
+            cur.execute(merge_sql(schema, table, columns, upsert))
+            inserted = cur.rowcount
+    finally:
+        conn.close()
+    seconds = time.perf_counter() - started
+    return {"table": table, "copied": copied, "inserted": inserted, "skipped": len(skipped), "skipped_ids": skipped[:20], "seconds": round(seconds, 3), "rows_per_sec": round(copied / seconds) if seconds else 0}
 
 
 def reset_sequence(conn, schema: str, table: str, pk: str):
@@ -113,6 +223,45 @@ def reset_sequence(conn, schema: str, table: str, pk: str):
         cur.execute("SELECT setval(%s, %s, %s)", (seq_name, max_id, True))
 
 
+def applied_exports(conn, schema: str) -> set[str]:
+    with conn.cursor() as cur:
+        cur.execute(f'CREATE TABLE IF NOT EXISTS {schema}."{IMPORT_LOG}" (export_id TEXT PRIMARY KEY, kind TEXT, applied_at TIMESTAMPTZ DEFAULT now())')
+        cur.execute(f'SELECT export_id FROM {schema}."{IMPORT_LOG}"')
+        return {r[0] for r in cur.fetchall()}
+
+
+def record_export(conn, schema: str, export_id: str, kind: str):
+    with conn.cursor() as cur:
+        cur.execute(f'INSERT INTO {schema}."{IMPORT_LOG}" (export_id, kind) VALUES (%s, %s) ON CONFLICT DO NOTHING', (export_id, kind))
+
+
+def load_files(pool, params: dict, args: argparse.Namespace, files: dict) -> tuple[list[dict], list[str]]:
+    # One export directory, FK level by level
+    results, failed = [], []
+    for level in fk_levels(list(files)):
+        futures = {}
+        for t in level:
+            path, entry = files[t]
+            upsert = bool(entry and entry.get("mode") == "delta")
+            futures[t] = pool.submit(import_table, params, args.schema, t, path, None if args.no_verify else entry, upsert)
+        for table, fut in futures.items():
+            try:
+                r = fut.result()
+            except Exception as ex:
+                print(f"! {table}: {ex}")
+                failed.append(table)
+                continue
+            results.append(r)
+            print(f"- {r['table']}: copied {r['copied']} rows, inserted {r['inserted']} ({r['rows_per_sec']} rows/s)")
+            if r["skipped"]:
+                more = ", ..." if r["skipped"] > len(r["skipped_ids"]) else ""
+                print(f"  skipped {r['skipped']} rows whose unique key another row already holds: {', '.join(map(str, r['skipped_ids']))}{more}")
+        if failed:
+            # children of a failed table would only hit FK errors
+            break
+    return results, failed
+
+
 def main():
     args = parse_args()
     target_dir = args.dir or find_latest_export_dir()
@@ -120,32 +269,63 @@ def main():
         print("Could not find an exports directory with CSVs. Use --dir to specify one.")
         sys.exit(1)
 
-    print(f"Importing from: {target_dir}")
+    # With manifests, a delta export is applied after its base chain; exports already recorded in
+    # the target's import log are skipped, so a nightly run only loads the new delta
+    chain = export_chain(target_dir) if load_manifest(target_dir) else [(target_dir, None)]
+    if any((m or {}).get("format") == "parquet" for _, m in chain):
+        print("Parquet exports are for analytics (scripts/snapshot_analytics.py); re-export with --format csv to import.")
+        sys.exit(1)
+    params = conn_params(args)
     conn = connect_db(args)
+    started = time.perf_counter()
+    results = []
+    failed = []
+    touched = set()
     try:
-        total = 0
+        applied = applied_exports(conn, args.schema) if chain[0][1] else set()
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            for root, manifest in chain:
+                export_id = (manifest or {}).get("export_id") or os.path.basename(os.path.abspath(root))
+                if manifest and export_id in applied:
+                    print(f"Already applied: {export_id}")
+                    continue
+                print(f"Importing from: {root}" + (f" ({manifest.get('kind', 'full')})" if manifest else ""))
+                files = find_table_files(root, args.schema)
+                for table in TABLE_ORDER:
+                    if table not in files:
+                        print(f"- Skipping {table}: no export file found")
+                rs, failed = load_files(pool, params, args, files)
+                results.extend(rs)
+                touched.update(files)
+                if failed:
+                    break
+                if manifest:
+                    record_export(conn, args.schema, export_id, manifest.get("kind", "full"))
+
+        if "appointments" in touched and "patient_visit_summary" not in touched and not failed:
+            # exports that predate patient_visit_summary: derive it from the loaded appointments
+            with conn.cursor() as cur:
+                cur.execute(rebuild_sql(f'"{args.schema}"'))
+        if touched:
+            # COPY bypasses report cache invalidation; running API processes clear on the bumped stamp
+            with conn.cursor() as cur:
+                cur.execute(bump_sql(f'"{args.schema}"'))
+
         for table in TABLE_ORDER:
-            csv_path = os.path.join(target_dir, f"{table}.csv")
-            if not os.path.isfile(csv_path):
-                print(f"- Skipping {table}: {csv_path} not found")
-                continue
-            columns, rows = read_csv_rows(csv_path, table)
-            if not rows:
-                print(f"- {table}: no rows in CSV")
-                continue
-            inserted = insert_rows(conn, args.schema, table, columns, rows)
-            print(f"- {table}: processed {inserted} rows")
-            total += inserted
             # reset sequence to max id
             pk = PRIMARY_KEYS.get(table)
-            if pk:
+            if pk and table in touched:
                 reset_sequence(conn, args.schema, table, pk)
-        print(f"Done. Processed {total} rows across tables.")
     finally:
         conn.close()
+    elapsed = time.perf_counter() - started
+    total = sum(r["copied"] for r in results)
+    print(f"Done. Processed {total} rows across tables in {elapsed:.1f}s ({round(total / elapsed) if elapsed else 0} rows/s).")
+    if args.json:
+        print(json.dumps({"tables": results, "rows": total, "seconds": round(elapsed, 3), "failed": failed}, indent=2))
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     main()
-
-
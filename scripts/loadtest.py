@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+import importlib.util
+from datetime import date as dt_date, datetime, timedelta
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.generate_data import slot_times
+
+DEFAULT_MIX = {
+    "availability": 30,
+    "availability_next_days": 10,
+    "earliest_available": 5,
+    "book": 10,
+    "stats_count_on": 10,
+    "stats_times": 5,
+    "stats_busiest": 5,
+    "stats_symptom": 5,
+    "admin_export": 1,
+    "agent_chat": 5,
+}
+SYMPTOMS = ("fever", "cough", "headache", "rash", "fatigue")
+PERIODS = ("morning", "afternoon", "evening")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Mixed-workload load test for the clinic APIs; prints throughput and latency percentiles as JSON.")
+    p.add_argument("--database-url", default=None, help="Overrides DATABASE_URL (e.g. sqlite:///./bench.db or postgresql://...)")
+    p.add_argument("--seed-data", action="store_true", help="Reset and seed a synthetic clinic before the run")
+    p.add_argument("--doctors", type=int, default=20)
+    p.add_argument("--patients", type=int, default=500)
+    p.add_argument("--days", type=int, default=14)
+    p.add_argument("--api-url", default=None, help="Target an already running app.py server instead of starting one in-process")
+    p.add_argument("--admin-url", default=None, help="Target an already running app.main server (admin export)")
+    p.add_argument("--port", type=int, default=8000, help="Port for the in-process app.py server (the agent calls back to localhost:8000)")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--requests", type=int, default=2000, help="Total requests (ignored when --duration is set)")
+    p.add_argument("--duration", type=float, default=None, help="Run for N seconds instead of a fixed request count")
+    p.add_argument("--mix", default=None, help="Comma list of scenario=weight overriding the default mix")
+    p.add_argument("--llm-fixtures", default=None, help="Replay recorded LLM fixtures (JSONL) instead of the generated stub responses")
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Artificial latency per stubbed LLM call")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--out", default=None, help="Also write the JSON report to this file")
+    return p.parse_args()
+
+
+def parse_mix(spec: str | None) -> dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    if spec:
+        for part in spec.split(","):
+            name, _, weight = part.partition("=")
+            if name.strip() not in DEFAULT_MIX:
+                raise SystemExit(f"Unknown scenario '{name}'. Known: {', '.join(DEFAULT_MIX)}")
+            mix[name.strip()] = int(weight or 0)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def _load_app_py():
+    # app.py is shadowed by the app/ package, so load it by path
+    spec = importlib.util.spec_from_file_location("clinic_app", os.path.join(PROJECT_ROOT, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def _serve(api, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(api, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name=f"uvicorn-{port}", daemon=True).start()
+    deadline = time.time() + 20
+    while not server.started:
+        if time.time() > deadline:
+            raise SystemExit(f"Server on port {port} did not start")
+        time.sleep(0.05)
+    return server
+
+
+def install_stub_llm(workload: "Workload", fixtures: str | None, latency_ms: float):
+    # Agent turns run against replayed LLM responses so they measure our code, not the Groq API
+    import agent
+    from app.integrations.llm import StubLLM, use_llm
+    stub = StubLLM(fixtures, latency_ms=latency_ms)
+    if not fixtures:
+        for msg, parsed in workload.agent_messages():
+            stub.add(agent.parse_prompt(msg), json.dumps(parsed))
+    use_llm(stub)
+    return stub
+
+
+def start_servers(port: int) -> tuple[str, str]:
+    from app.main import app as main_app
+    _serve(_load_app_py(), port)
+    _serve(main_app, port + 1)
+    return f"http://127.0.0.1:{port}", f"http://127.0.0.1:{port + 1}"
+
+
+class Workload:
+    def __init__(self, doctor_ids: list[int], doctor_names: list[str], patient_ids: list[int], start: dt_date, days: int, seed: int):
+        self.rng = random.Random(seed)
+        self.doctor_ids = doctor_ids
+        self.doctor_names = doctor_names
+        self.patient_ids = patient_ids
+        self.start = start
+        self.days = days
+        self.slots = slot_times()
+        self.messages = [m for m, _ in self.agent_messages()]
+
+    def agent_messages(self) -> list[tuple[str, dict]]:
+        # Every chat message the workload can send, with the parse an LLM would return for it
+        out = []
+        for i in range(self.days):
+            day = (self.start + timedelta(days=i)).isoformat()
+            out.append((f"What doctors are available on {day}?", {"intent": "list_doctors", "date": day}))
+            for name in self.doctor_names:
+                for period in PERIODS:
+                    out.append((f"Is {name} available on {day} {period}?", {"intent": "check_availability", "doctor_name": name, "date": day, "time_period": period}))
+        return out
+
+    def _day(self, back: bool = False) -> str:
+        offset = -self.rng.randint(1, 30) if back else self.rng.randrange(self.days)
+        return (self.start + timedelta(days=offset)).isoformat()
+
+    def request(self, scenario: str) -> tuple[str, str, str, dict | None]:
+        r = self.rng
+        did = r.choice(self.doctor_ids)
+        if scenario == "availability":
+            return ("api", "GET", f"/availability/{did}/{self._day()}", None)
+        if scenario == "availability_next_days":
+            return ("api", "GET", f"/availability_next_days/{did}/{self._day()}/7", None)
+        if scenario == "earliest_available":
+            return ("api", "GET", f"/earliest_available?start_date={self._day()}&days=14&k=5&period={r.choice(PERIODS)}", None)
+        if scenario == "book":
+            st, et = r.choice(self.slots)
+            return ("api", "POST", f"/book/{did}/{self._day()}", {"patient_id": r.choice(self.patient_ids), "start_time": st, "end_time": et, "reason": "Load test"})
+        if scenario == "stats_count_on":
+            return ("api", "GET", f"/stats/appointments_count_on?date={self._day(back=True)}&doctor_id={did}", None)
+        if scenario == "stats_times":
+            return ("api", "GET", f"/stats/appointments_times?date={self._day(back=True)}&doctor_id={did}", None)
+        if scenario == "stats_busiest":
+            end = self.start - timedelta(days=1)
+            return ("api", "GET", f"/stats/appointments_busiest_day?start_date={(end - timedelta(days=29)).isoformat()}&end_date={end.isoformat()}&doctor_id={did}", None)
+        if scenario == "stats_symptom":
+            end = self.start - timedelta(days=1)
+            return ("api", "GET", f"/stats/symptom_count?keyword={r.choice(SYMPTOMS)}&start_date={(end - timedelta(days=6)).isoformat()}&end_date={end.isoformat()}&doctor_id={did}", None)
+        if scenario == "admin_export":
+            return ("admin", "GET", "/admin/export/appointments.xlsx", None)
+        if scenario == "agent_chat":
+            return ("api", "POST", "/agent/patient_chat", {"message": r.choice(self.messages)})
+        raise ValueError(scenario)
+
+
+def load_entities() -> tuple[list[int], list[str], list[int]]:
+    from app.db import SessionLocal
+    from app import models
+    db = SessionLocal()
+    try:
+        docs = db.query(models.Doctor.doctor_id, models.Doctor.name).all()
+        pats = [p[0] for p in db.query(models.Patient.patient_id).all()]
+    finally:
+        db.close()
+    if not docs or not pats:
+        raise SystemExit("No doctors/patients found; run with --seed-data or seed the database first.")
+    return [d[0] for d in docs], [d[1] for d in docs], pats
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    s = sorted(samples)
+    pick = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(s[-1] * 1000, 2)}
+
+
+async def run_load(workload: Workload, mix: dict[str, int], urls: dict[str, str], concurrency: int, total: int, duration: float | None) -> dict:
+    import httpx
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    stats = {n: {"latencies": [], "status": {}, "errors": 0} for n in names}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_scenario() -> str | None:
+        nonlocal issued
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif issued >= total:
+            return None
+        issued += 1
+        return workload.rng.choices(names, weights)[0]
+
+    async def worker(client: httpx.AsyncClient):
+        while (scenario := next_scenario()) is not None:
+            target, method, path, body = workload.request(scenario)
+            st = stats[scenario]
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, urls[target] + path, json=body)
+                code = str(r.status_code)
+            except Exception as exc:
+                code = type(exc).__name__
+            st["latencies"].append(time.perf_counter() - t0)
+            st["status"][code] = st["status"].get(code, 0) + 1
+            # 400 on /book means the slot was taken: expected contention, not a failure
+            if not (code.startswith("2") or (scenario == "book" and code == "400")):
+                st["errors"] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    report = {"seconds": round(elapsed, 3), "scenarios": {}}
+    all_lat: list[float] = []
+    errors = 0
+    for name, st in stats.items():
+        lat = st["latencies"]
+        all_lat.extend(lat)
+        errors += st["errors"]
+        report["scenarios"][name] = {"requests": len(lat), "errors": st["errors"], "status": st["status"], "rps": round(len(lat) / elapsed, 2), **_percentiles(lat)}
+    report["total"] = {"requests": len(all_lat), "errors": errors, "rps": round(len(all_lat) / elapsed, 2), **_percentiles(all_lat)}
+    return report
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from app.config import settings
+    mix = parse_mix(args.mix)
+    start = dt_date.today()
+    seeded = None
+    if args.seed_data:
+        from scripts.seed_synthetic import seed_synthetic
+        seeded = seed_synthetic(args.doctors, args.patients, args.days, start, reset=True)
+
+    doctor_ids, doctor_names, patient_ids = load_entities()
+    workload = Workload(doctor_ids, doctor_names, patient_ids, start, args.days, args.seed)
+    stub = None
+    if args.api_url:
+        urls = {"api": args.api_url.rstrip("/"), "admin": (args.admin_url or args.api_url).rstrip("/")}
+    else:
+        stub = install_stub_llm(workload, args.llm_fixtures, args.llm_latency_ms)
+        api, admin = start_servers(args.port)
+        urls = {"api": api, "admin": args.admin_url or admin}
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run_load(workload, mix, urls, args.concurrency, args.requests, args.duration))
+    report = {
+        "started_at": datetime.utcnow().isoformat(),
+        "database": settings.database_url.split("://", 1)[0],
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "duration": args.duration, "mix": mix, "doctors": len(doctor_ids), "patients": len(patient_ids)},
+        "seeded": seeded,
+        "llm_stub": {"hits": stub.hits, "misses": stub.misses} if stub else None,
+        **report,
+    }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+	sys.path.insert(0, PROJECT_ROOT)
+
+from app.config import settings
+from app.db import init_db
+
+if __name__ == "__main__":
+	init_db()
+	print(f"Schema up to date for {settings.database_url}")
@@ -10,6 +10,16 @@ if PROJECT_ROOT not in sys.path:
 
 from agent import app, AgentState
 
+# Conversations shared with scripts/bench_agent_llm_calls.py (LLM calls per scenario)
+SCENARIOS = {
+    "list_today": ["What doctors are available today?"],
+    "next_week": ["Show me availability next week"],
+    "date_range": ["Who is available on 2025-08-25 between 10am and 3pm?"],
+    "unknown_doctor": ["Is Dr. Nobody available tomorrow?"],
+    "clarify_then_answer": ["I want to see Dr. Ahuja", "tomorrow morning"],
+    "unknown_doctor_and_patient": ["Book Dr. Nobody tomorrow at 10am for ghost@example.com"],
+}
+
 
 def invoke_turns(turns):
     state: AgentState = {
@@ -38,23 +48,21 @@ def assert_contains(text: str, expected: str):
 
 
 def test_list_today_has_ahuja_or_slots():
-    state = invoke_turns(["What doctors are available today?"])
+    state = invoke_turns(SCENARIOS["list_today"])
     last = state['messages'][-1].content
     # Expect either 'Doctors available' or 'No doctors available'
     assert ("Doctors available on" in last) or ("No doctors available on" in last)
 
 
 def test_next_week_parsing_defaults_to_monday():
-    state = invoke_turns(["Show me availability next week"])
+    state = invoke_turns(SCENARIOS["next_week"])
     last = state['messages'][-1].content
     assert ("Doctors available on" in last) or ("No doctors available on" in last)
 
 
 def test_specific_booking_flow():
     # Week start seeded: 2025-08-25. Attempt booking a 10:00 slot with any doctor on that date.
-    state = invoke_turns([
-        "Who is available on 2025-08-25 between 10am and 3pm?",
-    ])
+    state = invoke_turns(SCENARIOS["date_range"])
     last = state['messages'][-1].content
     assert ("Doctors available on 2025-08-25" in last) or ("No doctors available on 2025-08-25" in last)
 
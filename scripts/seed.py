@@ -1,59 +1,61 @@
-from app.db import SessionLocal, Base, engine
+from app.db import SessionLocal, engine, init_db
 from app import models
-from datetime import timedelta, datetime
+from app.services.schedule import WeeklyTemplate, expand, write_slots
+from datetime import timedelta, datetime, date, time
 import csv
 
-Base.metadata.create_all(bind=engine)
+# Default synthetic schedule: half-hour slots at these hours, every day for the next 5 days
+DEFAULT_HOURS = (9, 10, 11, 14, 15, 16)
 
-def upsert_doctor(db, name: str, specialization: str = "General"):
-	d = db.query(models.Doctor).filter(models.Doctor.name == name).first()
-	if not d:
-		d = models.Doctor(name=name, specialization=specialization)
-		db.add(d); db.commit(); db.refresh(d)
-	return d
+def upsert_doctors(db, rows: list[tuple[str, str]]):
+	# One lookup and one commit for the whole batch
+	have = {n for (n,) in db.query(models.Doctor.name).filter(models.Doctor.name.in_([n for n, _ in rows]))}
+	db.add_all([models.Doctor(name=n, specialization=sp) for n, sp in dict(rows).items() if n not in have])
+	db.commit()
 
-def upsert_patient(db, name: str, email: str, phone: str | None = None):
-	p = db.query(models.Patient).filter(models.Patient.email == email).first()
-	if not p:
-		p = models.Patient(name=name, email=email, phone=phone)
-		db.add(p); db.commit(); db.refresh(p)
-	return p
+def upsert_patients(db, rows: list[dict]):
+	emails = [r['email'] for r in rows]
+	have = set()
+	for i in range(0, len(emails), 500):
+		have |= {e for (e,) in db.query(models.Patient.email).filter(models.Patient.email.in_(emails[i:i + 500]))}
+	new = {}
+	for r in rows:
+		if r['email'] not in have:
+			new.setdefault(r['email'], models.Patient(name=r['name'], email=r['email'], phone=r.get('phone')))
+	db.add_all(new.values())
+	db.commit()
+
+def _schedule_csv_rows(db, path: str) -> list[tuple]:
+	doctors = {n: i for i, n in db.query(models.Doctor.doctor_id, models.Doctor.name)}
+	with open(path, newline='', encoding='utf-8') as f:
+		return [
+			(doctors[row['doctor_name']], date.fromisoformat(row['date']), time.fromisoformat(row['start_time']), time.fromisoformat(row['end_time']))
+			for row in csv.DictReader(f) if row['doctor_name'] in doctors
+		]
 
 def seed():
+	init_db()
 	db = SessionLocal()
 	# Seed doctors
-	for nm, sp in [("Dr. Ahuja","General"),("Dr. Mehra","Pediatrics")]:
-		upsert_doctor(db, nm, sp)
+	upsert_doctors(db, [("Dr. Ahuja","General"),("Dr. Mehra","Pediatrics")])
 	# Seed patients from CSV if present
 	try:
 		with open('patients.csv', newline='', encoding='utf-8') as f:
-			for i, row in enumerate(csv.DictReader(f)):
-				upsert_patient(db, row['name'], row['email'], row.get('phone'))
+			upsert_patients(db, list(csv.DictReader(f)))
 	except FileNotFoundError:
-		for i in range(1, 51):
-			upsert_patient(db, f"Patient {i}", f"patient{i}@example.com", f"+9100000{i:04d}")
+		upsert_patients(db, [{'name': f"Patient {i}", 'email': f"patient{i}@example.com", 'phone': f"+9100000{i:04d}"} for i in range(1, 51)])
 	# Seed availability from CSV if present else synthetic
 	if db.query(models.DoctorAvailability).count() == 0:
 		try:
-			with open('schedule.csv', newline='', encoding='utf-8') as f:
-				for row in csv.DictReader(f):
-					d = db.query(models.Doctor).filter(models.Doctor.name == row['doctor_name']).first()
-					if d:
-						db.add(models.DoctorAvailability(doctor_id=d.doctor_id, available_date=row['date'], start_time=row['start_time'], end_time=row['end_time'], is_booked=False))
-				db.commit()
+			rows = _schedule_csv_rows(db, 'schedule.csv')
 		except FileNotFoundError:
-			all_docs = db.query(models.Doctor).all()
+			tpl = WeeklyTemplate({wd: [(f"{hh:02d}:00", f"{hh:02d}:30") for hh in DEFAULT_HOURS] for wd in range(7)})
 			start = datetime.utcnow().date()
-			for d in all_docs:
-				for day in range(0, 5):
-					dt = start + timedelta(days=day)
-					for hh in (9,10,11,14,15,16):
-						st = f"{hh:02d}:00:00"; et = f"{hh:02d}:30:00"
-						db.add(models.DoctorAvailability(doctor_id=d.doctor_id, available_date=dt, start_time=st, end_time=et, is_booked=False))
-			db.commit()
+			rows = expand({d: tpl for (d,) in db.query(models.Doctor.doctor_id)}, start, start + timedelta(days=4))
+		with engine.begin() as conn:
+			write_slots(conn, rows)
 	db.close()
 
 if __name__ == "__main__":
 	seed()
 	print("Seeded sample data.")
-
@@ -1,8 +1,17 @@
 import os
+import sys
 import argparse
 import psycopg2
 from datetime import datetime, time as dt_time
 
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.visit_summary import rebuild_sql
+from app.services.report_cache import bump_sql
+
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Seed booked appointment times for a doctor on a date")
@@ -90,6 +99,10 @@ def main():
                 print(f"Seeded appointment {new_id} {date_str} {st_sql}-{et_sql}")
             else:
                 print(f"Appointment exists for {date_str} {st_sql}-{et_sql}")
+        # Raw SQL fires no ORM hooks, so refresh this patient's patient_visit_summary row and bump the
+        # stamp that makes running API processes drop cached reports
+        cur.execute(rebuild_sql(where="p.patient_id = %s"), (args.patient_id,))
+        cur.execute(bump_sql())
     finally:
         cur.close()
         conn.close()
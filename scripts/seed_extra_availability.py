@@ -4,6 +4,13 @@ import argparse
 from datetime import datetime, timedelta, date as dt_date, time as dt_time
 import psycopg2
 
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.schedule import copy_slots
+
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Seed extra availability slots for testing.")
@@ -34,28 +41,6 @@ def get_doctors(conn, schema: str):
         return cur.fetchall()
 
 
-def ensure_slot(conn, schema: str, doctor_id: int, d: dt_date, start: dt_time, end: dt_time):
-    with conn.cursor() as cur:
-        cur.execute(
-            f"""
-            SELECT availability_id FROM {schema}.doctor_availability
-            WHERE doctor_id=%s AND available_date=%s AND start_time=%s AND end_time=%s
-            """,
-            (doctor_id, d, start, end),
-        )
-        row = cur.fetchone()
-        if row:
-            return False
-        cur.execute(
-            f"""
-            INSERT INTO {schema}.doctor_availability(doctor_id, available_date, start_time, end_time, is_booked)
-            VALUES (%s, %s, %s, %s, false)
-            """,
-            (doctor_id, d, start, end),
-        )
-        return True
-
-
 def main():
     args = parse_args()
     conn = connect(args)
@@ -65,23 +50,21 @@ def main():
             print("No doctors found; seed doctors first.")
             return
 
-        added = 0
         today = dt_date.today()
         tomorrow = today + timedelta(days=1)
 
         # Seed: tomorrow afternoon 15:00-15:30 for all doctors
-        for did, _name in docs:
-            if ensure_slot(conn, args.schema, did, tomorrow, dt_time(15, 0), dt_time(15, 30)):
-                added += 1
+        rows = [(did, tomorrow, dt_time(15, 0), dt_time(15, 30)) for did, _name in docs]
 
         # Seed: specific 2024-10-25 15:00 for any doctor whose name contains 'Ahuja'
         target_date = dt_date(2024, 10, 25)
         for did, name in docs:
             if name and "ahuja" in name.lower():
-                if ensure_slot(conn, args.schema, did, target_date, dt_time(15, 0), dt_time(15, 30)):
-                    added += 1
-                if ensure_slot(conn, args.schema, did, target_date, dt_time(15, 30), dt_time(16, 0)):
-                    added += 1
+                rows.append((did, target_date, dt_time(15, 0), dt_time(15, 30)))
+                rows.append((did, target_date, dt_time(15, 30), dt_time(16, 0)))
+
+        with conn.cursor() as cur:
+            added = copy_slots(cur, rows, args.schema)
 
         print(f"Seed complete. Added {added} slot(s).")
     finally:
@@ -1,9 +1,19 @@
 import os
+import sys
 import argparse
 from datetime import date as dt_date, datetime, timedelta, time as dt_time
 import random
 import psycopg2
 
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.schedule import WeeklyTemplate, expand, copy_slots
+from app.services.visit_summary import rebuild_sql
+from app.services.report_cache import bump_sql
+
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Reset appointments and seed next week's availability + historical reports.")
@@ -54,41 +64,15 @@ def delete_future_appointments(conn, schema: str, start_date: dt_date):
         )
 
 
-def ensure_availability(conn, schema: str, doctor_id: int, d: dt_date, start: dt_time, end: dt_time):
-    with conn.cursor() as cur:
-        cur.execute(
-            f"""
-            SELECT 1 FROM {schema}.doctor_availability
-            WHERE doctor_id=%s AND available_date=%s AND start_time=%s AND end_time=%s
-            """,
-            (doctor_id, d, start, end),
-        )
-        if cur.fetchone():
-            return False
-        cur.execute(
-            f"""
-            INSERT INTO {schema}.doctor_availability(doctor_id, available_date, start_time, end_time, is_booked)
-            VALUES (%s, %s, %s, %s, false)
-            """,
-            (doctor_id, d, start, end),
-        )
-        return True
+# 10:00 to 15:00 in half-hour slots, every day of the week
+WEEK_TEMPLATE = WeeklyTemplate({wd: [("10:00", "15:00")] for wd in range(7)}, slot_minutes=30)
 
 
 def seed_week_availability(conn, schema: str, week_start: dt_date):
     docs = get_doctors(conn, schema)
-    added = 0
-    for i in range(7):
-        d = week_start + timedelta(days=i)
-        # 10:00 to 15:00 -> slots: 10:00, 10:30, 11:00, 11:30, 12:00, 12:30, 13:00, 13:30, 14:00, 14:30
-        slots = [(10, 0), (10, 30), (11, 0), (11, 30), (12, 0), (12, 30), (13, 0), (13, 30), (14, 0), (14, 30)]
-        for did, _ in docs:
-            for h, m in slots:
-                start = dt_time(h, m)
-                end_dt = (datetime.combine(dt_date(2000, 1, 1), start) + timedelta(minutes=30)).time()
-                if ensure_availability(conn, schema, did, d, start, end_dt):
-                    added += 1
-    return added
+    rows = expand({did: WEEK_TEMPLATE for did, _ in docs}, week_start, week_start + timedelta(days=6))
+    with conn.cursor() as cur:
+        return copy_slots(cur, rows, schema)
 
 
 def seed_historical_reports(conn, schema: str, per_doctor: int = 5):
@@ -147,6 +131,12 @@ def main():
         # 3) Seed historical completed appointments + patient reports
         added_reports = seed_historical_reports(conn, args.schema, per_doctor=5)
         print(f"Inserted {added_reports} historical appointments + reports")
+        # 4) Raw SQL fires no ORM hooks, so refresh patient_visit_summary from the new appointments
+        # and bump the stamp that makes running API processes drop cached reports
+        with conn.cursor() as cur:
+            cur.execute(rebuild_sql(args.schema))
+            cur.execute(bump_sql(args.schema))
+        print("Rebuilt patient visit summary, invalidated cached reports")
     finally:
         conn.close()
 
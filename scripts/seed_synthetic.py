@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import date as dt_date, datetime, timedelta, time as dt_time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.generate_data import doctor_rows, patient_rows, slot_times, REPORT_TOPICS
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Seed a synthetic clinic (N doctors, M patients, D days of slots) for benchmarks.")
+    p.add_argument("--doctors", type=int, default=20)
+    p.add_argument("--patients", type=int, default=500)
+    p.add_argument("--days", type=int, default=14, help="Days of future availability starting at --start")
+    p.add_argument("--start", default=None, help="First availability day (YYYY-MM-DD, default today)")
+    p.add_argument("--history-days", type=int, default=30, help="Days of past completed appointments with reports")
+    p.add_argument("--history-per-day", type=int, default=3, help="Past appointments per doctor per day")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    p.add_argument("--database-url", default=None, help="Overrides DATABASE_URL")
+    return p.parse_args()
+
+
+def _chunks(rows: list, size: int = 5000):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def seed_synthetic(doctors: int, patients: int, days: int, start: dt_date | None = None, history_days: int = 30, history_per_day: int = 3, seed: int = 42, reset: bool = False) -> dict:
+    from app.db import engine, Base, init_db
+    from app import models
+    from app.services.schedule import WeeklyTemplate, expand, write_slots
+    from app.services.visit_summary import rebuild as rebuild_visit_summary
+    from app.services.report_cache import bump_version as bump_report_cache
+
+    rng = random.Random(seed)
+    start = start or dt_date.today()
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    init_db()
+    slots = [(dt_time.fromisoformat(s), dt_time.fromisoformat(e)) for s, e in slot_times()]
+    counts: dict[str, int] = {}
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.execute(models.Doctor.__table__.select().limit(1)).first():
+            raise SystemExit("Database already has doctors; rerun with --reset to reseed.")
+        doc_ids = [conn.execute(models.Doctor.__table__.insert().values(**d)).inserted_primary_key[0] for d in doctor_rows(doctors)]
+        conn.execute(models.Patient.__table__.insert(), patient_rows(patients))
+        pat_ids = [r[0] for r in conn.execute(models.Patient.__table__.select().with_only_columns(models.Patient.patient_id))]
+        counts["doctors"], counts["patients"] = len(doc_ids), len(pat_ids)
+
+        if days > 0:
+            tpl = WeeklyTemplate({wd: [(slots[0][0], slots[-1][1])] for wd in range(7)})
+            counts["availability"] = write_slots(conn, expand({did: tpl for did in doc_ids}, start, start + timedelta(days=days - 1)))
+        else:
+            counts["availability"] = 0
+
+        history = []
+        for did in doc_ids:
+            for back in range(1, history_days + 1):
+                day = start - timedelta(days=back)
+                for st, et in rng.sample(slots, min(history_per_day, len(slots))):
+                    history.append({"doctor_id": did, "patient_id": rng.choice(pat_ids), "appointment_date": day, "start_time": st, "end_time": et, "reason": rng.choice(REPORT_TOPICS)[0], "status": "Completed"})
+        for chunk in _chunks(history):
+            conn.execute(models.Appointment.__table__.insert(), chunk)
+        # Core inserts bypass the ORM hooks that keep patient_visit_summary current
+        rebuild_visit_summary(conn)
+        appt_ids = [r[0] for r in conn.execute(models.Appointment.__table__.select().with_only_columns(models.Appointment.appointment_id))]
+        reports = []
+        for aid in appt_ids:
+            symptoms, diagnosis = rng.choice(REPORT_TOPICS)
+            reports.append({"appointment_id": aid, "symptoms": symptoms, "diagnosis": diagnosis})
+        for chunk in _chunks(reports):
+            conn.execute(models.PatientReport.__table__.insert(), chunk)
+        # Core inserts skip report cache invalidation too; running API processes clear on the bumped stamp
+        bump_report_cache(conn)
+        counts["appointments"], counts["patient_reports"] = len(appt_ids), len(reports)
+    counts["seconds"] = round(time.perf_counter() - t0, 3)
+    return counts
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    print(json.dumps(seed_synthetic(args.doctors, args.patients, args.days, start, args.history_days, args.history_per_day, args.seed, args.reset)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+from datetime import date as dt_date
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scripts.export_files import _pyarrow, load_manifest
+
+# Answers the /stats/* questions from an `export_postgres_to_csv.py --format parquet` snapshot.
+# Date filters are pushed down twice: month=YYYY-MM partitions outside the range are never opened,
+# and row groups are skipped on their appointment_date min/max statistics.
+
+
+def _as_date(d):
+    return dt_date.fromisoformat(d) if isinstance(d, str) else d
+
+
+class Snapshot:
+    def __init__(self, path: str, schema: str = "public"):
+        found = load_manifest(path)
+        if not found:
+            raise ValueError(f"{path}: no manifest.json found")
+        self.root, self.manifest = found
+        if self.manifest.get("format") != "parquet":
+            raise ValueError(f"{self.root}: not a Parquet export (re-export with --format parquet)")
+        self.schema = schema
+        self._datasets = {}
+
+    def dataset(self, table: str):
+        ds = self._datasets.get(table)
+        if ds is None:
+            entry = self.manifest["tables"].get(f"{self.schema}.{table}")
+            if not entry:
+                raise ValueError(f"{self.root}: {self.schema}.{table} not in export")
+            pa = _pyarrow()
+            import pyarrow.dataset
+            partitioning = pyarrow.dataset.partitioning(pa.schema([("month", pa.string())]), flavor="hive") if entry.get("partition_by") else None
+            ds = self._datasets[table] = pyarrow.dataset.dataset(os.path.join(self.root, entry["file"]), format="parquet", partitioning=partitioning)
+        return ds
+
+    def appointment_filter(self, start=None, end=None, doctor_id=None, status=None):
+        import pyarrow.dataset
+        f = pyarrow.dataset.field
+        conds = []
+        start, end = _as_date(start), _as_date(end)
+        if start:
+            conds += [f("month") >= start.strftime("%Y-%m"), f("appointment_date") >= start]
+        if end:
+            conds += [f("month") <= end.strftime("%Y-%m"), f("appointment_date") <= end]
+        if doctor_id:
+            conds.append(f("doctor_id") == doctor_id)
+        if status:
+            conds.append(f("status") == status)
+        expr = None
+        for c in conds:
+            expr = c if expr is None else expr & c
+        return expr
+
+    def count_appointments(self, start=None, end=None, doctor_id=None, status=None) -> int:
+        return self.dataset("appointments").count_rows(filter=self.appointment_filter(start, end, doctor_id, status))
+
+    def appointments_by_day(self, start=None, end=None, doctor_id=None) -> list[dict]:
+        table = self.dataset("appointments").to_table(columns=["appointment_date"], filter=self.appointment_filter(start, end, doctor_id))
+        counts = table.group_by("appointment_date").aggregate([("appointment_date", "count")]).sort_by("appointment_date")
+        return [{"date": d.isoformat(), "count": c} for d, c in zip(counts["appointment_date"].to_pylist(), counts["appointment_date_count"].to_pylist())]
+
+    def busiest_day(self, start, end, doctor_id=None) -> dict:
+        # days are in date order, so ties go to the earliest date
+        days = self.appointments_by_day(start, end, doctor_id)
+        if not days:
+            return {"date": None, "count": 0}
+        return max(days, key=lambda d: d["count"])
+
+    def symptom_count(self, keyword: str, start=None, end=None, doctor_id=None) -> int:
+        # Report rows whose symptoms contain keyword (case-insensitive) for appointments in range
+        import pyarrow.dataset
+        pc = _pyarrow().compute
+        flt = self.appointment_filter(start, end, doctor_id)
+        reports = self.dataset("patient_reports")
+        if flt is not None:
+            ids = self.dataset("appointments").to_table(columns=["appointment_id"], filter=flt)["appointment_id"]
+            table = reports.to_table(columns=["symptoms"], filter=pyarrow.dataset.field("appointment_id").isin(ids))
+        else:
+            table = reports.to_table(columns=["symptoms"])
+        hits = pc.match_substring(table["symptoms"], keyword.lower(), ignore_case=True)
+        return int(pc.sum(hits).as_py() or 0)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Query a Parquet export instead of the live database.")
+    p.add_argument("export", help="Export directory written with --format parquet")
+    p.add_argument("question", choices=["count", "by_day", "busiest_day", "symptom_count"])
+    p.add_argument("--start")
+    p.add_argument("--end")
+    p.add_argument("--doctor-id", type=int)
+    p.add_argument("--status")
+    p.add_argument("--keyword", help="Required for symptom_count")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    snap = Snapshot(args.export)
+    if args.question == "count":
+        out = {"start_date": args.start, "end_date": args.end, "count": snap.count_appointments(args.start, args.end, args.doctor_id, args.status)}
+    elif args.question == "by_day":
+        out = snap.appointments_by_day(args.start, args.end, args.doctor_id)
+    elif args.question == "busiest_day":
+        out = snap.busiest_day(args.start, args.end, args.doctor_id)
+    else:
+        if not args.keyword:
+            sys.exit("--keyword is required for symptom_count")
+        out = {"keyword": args.keyword, "count": snap.symptom_count(args.keyword, args.start, args.end, args.doctor_id)}
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import contextvars
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END
+import agent
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_guard_resets_budget_and_stops_blank_turns():
+	out = agent.guard_node({"messages": [HumanMessage(content="  ")], "llm_calls": 7})
+	assert out["llm_calls"] == 0
+	assert agent.decide_after_guard({"messages": [HumanMessage(content="  ")]}) == END
+	assert agent.decide_after_guard({"messages": [HumanMessage(content="hi")]}) == "parse"
+	assert agent._within_budget({"llm_calls": 2, "llm_budget": 3}, 0)
+	assert not agent._within_budget({"llm_calls": 2, "llm_budget": 3}, 1)
+
+
+def test_lookups_run_concurrently_and_keep_context():
+	marker = contextvars.ContextVar("marker", default=None)
+	marker.set("turn-1")
+
+	def lookup(key):
+		time.sleep(0.2)
+		return {key: marker.get()}
+
+	t0 = time.perf_counter()
+	out = agent._run_lookups([lambda: lookup("doctor_id"), lambda: lookup("patient_id")])
+	assert time.perf_counter() - t0 < 0.35
+	assert out == [{"doctor_id": "turn-1"}, {"patient_id": "turn-1"}]
+
+
+def test_clarify_ends_turn_without_repeat_llm_calls():
+	proc = subprocess.run([sys.executable, "scripts/bench_agent_llm_calls.py"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300)
+	report = json.loads(proc.stdout[proc.stdout.index("{"):])
+	assert proc.returncode == 0, report["failed"]
+	assert report["scenarios"]["unknown_doctor"]["llm_calls"] <= 2
+	assert report["scenarios"]["unknown_doctor"]["last_message"].startswith("Please provide")
+	assert report["scenarios"]["clarify_then_answer"]["error"] is None
+	assert report["scenarios"]["unknown_doctor_and_patient"]["llm_calls"] == 3
@@ -0,0 +1,43 @@
+import asyncio
+from datetime import date, time as dt_time
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.db import Base, create_db_engine, get_async_db
+from app import models
+from app.main import app
+
+
+def test_async_read_endpoints(tmp_path):
+	url = f"sqlite:///{tmp_path / 'reads.db'}"
+	eng = create_db_engine(url)
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja", "specialization": "General"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": 1, "name": "P", "email": "P@Example.com"}])
+		conn.execute(models.Insurance.__table__.insert(), [{"patient_id": 1, "carrier": "Acme", "member_id": "M1"}])
+		conn.execute(models.DoctorAvailability.__table__.insert(), [
+			{"doctor_id": 1, "available_date": date(2030, 1, 7), "start_time": dt_time(9, 0), "end_time": dt_time(9, 30), "is_booked": False},
+			{"doctor_id": 1, "available_date": date(2030, 1, 7), "start_time": dt_time(9, 30), "end_time": dt_time(10, 0), "is_booked": True},
+		])
+		conn.execute(models.Appointment.__table__.insert(), [{"doctor_id": 1, "patient_id": 1, "appointment_date": date(2030, 1, 7), "start_time": dt_time(9, 30), "end_time": dt_time(10, 0)}])
+	async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+	sessions = async_sessionmaker(async_engine, expire_on_commit=False)
+
+	async def override():
+		async with sessions() as s:
+			yield s
+
+	app.dependency_overrides[get_async_db] = override
+	try:
+		c = TestClient(app)
+		assert [d["name"] for d in c.get("/doctors").json()] == ["Dr. Ahuja"]
+		assert c.get("/doctors/2").status_code == 404
+		slots = c.get("/doctors/1/availability/2030-01-07").json()
+		assert [s["start_time"] for s in slots] == ["09:00:00"]
+		assert c.get("/patients").json()[0]["insurance"]["carrier"] == "Acme"
+		assert c.get("/patients/lookup/by_email/p@example.com").json() == {"patient_id": 1}
+		assert c.get("/analytics/count", params={"date": "2030-01-07"}).json()["count"] == 1
+		assert c.get("/analytics/busiest", params={"start_date": "2030-01-01", "end_date": "2030-01-31"}).json() == {"date": "2030-01-07", "count": 1}
+	finally:
+		app.dependency_overrides.clear()
+		asyncio.run(async_engine.dispose())
@@ -0,0 +1,139 @@
+from datetime import date, time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine, get_db
+from app import models
+from app.services.visit_summary import rebuild
+from app.services.availability import free_slots
+from app.services.booking import book_slot
+from scripts.loadtest import _load_app_py
+
+MON, TUE = date(2030, 1, 7), date(2030, 1, 8)
+
+
+@pytest.fixture()
+def session(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'avail.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja"}, {"doctor_id": 2, "name": "Dr. Mehra"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": 1, "name": "P1"}, {"patient_id": 2, "name": "P2"}])
+		conn.execute(models.DoctorScheduleTemplate.__table__.insert(), [
+			{"doctor_id": 1, "weekday": 0, "start_time": time(9), "end_time": time(11), "slot_minutes": 30, "effective_to": None},
+			{"doctor_id": 1, "weekday": 1, "start_time": time(9), "end_time": time(10), "slot_minutes": 30, "effective_to": date(2029, 12, 31)},
+			{"doctor_id": 2, "weekday": 0, "start_time": time(9), "end_time": time(10), "slot_minutes": 30, "effective_to": None},
+		])
+		conn.execute(models.DoctorScheduleException.__table__.insert(), [
+			{"doctor_id": 1, "exception_date": MON, "start_time": time(10, 30), "end_time": time(11), "kind": "leave"},
+			{"doctor_id": None, "exception_date": date(2030, 1, 14), "start_time": None, "end_time": None, "kind": "holiday"},
+		])
+		# an explicit row outside the template and an appointment that predates templates
+		conn.execute(models.DoctorAvailability.__table__.insert(), [{"doctor_id": 1, "available_date": MON, "start_time": time(15), "end_time": time(15, 30), "is_booked": False}])
+		conn.execute(models.Appointment.__table__.insert(), [{"doctor_id": 1, "patient_id": 2, "appointment_date": MON, "start_time": time(9, 30), "end_time": time(10)}])
+		# Core inserts skip the ORM hooks; this also resets the per-process summary cache
+		rebuild(conn)
+	s = sessionmaker(bind=eng)()
+	yield eng, s
+	s.close()
+
+
+def _starts(slots):
+	return [s["start_time"].strftime("%H:%M") for s in slots]
+
+
+def test_free_slots_are_template_minus_bookings_and_exceptions(session):
+	_, db = session
+	by_day = free_slots(db, 1, MON, date(2030, 1, 14))
+	assert _starts(by_day[MON]) == ["09:00", "10:00", "15:00"]
+	assert by_day[MON][-1]["availability_id"] is not None and by_day[MON][0]["availability_id"] is None
+	# template expired on Tuesdays; the holiday closes the following Monday for everyone
+	assert TUE not in by_day and date(2030, 1, 14) not in by_day
+	assert free_slots(db, 2, date(2030, 1, 14)) == {}
+
+
+def test_booking_materializes_only_booked_slots(session):
+	eng, db = session
+	t = models.DoctorAvailability.__table__
+	# patient 2 is returning (30 min), patient 1 is new (60 min over two template slots)
+	book_slot(db, 2, 2, "2030-01-07", "09:00")
+	assert _starts(free_slots(db, 2, MON).get(MON, [])) == ["09:30"]
+	with pytest.raises(ValueError, match="No free 60-minute slot at 10:00"):
+		book_slot(db, 1, 1, "2030-01-07", "10:00")
+	# the failed attempt left nothing behind: only the explicit row and the one booked slot exist
+	with eng.connect() as conn:
+		assert conn.execute(select(func.count()).select_from(t)).scalar() == 2
+	with pytest.raises(ValueError, match="No free 30-minute slot at 09:00"):
+		book_slot(db, 2, 2, "2030-01-07", "09:00")
+
+
+def test_api_lists_and_books_template_slots(session):
+	eng, db = session
+	api = _load_app_py()
+	sessions = sessionmaker(bind=eng)
+
+	def override():
+		s = sessions()
+		try:
+			yield s
+		finally:
+			s.close()
+
+	api.dependency_overrides[get_db] = override
+	try:
+		c = TestClient(api)
+		slots = c.get("/availability/1/2030-01-07").json()
+		assert [s["start_time"] for s in slots] == ["09:00:00", "10:00:00", "15:00:00"]
+		assert [s["availability_id"] is None for s in slots] == [True, True, False]
+		r = c.post("/book/1/2030-01-07", json={"patient_id": 1, "start_time": "10:00:00", "end_time": "10:30:00", "reason": "checkup"})
+		assert r.status_code == 200
+		assert c.post("/book/1/2030-01-07", json={"patient_id": 1, "start_time": "10:00:00", "end_time": "10:30:00", "reason": "again"}).status_code == 400
+		days = c.get("/availability_next_days/1/2030-01-07/8").json()
+		assert days == [{"date": "2030-01-07", "slots": [{"start_time": "09:00:00", "end_time": "09:30:00", "is_booked": False}, {"start_time": "15:00:00", "end_time": "15:30:00", "is_booked": False}]}]
+	finally:
+		api.dependency_overrides.clear()
+
+
+def test_schedule_endpoints_replace_templates(session):
+	eng, db = session
+	from app.main import app
+	sessions = sessionmaker(bind=eng)
+
+	def override():
+		s = sessions()
+		try:
+			yield s
+		finally:
+			s.close()
+
+	app.dependency_overrides[get_db] = override
+	try:
+		c = TestClient(app)
+		r = c.put("/doctors/2/schedule", json=[{"weekday": 1, "start_time": "14:00", "end_time": "15:00", "slot_minutes": 20}])
+		assert r.status_code == 200 and r.json()[0]["template_id"]
+		assert c.put("/doctors/2/schedule", json=[{"weekday": 1, "start_time": "15:00", "end_time": "14:00"}]).status_code == 400
+		assert c.post("/doctors/2/schedule/exceptions", json={"exception_date": "2030-01-08", "start_time": "14:20"}).status_code == 400
+		assert c.post("/doctors/2/schedule/exceptions", json={"exception_date": "2030-01-08", "start_time": "14:20", "end_time": "14:40"}).status_code == 200
+	finally:
+		app.dependency_overrides.clear()
+	db.expire_all()
+	assert free_slots(db, 2, MON) == {}
+	assert _starts(free_slots(db, 2, TUE)[TUE]) == ["14:00", "14:40"]
+
+
+def test_concurrently_materialized_slot_is_reported_taken(session, monkeypatch):
+	from app.services import availability
+	eng, db = session
+	load = availability.DayPlan.__init__
+
+	def racing(self, *args, **kwargs):
+		# another booking materializes 10:00 after this plan has been read
+		load(self, *args, **kwargs)
+		with eng.begin() as conn:
+			conn.execute(models.DoctorAvailability.__table__.insert(), [{"doctor_id": 1, "available_date": MON, "start_time": time(10), "end_time": time(10, 30), "is_booked": True}])
+
+	monkeypatch.setattr(availability.DayPlan, "__init__", racing)
+	with pytest.raises(ValueError, match="No free"):
+		book_slot(db, 1, 1, MON.isoformat(), "10:00", duration_minutes=30)
+	assert db.query(models.Appointment).filter_by(patient_id=1).count() == 0
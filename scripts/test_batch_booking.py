@@ -0,0 +1,106 @@
+from datetime import date, time, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine, get_db
+from app import models
+from app.services.visit_summary import rebuild
+from app.services.booking import book_batch
+
+MON = date(2030, 1, 7)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'batch.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": i, "name": f"P{i}"} for i in (1, 2, 3)])
+		conn.execute(models.DoctorScheduleTemplate.__table__.insert(), [{"doctor_id": 1, "weekday": 0, "start_time": time(9), "end_time": time(12), "slot_minutes": 30}])
+		# Core inserts skip the ORM hooks; this also resets the per-process summary cache
+		rebuild(conn)
+	return eng
+
+
+def _count(db):
+	return db.query(models.Appointment).count(), db.query(models.DoctorAvailability).count()
+
+
+def test_weekly_series_in_one_transaction(engine):
+	db = sessionmaker(bind=engine)()
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+	series = [{"doctor_id": 1, "patient_id": 1, "date": MON + timedelta(weeks=w), "start_time": time(9)} for w in range(6)]
+	results = book_batch(db, series)
+	# lookups + one day plan + the inserts (batched on Postgres) + one summary rebuild, not six rounds of queries and commits
+	assert len(statements) <= 8 + 2 * len(series)
+	assert all(r["booked"] for r in results)
+	# the first visit is a new-patient hour, the follow-ups are returning half-hours
+	assert [r["end_time"] for r in results] == [time(10)] + [time(9, 30)] * 5
+	assert [a.visit_type for a in db.query(models.Appointment).order_by(models.Appointment.appointment_date)] == ["new"] + ["returning"] * 5
+	db.close()
+
+
+def test_all_or_nothing_and_best_effort(engine):
+	db = sessionmaker(bind=engine)()
+	family = [
+		{"doctor_id": 1, "patient_id": 2, "date": MON, "start_time": time(10), "duration_minutes": 30},
+		{"doctor_id": 1, "patient_id": 3, "date": MON, "start_time": time(10), "duration_minutes": 30},
+		{"doctor_id": 1, "patient_id": 9, "date": MON, "start_time": time(11)},
+	]
+	results = book_batch(db, family)
+	assert [r["booked"] for r in results] == [False, False, False]
+	assert [r["error"] for r in results][1:] == ["No free 30-minute slot at 10:00 on 2030-01-07", "Patient not found"]
+	assert results[0]["error"].startswith("Not booked")
+	assert _count(db) == (0, 0)
+	results = book_batch(db, family, mode="best_effort")
+	assert [r["booked"] for r in results] == [True, False, False] and results[0]["appointment_id"]
+	assert _count(db) == (1, 1)
+	with pytest.raises(ValueError):
+		book_batch(db, family, mode="sometimes")
+	db.close()
+
+
+def test_batch_endpoint(engine):
+	from app.main import app
+	sessions = sessionmaker(bind=engine)
+
+	def override():
+		s = sessions()
+		try:
+			yield s
+		finally:
+			s.close()
+
+	app.dependency_overrides[get_db] = override
+	try:
+		c = TestClient(app)
+		items = [{"doctor_id": 1, "patient_id": p, "date": "2030-01-07", "start_time": t, "duration_minutes": 30} for p, t in ((2, "09:00"), (3, "09:30"))]
+		r = c.post("/appointments/book_batch", json={"items": items, "mode": "best_effort"})
+		assert r.status_code == 200
+		body = r.json()
+		assert (body["booked"], body["failed"]) == (2, 0) and [x["end_time"] for x in body["results"]] == ["09:30:00", "10:00:00"]
+		assert c.post("/appointments/book_batch", json={"items": items, "mode": "maybe"}).status_code == 422
+		assert c.post("/appointments/book_batch", json={"items": []}).status_code == 422
+	finally:
+		app.dependency_overrides.clear()
+
+
+def test_slot_taken_concurrently_books_nothing(engine, monkeypatch):
+	from app.services import booking
+	db = sessionmaker(bind=engine)()
+	load = booking.DayPlan.__init__
+
+	def racing(self, *args, **kwargs):
+		load(self, *args, **kwargs)
+		with engine.begin() as conn:
+			conn.execute(models.DoctorAvailability.__table__.insert(), [{"doctor_id": 1, "available_date": MON, "start_time": time(11), "end_time": time(11, 30), "is_booked": True}])
+
+	monkeypatch.setattr(booking.DayPlan, "__init__", racing)
+	intents = [{"doctor_id": 1, "patient_id": p, "date": MON, "start_time": time(9 + p), "duration_minutes": 30} for p in (1, 2)]
+	results = book_batch(db, intents, mode="best_effort")
+	assert not any(r["booked"] for r in results) and "concurrent" in results[1]["error"]
+	assert _count(db) == (0, 1)
+	db.close()
@@ -0,0 +1,49 @@
+import json
+import agent
+from app.metrics import LLM_SKIPPED
+from app.integrations.llm import StubLLM, use_llm, reset_llm, estimate_tokens
+from app.services.candidates import rank, clear_winner, build_choice_prompt
+from scripts.generate_data import patient_rows
+
+DOCTORS = [
+	{"doctor_id": 1, "name": "Dr. Ahuja", "specialization": "General"},
+	{"doctor_id": 2, "name": "Dr. Mehra", "specialization": "Cardiology"},
+	{"doctor_id": 3, "name": "Dr. Mehta", "specialization": "Dermatology"},
+]
+
+
+def test_typo_doctor_is_a_clear_winner_without_llm():
+	ranked = rank("Dr Ahuj", DOCTORS, "doctors")
+	assert ranked[0][1]["doctor_id"] == 1
+	assert clear_winner(ranked, 0.9, 0.15)["doctor_id"] == 1
+	stub = StubLLM({})
+	use_llm(stub)
+	try:
+		before = LLM_SKIPPED.value(purpose="choose_doctors")
+		assert agent.choose_id("dr. ahuja", DOCTORS, "doctors") == (1, False)
+		assert LLM_SKIPPED.value(purpose="choose_doctors") == before + 1
+	finally:
+		reset_llm()
+	assert stub.hits + stub.misses == 0
+
+
+def test_ambiguous_name_defers_to_llm_with_ranked_prompt():
+	ranked = rank("Dr Meh", DOCTORS, "doctors")
+	assert clear_winner(ranked, 0.9, 0.15) is None
+	stub = StubLLM({}, default=json.dumps({"id": 2}))
+	use_llm(stub)
+	try:
+		assert agent.choose_id("Dr Meh", DOCTORS, "doctors") == (2, True)
+		assert agent.choose_id("Dr Meh", DOCTORS, "doctors", allow_llm=False) == (None, False)
+	finally:
+		reset_llm()
+
+
+def test_prompt_respects_token_budget_best_first():
+	patients = [{"patient_id": i + 1, **r} for i, r in enumerate(patient_rows(2000))]
+	ranked = rank("patient1234@exmple.com", patients, "patients", 25)
+	assert len(ranked) == 25 and ranked[0][1]["email"] == "patient1234@example.com"
+	prompt, n, tokens = build_choice_prompt("patient1234@exmple.com", ranked, "patients", 200)
+	assert 1 < n < 25 and tokens <= 200 and tokens == estimate_tokens(prompt)
+	assert prompt.index("patient1234@example.com") < prompt.index(ranked[1][1]["email"])
+	assert "phone" not in prompt
@@ -0,0 +1,29 @@
+from sqlalchemy.pool import QueuePool
+from app import db
+from app.config import settings
+
+
+def test_pool_settings_are_applied(monkeypatch):
+	monkeypatch.setattr(settings, "db_pool_size", 3)
+	monkeypatch.setattr(settings, "db_max_overflow", 2)
+	monkeypatch.setattr(settings, "db_pgbouncer", False)
+	opts = db.engine_options("postgresql://u:p@localhost/clinicdb")
+	assert opts["poolclass"] is db.TimedQueuePool
+	assert (opts["pool_size"], opts["max_overflow"]) == (3, 2)
+
+
+def test_pgbouncer_mode_disables_pooling_and_statement_cache(monkeypatch):
+	monkeypatch.setattr(settings, "db_pgbouncer", True)
+	opts = db.engine_options("postgresql+asyncpg://u:p@localhost/clinicdb")
+	assert opts["poolclass"] is db.TimedNullPool
+	assert opts["connect_args"]["statement_cache_size"] == 0
+
+
+def test_pool_metrics_track_checkouts(tmp_path):
+	eng = db.create_db_engine(f"sqlite:///{tmp_path / 'm.db'}")
+	before = db.pool_stats.checkouts
+	with eng.connect():
+		m = db.pool_metrics(eng)
+		assert m["checked_out"] == 1
+	assert isinstance(eng.pool, QueuePool)
+	assert db.pool_metrics(eng)["checkouts"] == before + 1
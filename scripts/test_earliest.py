@@ -0,0 +1,83 @@
+from datetime import date, time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine, get_db
+from app import models
+from app.services.visit_summary import rebuild
+from app.services.availability import earliest_slots
+from scripts.loadtest import _load_app_py
+
+MON, TUE, FRI = date(2030, 1, 7), date(2030, 1, 8), date(2030, 1, 11)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'earliest.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [
+			{"doctor_id": 1, "name": "Dr. Ahuja", "specialization": "Pediatrics"},
+			{"doctor_id": 2, "name": "Dr. Mehra", "specialization": "Cardiology"},
+			{"doctor_id": 3, "name": "Dr. Iyer", "specialization": "Pediatrics"},
+		])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": 1, "name": "P1"}])
+		# Ahuja: Tuesday mornings; Iyer: Friday afternoons; Mehra: one explicit Monday slot
+		conn.execute(models.DoctorScheduleTemplate.__table__.insert(), [
+			{"doctor_id": 1, "weekday": 1, "start_time": time(9), "end_time": time(11), "slot_minutes": 30},
+			{"doctor_id": 3, "weekday": 4, "start_time": time(14), "end_time": time(16), "slot_minutes": 30},
+		])
+		conn.execute(models.DoctorAvailability.__table__.insert(), [{"doctor_id": 2, "available_date": MON, "start_time": time(8), "end_time": time(8, 30), "is_booked": False}])
+		conn.execute(models.Appointment.__table__.insert(), [{"doctor_id": 1, "patient_id": 1, "appointment_date": TUE, "start_time": time(9), "end_time": time(9, 30)}])
+		# Core inserts skip the ORM hooks; this also resets the per-process summary cache
+		rebuild(conn)
+	return eng
+
+
+def _opts(options):
+	return [(o["doctor_id"], o["date"], o["start_time"].strftime("%H:%M")) for o in options]
+
+
+def test_first_fit_across_doctors(engine):
+	db = sessionmaker(bind=engine)()
+	assert _opts(earliest_slots(db, 30, MON, 14, k=3)) == [(2, MON, "08:00"), (1, TUE, "09:30"), (1, TUE, "10:00")]
+	# 60 minutes needs two free template slots; Mehra's lone 30-minute row does not qualify
+	assert _opts(earliest_slots(db, 60, MON, 14, k=2)) == [(1, TUE, "09:30"), (1, TUE, "10:00")]
+	assert _opts(earliest_slots(db, 30, MON, 14, k=3, specialization="pediatric", per_doctor=1)) == [(1, TUE, "09:30"), (3, FRI, "14:00")]
+	assert _opts(earliest_slots(db, 30, MON, 14, k=1, period="afternoon")) == [(3, FRI, "14:00")]
+	assert earliest_slots(db, 30, MON, 3, specialization="dermatology") == []
+	db.close()
+
+
+def test_search_stops_early(engine):
+	db = sessionmaker(bind=engine)()
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+	# a 92-day horizon answered from the first matching day: doctors, weekdays, next free row, one day plan
+	assert len(earliest_slots(db, 30, MON, 92, k=1)) == 1
+	assert len(statements) <= 7
+	db.close()
+
+
+def test_api(engine):
+	api = _load_app_py()
+	sessions = sessionmaker(bind=engine)
+
+	def override():
+		s = sessions()
+		try:
+			yield s
+		finally:
+			s.close()
+
+	api.dependency_overrides[get_db] = override
+	try:
+		c = TestClient(api)
+		assert {"doctor_id": 3, "name": "Dr. Iyer", "specialization": "Pediatrics"} in c.get("/doctors").json()
+		# patient 1 has a visit on record, so the standard policy gives 30 minutes
+		r = c.get("/earliest_available", params={"specialization": "Pediatrics", "patient_id": 1, "start_date": "2030-01-07", "k": 2})
+		assert [(o["doctor_name"], o["date"], o["start_time"], o["end_time"]) for o in r.json()] == [("Dr. Ahuja", "2030-01-08", "09:30:00", "10:00:00"), ("Dr. Ahuja", "2030-01-08", "10:00:00", "10:30:00")]
+		assert c.get("/earliest_available", params={"period": "brunch"}).status_code == 400
+	finally:
+		api.dependency_overrides.clear()
@@ -0,0 +1,73 @@
+import os
+import pytest
+from scripts.export_files import EXTENSIONS, ExportWriter, open_export, file_sha256, write_manifest, export_chain, latest_export
+from scripts.import_csv_to_postgres import find_table_files, import_table, read_header, merge_sql
+
+CSV = 'doctor_id,name\n1,"Dr. A\nnewline"\n2,Dr. B\n'
+
+
+@pytest.mark.parametrize("compression", sorted(EXTENSIONS))
+def test_writer_roundtrip_and_checksum(tmp_path, compression):
+	if compression == "zstd":
+		pytest.importorskip("zstandard")
+	path = str(tmp_path / f"doctors{EXTENSIONS[compression]}")
+	with ExportWriter(path, compression) as f:
+		# COPY TO STDOUT hands over arbitrary byte chunks
+		for chunk in (CSV[:7].encode(), CSV[7:]):
+			f.write(chunk)
+		info = f.close()
+	assert info == {"sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+	with open_export(path) as f:
+		assert read_header(f) == ["doctor_id", "name"]
+		assert f.read() == CSV.split("\n", 1)[1]
+
+
+def test_importer_uses_manifest_and_rejects_corrupt_files(tmp_path):
+	public = tmp_path / "public"
+	public.mkdir()
+	path = str(public / "doctors.csv.gz")
+	with ExportWriter(path, "gzip") as f:
+		f.write(CSV.encode())
+		info = f.close()
+	write_manifest(str(tmp_path), {"compression": "gzip", "tables": {"public.doctors": {"file": "public/doctors.csv.gz", "rows": 2, **info}}})
+	(public / "patients.csv").write_text("patient_id\n")  # not in the manifest, so ignored
+	files = find_table_files(str(public), "public")
+	assert files == {"doctors": (path, {"file": "public/doctors.csv.gz", "rows": 2, **info})}
+
+	with open(path, "ab") as f:
+		f.write(b"tampered")
+	with pytest.raises(ValueError, match="checksum"):
+		import_table({}, "public", "doctors", path, files["doctors"][1])
+
+
+def test_without_manifest_any_extension_is_found(tmp_path):
+	(tmp_path / "doctors.csv.zst").write_bytes(b"")
+	(tmp_path / "appointments.csv").write_text("appointment_id\n")
+	assert {t: os.path.basename(p) for t, (p, _) in find_table_files(str(tmp_path), "public").items()} == {"doctors": "doctors.csv.zst", "appointments": "appointments.csv"}
+
+
+def _export(base, name, created_at, kind="full", parent=None, database="clinicdb"):
+	root = base / name
+	root.mkdir()
+	write_manifest(str(root), {"database": database, "export_id": name, "created_at": created_at, "kind": kind, "base": parent, "tables": {}})
+	return str(root)
+
+
+def test_delta_chain_resolves_back_to_full_export(tmp_path):
+	full = _export(tmp_path, "clinicdb-1", "2030-01-01T00:00:00")
+	d1 = _export(tmp_path, "clinicdb-2", "2030-01-02T00:00:00", "delta", "clinicdb-1")
+	d2 = _export(tmp_path, "clinicdb-3", "2030-01-03T00:00:00", "delta", "clinicdb-2")
+	_export(tmp_path, "otherdb-9", "2031-01-01T00:00:00", database="otherdb")
+	assert [root for root, _ in export_chain(d2)] == [full, d1, d2]
+	assert [root for root, _ in export_chain(full)] == [full]
+	assert latest_export(str(tmp_path), "clinicdb")[0] == d2
+	assert latest_export(str(tmp_path), "clinicdb", exclude=d2)[0] == d1
+	orphan = _export(tmp_path, "clinicdb-4", "2030-01-04T00:00:00", "delta", "clinicdb-missing")
+	with pytest.raises(ValueError, match="not found"):
+		export_chain(orphan)
+
+
+def test_delta_tables_merge_as_upserts():
+	cols = ["appointment_id", "status"]
+	assert merge_sql("public", "appointments", cols, upsert=True).endswith('ON CONFLICT ("appointment_id") DO UPDATE SET "status" = EXCLUDED."status"')
+	assert merge_sql("public", "appointments", cols).endswith('ON CONFLICT ("appointment_id") DO NOTHING')
@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+from app.services.history_store import HistoryStore
+
+
+def test_wal_and_created_at_index(tmp_path):
+	store = HistoryStore(str(tmp_path / "h.db"))
+	store.log_prompt("doctor", "hi", "hello")
+	store.flush()
+	conn = sqlite3.connect(str(tmp_path / "h.db"))
+	assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+	idx = {r[1] for r in conn.execute("SELECT type, name FROM sqlite_master WHERE type='index'")}
+	assert "idx_prompts_created_at" in idx
+	store.close()
+
+
+def test_concurrent_writes_are_all_persisted(tmp_path):
+	store = HistoryStore(str(tmp_path / "h.db"), batch_size=50)
+
+	def worker(n):
+		for i in range(100):
+			store.log_prompt("doctor", f"{n}-{i}", "")
+			store.log_notification(f"doctor:{n}", "in_app", "msg")
+
+	threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert store.flush(timeout=5)
+	conn = sqlite3.connect(str(tmp_path / "h.db"))
+	assert conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == 400
+	assert conn.execute("SELECT COUNT(*) FROM notifications").fetchone()[0] == 400
+	store.close()
+
+
+def test_list_reads_own_writes(tmp_path):
+	store = HistoryStore(str(tmp_path / "h.db"))
+	for i in range(3):
+		store.log_prompt("doctor", f"p{i}", f"r{i}")
+	rows = store.list_prompts(limit=2)
+	assert [r["prompt"] for r in rows] == ["p2", "p1"]
+	store.close()
+
+
+def test_keyset_pagination_and_filters(tmp_path):
+	store = HistoryStore(str(tmp_path / "h.db"))
+	for i in range(5):
+		store.log_prompt("doctor", f"d1-{i}", "", doctor_id=1)
+		store.log_prompt("patient", f"p-{i}", "")
+	first = store.list_prompts(limit=3, doctor_id=1)
+	assert [r["prompt"] for r in first] == ["d1-4", "d1-3", "d1-2"]
+	rest = store.list_prompts(limit=3, doctor_id=1, before_id=first[-1]["id"])
+	assert [r["prompt"] for r in rest] == ["d1-1", "d1-0"]
+	assert all(r["role"] == "patient" for r in store.list_prompts(role="patient"))
+	assert store.list_prompts(start_date="2000-01-01", end_date="2000-01-02") == []
+	store.close()
+
+
+def test_old_history_file_is_migrated(tmp_path):
+	path = str(tmp_path / "h.db")
+	conn = sqlite3.connect(path)
+	conn.execute("CREATE TABLE prompts (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT, prompt TEXT, response TEXT, created_at TEXT)")
+	conn.execute("INSERT INTO prompts(role, prompt, response, created_at) VALUES ('doctor','old','', '2020-01-01T00:00:00')")
+	conn.commit()
+	conn.close()
+	store = HistoryStore(path)
+	store.log_prompt("doctor", "new", "", doctor_id=7)
+	assert [r["prompt"] for r in store.list_prompts(doctor_id=7)] == ["new"]
+	assert len(store.list_prompts()) == 2
+	store.close()
+
+
+def test_compact_archives_old_rows(tmp_path):
+	import gzip, json
+	path = str(tmp_path / "h.db")
+	store = HistoryStore(path)
+	store.log_notification("doctor:1", "in_app", "recent")
+	store.flush()
+	conn = sqlite3.connect(path)
+	conn.execute("INSERT INTO notifications(user, channel, message, created_at) VALUES ('doctor:1','in_app','old','2001-01-01T00:00:00')")
+	conn.commit()
+	conn.close()
+	archived = store.compact(retention_days=30, archive_dir=str(tmp_path / "archive"))
+	assert archived == {"prompts": 0, "notifications": 1}
+	assert [r["message"] for r in store.list_notifications("doctor:1")] == ["recent"]
+	files = list((tmp_path / "archive").iterdir())
+	assert len(files) == 1
+	with gzip.open(files[0], "rt") as f:
+		assert json.loads(f.readline())["message"] == "old"
+	store.close()
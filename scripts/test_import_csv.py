@@ -0,0 +1,32 @@
+import io
+from scripts.import_csv_to_postgres import fk_levels, read_header, staging_sql, copy_sql, merge_sql, skip_conflicts_sql
+
+
+def test_fk_levels_parallelize_independent_tables():
+	assert fk_levels(["patient_reports", "appointments", "patients", "doctors", "doctor_availability"]) == [
+		["doctors", "patients"], ["doctor_availability", "appointments"], ["patient_reports"],
+	]
+	# parents missing from the export do not block their children
+	assert fk_levels(["appointments", "patient_reports"]) == [["appointments"], ["patient_reports"]]
+
+
+def test_header_is_consumed_and_rest_left_for_copy():
+	f = io.StringIO('doctor_id,"name",is_booked\n1,"Dr. A, Sr",True\n2,,\n')
+	assert read_header(f) == ["doctor_id", "name", "is_booked"]
+	assert f.read() == '1,"Dr. A, Sr",True\n2,,\n'
+
+
+def test_copy_then_merge_statements():
+	cols = ["doctor_id", "name"]
+	assert staging_sql("public", "doctors", cols) == 'CREATE TEMP TABLE "stg_doctors" ON COMMIT DROP AS SELECT "doctor_id", "name" FROM public."doctors" WITH NO DATA'
+	assert copy_sql("doctors", cols) == 'COPY "stg_doctors" ("doctor_id", "name") FROM STDIN WITH (FORMAT csv, FORCE_NULL ("doctor_id", "name"))'
+	assert merge_sql("public", "doctors", cols).endswith('FROM "stg_doctors" ON CONFLICT ("doctor_id") DO NOTHING')
+	assert merge_sql("public", "doctors", ["name"]).endswith("ON CONFLICT DO NOTHING")
+	# slot collisions under another id are dropped from staging before the primary-key merge
+	slot = ["availability_id", "doctor_id", "available_date", "start_time", "end_time", "is_booked"]
+	assert skip_conflicts_sql("public", "doctor_availability", slot) == (
+		'DELETE FROM "stg_doctor_availability" s USING public."doctor_availability" t WHERE s."doctor_id" = t."doctor_id" AND '
+		's."available_date" = t."available_date" AND s."start_time" = t."start_time" AND s."end_time" = t."end_time" '
+		'AND s."availability_id" <> t."availability_id" RETURNING s."availability_id"'
+	)
+	assert skip_conflicts_sql("public", "doctors", cols) is None
@@ -0,0 +1,42 @@
+import os
+import sys
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on first use (LLM, Google, Excel export, task queue)
+DEFERRED = ("pandas", "celery", "langchain_groq", "langchain_core", "googleapiclient", "google.oauth2", "requests")
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+
+
+def import_profile(stmt: str) -> dict[str, int]:
+	# python -X importtime writes "import time: self | cumulative | name" to stderr
+	proc = subprocess.run([sys.executable, "-X", "importtime", "-c", stmt], cwd=PROJECT_ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+	assert proc.returncode == 0, proc.stderr[-2000:]
+	out: dict[str, int] = {}
+	for line in proc.stderr.splitlines():
+		if not line.startswith("import time:") or "cumulative" in line:
+			continue
+		_, cumulative, name = line[len("import time:"):].split("|")
+		out[name.strip()] = int(cumulative)
+	return out
+
+
+def test_app_main_defers_heavy_imports():
+	profile = import_profile("import app.main")
+	loaded = sorted(m for m in DEFERRED if m in profile)
+	assert not loaded, f"app.main imports deferred modules eagerly: {loaded}"
+	assert profile["app.main"] / 1000 < BUDGET_MS, f"app.main import took {profile['app.main'] / 1000:.0f}ms"
+
+
+def test_app_py_defers_heavy_imports():
+	# app.py is shadowed by the app/ package, so execute it by path
+	profile = import_profile("import runpy; runpy.run_path('app.py')")
+	loaded = sorted(m for m in DEFERRED if m in profile)
+	assert not loaded, f"app.py imports deferred modules eagerly: {loaded}"
+
+
+if __name__ == "__main__":
+	profile = import_profile("import app.main")
+	for name, us in sorted(profile.items(), key=lambda kv: kv[1], reverse=True)[:25]:
+		print(f"{us / 1000:9.1f} ms  {name}")
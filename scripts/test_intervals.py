@@ -0,0 +1,76 @@
+from datetime import date, time
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine
+from app import models
+from app.services.availability import DayPlan, free_slots, materialize_slot
+from app.services.booking import book_slot, get_policy
+from app.services.intervals import IntervalSet
+
+MON = date(2030, 1, 7)
+
+
+def test_interval_set_merges_and_queries():
+	s = IntervalSet([(600, 630), (540, 570), (570, 600), (700, 760)])
+	assert list(s) == [(540, 630), (700, 760)]
+	assert s.overlaps(620, 640) and s.overlaps(500, 541) and not s.overlaps(630, 700) and not s.overlaps(760, 800)
+	assert s.covers(550, 630) and not s.covers(620, 710)
+	s.subtract(560, 580)
+	assert list(s) == [(540, 560), (580, 630), (700, 760)]
+	assert list(s.minus(IntervalSet([(0, 545), (600, 720)]))) == [(545, 560), (580, 600), (720, 760)]
+	# gaps sit on a grid anchored at each interval start, from `after` onwards
+	assert s.gaps(20, step=10) == [540, 580, 590, 600, 610, 700, 710, 720, 730, 740]
+	assert s.gaps(40, step=15, after=585, limit=2) == [700, 715]
+	assert s.minus(IntervalSet([(700, 712)])).gaps(15, step=15, grid=s) == [540, 580, 595, 610, 715, 730, 745]
+
+
+def test_policies():
+	assert get_policy("standard").minutes(False) == 60 and get_policy("standard").minutes(True) == 30
+	assert get_policy("extended").minutes(True) == 45
+	with pytest.raises(ValueError):
+		get_policy("nope")
+
+
+@pytest.fixture()
+def db(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'iv.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Rao"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": i, "name": f"P{i}"} for i in (1, 2, 3)])
+		conn.execute(models.DoctorScheduleTemplate.__table__.insert(), [{"doctor_id": 1, "weekday": 0, "start_time": time(9), "end_time": time(12), "slot_minutes": 15}])
+	s = sessionmaker(bind=eng)()
+	yield s
+	s.close()
+
+
+def test_variable_lengths_and_buffers(db):
+	a = book_slot(db, 1, 1, "2030-01-07", "09:15", duration_minutes=45)
+	assert (a.start_time, a.end_time) == (time(9, 15), time(10))
+	with pytest.raises(ValueError, match="No free 90-minute slot"):
+		book_slot(db, 1, 2, "2030-01-07", "09:45", duration_minutes=90)
+	# 90 minutes from 10:00 fits; one row per booking whatever the length
+	b = book_slot(db, 1, 2, "2030-01-07", "10:00", duration_minutes=90)
+	assert b.end_time == time(11, 30)
+	assert db.query(models.DoctorAvailability).count() == 2
+	assert [s["start_time"] for s in free_slots(db, 1, MON)[MON]] == [time(9), time(11, 30), time(11, 45)]
+	# a 10-minute buffer around bookings rules out the slot right after 11:30
+	assert materialize_slot(db, 1, MON, time(11, 30), time(11, 45), buffer=10) is None
+	plan = DayPlan(db, [1], MON, MON, buffer=10)
+	assert plan.openings(1, MON, 15) == [(time(11, 45), time(12))]
+	assert plan.openings(1, MON, 30) == []
+	with pytest.raises(ValueError, match="does not fit"):
+		book_slot(db, 1, 3, "2030-01-07", "23:30", duration_minutes=60)
+
+
+def test_claim_reuses_explicit_rows(db):
+	t = models.DoctorAvailability
+	db.add_all([t(doctor_id=1, available_date=MON, start_time=time(14), end_time=time(14, 30), is_booked=False), t(doctor_id=1, available_date=MON, start_time=time(14, 30), end_time=time(15), is_booked=False)])
+	db.commit()
+	plan = DayPlan(db, [1], MON, MON)
+	# a 60-minute visit over two legacy half-hour rows claims both and adds nothing
+	assert plan.claim(1, MON, time(14), time(15)).start_time == time(14)
+	assert plan.claim(1, MON, time(14, 30), time(15)) is None
+	assert plan.claim(1, MON, time(9), time(9, 20)) is not None
+	db.commit()
+	assert db.query(t).count() == 3 and db.query(t).filter(t.is_booked.is_(False)).count() == 0
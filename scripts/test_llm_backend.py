@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import pytest
+from app.integrations.llm import StubLLM, RecordingLLM, load_fixtures, prompt_key
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_stub_replays_and_falls_back_on_miss():
+	stub = StubLLM({})
+	stub.add("hello", '{"id": 3}')
+	assert stub.invoke("hello").content == '{"id": 3}'
+	assert stub.invoke("  hello\n").content == '{"id": 3}'
+	assert stub.invoke("unknown").content == "{}"
+	assert (stub.hits, stub.misses) == (2, 1)
+	with pytest.raises(KeyError):
+		StubLLM({}, strict=True).invoke("unknown")
+
+
+def test_stub_latency():
+	stub = StubLLM({}, latency_ms=30)
+	stub.add("p", "r", latency_ms=80)
+	t0 = time.perf_counter()
+	stub.invoke("p")
+	assert time.perf_counter() - t0 >= 0.025
+	replay = StubLLM(stub.fixtures, replay_latency=True)
+	t0 = time.perf_counter()
+	replay.invoke("p")
+	assert time.perf_counter() - t0 >= 0.075
+
+
+def test_recorder_writes_fixtures_the_stub_replays(tmp_path):
+	live = StubLLM({})
+	live.add("Query: a", '{"intent": "list_doctors"}')
+	path = str(tmp_path / "fx" / "llm.jsonl")
+	rec = RecordingLLM(live, path, model="m")
+	assert rec.invoke("Query: a").content == '{"intent": "list_doctors"}'
+	rec.invoke("Query: b")
+	fixtures = load_fixtures(path)
+	assert fixtures[prompt_key("Query: a")]["model"] == "m"
+	assert StubLLM(path).invoke("Query: b").content == "{}"
+
+
+def test_agent_imports_and_parses_offline(tmp_path):
+	path = tmp_path / "llm.jsonl"
+	stmt = (
+		"import agent, json; "
+		"print(json.dumps(agent.llm_parse('Is Dr. Ahuja free tomorrow afternoon?')))"
+	)
+	prompt = subprocess.run([sys.executable, "-c", "import agent; print(agent.parse_prompt('Is Dr. Ahuja free tomorrow afternoon?'), end='')"], cwd=PROJECT_ROOT, capture_output=True, text=True, env={**os.environ, "GROQ_API_KEY": ""})
+	assert prompt.returncode == 0, prompt.stderr[-2000:]
+	path.write_text(json.dumps({"prompt": prompt.stdout, "response": '{"intent": "check_availability", "doctor_name": "Ahuja", "date": "tomorrow", "time_period": "afternoon"}'}) + "\n")
+	env = {**os.environ, "GROQ_API_KEY": "", "LLM_BACKEND": "stub", "LLM_FIXTURES": str(path), "LLM_STUB_STRICT": "true"}
+	proc = subprocess.run([sys.executable, "-c", stmt], cwd=PROJECT_ROOT, capture_output=True, text=True, env=env)
+	assert proc.returncode == 0, proc.stderr[-2000:]
+	parsed = json.loads(proc.stdout.strip().splitlines()[-1])
+	assert parsed["intent"] == "check_availability"
+	assert parsed["doctor_name"] == "Dr. Ahuja"
+	assert parsed["date"] is not None
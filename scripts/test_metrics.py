@@ -0,0 +1,61 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from app.db import create_db_engine
+from app.metrics import Histogram, MetricsMiddleware, metrics_response, timed_node, AGENT_NODE_DURATION, DB_N_PLUS_ONE, HTTP_DURATION, LLM_DURATION
+from app.integrations.llm import StubLLM, get_llm, use_llm, reset_llm
+
+
+def test_histogram_renders_prometheus_text():
+	h = Histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+	h.observe(0.05, route="/a")
+	h.observe(0.5, route="/a")
+	h.observe(5, route="/a")
+	lines = h.render()
+	assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+	assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in lines
+	assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+	assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_middleware_counts_queries_and_flags_n_plus_one(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'm.db'}")
+	api = FastAPI()
+	api.add_middleware(MetricsMiddleware, app_name="test")
+
+	@api.get("/items/{n}")
+	def items(n: int):
+		with eng.connect() as conn:
+			for i in range(n):
+				conn.execute(text("SELECT :i"), {"i": i})
+		return {"n": n}
+
+	@api.get("/metrics")
+	def metrics():
+		return metrics_response()
+
+	c = TestClient(api)
+	r = c.get("/items/2")
+	assert r.headers["x-db-queries"] == "2"
+	assert "db;dur=" in r.headers["server-timing"]
+	assert DB_N_PLUS_ONE.value(app="test", route="/items/{n}") == 0
+	c.get("/items/12")
+	assert DB_N_PLUS_ONE.value(app="test", route="/items/{n}") == 1
+	assert HTTP_DURATION.count(app="test", method="GET", route="/items/{n}", status="200") == 2
+	body = c.get("/metrics").text
+	assert 'db_queries_per_request_bucket{app="test",route="/items/{n}",le="2"} 1' in body
+	assert "# TYPE http_request_duration_seconds histogram" in body
+
+
+def test_llm_and_node_timers():
+	stub = StubLLM({})
+	use_llm(stub)
+	try:
+		before = LLM_DURATION.count(backend="stub", model="m")
+		get_llm("m").invoke("hi")
+		assert LLM_DURATION.count(backend="stub", model="m") == before + 1
+	finally:
+		reset_llm()
+	node = timed_node("demo", lambda state: {"ok": state["x"]})
+	assert node({"x": 1}) == {"ok": 1}
+	assert AGENT_NODE_DURATION.count(node="demo") == 1
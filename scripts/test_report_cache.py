@@ -0,0 +1,105 @@
+from datetime import date, time as dt_time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine, get_db
+from app import models
+from app.services.report_cache import ReportCache, report_cache
+from scripts.loadtest import _load_app_py
+
+RANGE = {"start_date": "2030-01-07", "end_date": "2030-01-09"}
+
+
+@pytest.fixture()
+def env(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja"}, {"doctor_id": 2, "name": "Dr. Mehra"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": 1, "name": "P1"}])
+		conn.execute(models.Appointment.__table__.insert(), [
+			{"appointment_id": 1, "doctor_id": 1, "patient_id": 1, "appointment_date": date(2030, 1, 7), "start_time": dt_time(9), "end_time": dt_time(9, 30)},
+		])
+	api = _load_app_py()
+	sessions = sessionmaker(bind=eng)
+
+	def override():
+		db = sessions()
+		try:
+			yield db
+		finally:
+			db.close()
+
+	api.dependency_overrides[get_db] = override
+	report_cache.clear()
+	yield TestClient(api), sessions
+	api.dependency_overrides.clear()
+
+
+def _count(client, **spec):
+	r = client.post("/stats/query", json={**RANGE, **spec})
+	return r.headers["x-cache"], r.json()["totals"]
+
+
+def test_hits_and_precise_invalidation(env):
+	client, sessions = env
+	assert _count(client, doctor_id=1) == ("miss", {"appointments": 1})
+	assert _count(client, doctor_id=1) == ("hit", {"appointments": 1})
+	assert _count(client, doctor_id=2) == ("miss", {"appointments": 0})
+	assert _count(client, metrics=["symptom"], keyword="fever", doctor_id=1) == ("miss", {"symptom": 0})
+
+	# a write for doctor 2 leaves doctor 1's entry alone
+	with sessions() as s:
+		s.add(models.Appointment(doctor_id=2, patient_id=1, appointment_date=date(2030, 1, 8), start_time=dt_time(10), end_time=dt_time(10, 30)))
+		s.commit()
+	assert _count(client, doctor_id=1) == ("hit", {"appointments": 1})
+	assert _count(client, doctor_id=2) == ("miss", {"appointments": 1})
+
+	# a patient report is attributed to its appointment's doctor and day
+	with sessions() as s:
+		s.add(models.PatientReport(appointment_id=1, symptoms="Fever"))
+		s.commit()
+	assert _count(client, metrics=["symptom"], keyword="fever", doctor_id=1) == ("miss", {"symptom": 1})
+
+	# moving an appointment out of the range invalidates via the old date; rolled-back writes do not
+	with sessions() as s:
+		s.get(models.Appointment, 1).appointment_date = date(2030, 2, 1)
+		s.rollback()
+	assert _count(client, doctor_id=1)[0] == "hit"
+	with sessions() as s:
+		s.get(models.Appointment, 1).appointment_date = date(2030, 2, 1)
+		s.commit()
+	assert _count(client, doctor_id=1) == ("miss", {"appointments": 0})
+	stats = client.get("/stats/cache").json()
+	assert stats["hits"] == 3 and stats["invalidated"] >= 3
+
+
+def test_historical_ranges_use_longer_ttl():
+	cache = ReportCache(max_entries=2, ttl_seconds=0, historical_ttl_seconds=3600)
+	today = date.today().isoformat()
+	calls = []
+	compute = lambda: calls.append(1) or {"ok": True}
+	cache.get_or_compute({"start_date": "2020-01-01", "end_date": "2020-01-31"}, compute)
+	assert cache.get_or_compute({"start_date": "2020-01-01", "end_date": "2020-01-31"}, compute)[1]
+	cache.get_or_compute({"start_date": today, "end_date": today}, compute)
+	assert not cache.get_or_compute({"start_date": today, "end_date": today}, compute)[1]
+	assert len(calls) == 3 and cache.stats()["hit_rate"] == 0.25
+	# historical entries expire too, so writes this process never saw age out
+	cache = ReportCache(max_entries=2, ttl_seconds=60, historical_ttl_seconds=0)
+	cache.get_or_compute({"start_date": "2020-01-01", "end_date": "2020-01-31"}, compute)
+	assert not cache.get_or_compute({"start_date": "2020-01-01", "end_date": "2020-01-31"}, compute)[1]
+
+
+def test_bulk_writes_clear_through_shared_stamp(env, monkeypatch):
+	from app.services.report_cache import bump_sql
+	client, sessions = env
+	monkeypatch.setattr(report_cache, "version_check_seconds", 0)
+	assert _count(client, doctor_id=1, start_date="2020-01-01", end_date="2020-01-31") == ("miss", {"appointments": 0})
+	# a raw-SQL load from another process: no ORM events, only the cache_versions stamp
+	with sessions() as s:
+		s.execute(text("INSERT INTO appointments (doctor_id, patient_id, appointment_date, start_time, end_time) VALUES (1, 1, '2020-01-15', '09:00:00', '09:30:00')"))
+		s.execute(text(bump_sql()))
+		s.commit()
+	assert _count(client, doctor_id=1, start_date="2020-01-01", end_date="2020-01-31") == ("miss", {"appointments": 1})
+	assert _count(client, doctor_id=1, start_date="2020-01-01", end_date="2020-01-31") == ("hit", {"appointments": 1})
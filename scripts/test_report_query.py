@@ -0,0 +1,80 @@
+from datetime import date, time as dt_time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+import report_agent
+from app.db import Base, create_db_engine, get_db
+from app import models
+from scripts.loadtest import _load_app_py
+
+
+@pytest.fixture()
+def client(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja"}, {"doctor_id": 2, "name": "Dr. Mehra"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": i, "name": f"P{i}"} for i in (1, 2, 3)])
+		appts = [
+			(1, 1, date(2030, 1, 7), 9), (2, 1, date(2030, 1, 7), 10), (3, 1, date(2030, 1, 8), 9),
+			(4, 2, date(2030, 1, 8), 11), (5, 1, date(2030, 1, 9), 9),
+		]
+		conn.execute(models.Appointment.__table__.insert(), [
+			{"appointment_id": a, "doctor_id": d, "patient_id": a % 3 + 1, "appointment_date": day, "start_time": dt_time(h, 0), "end_time": dt_time(h, 30), "status": "Scheduled"}
+			for a, d, day, h in appts
+		])
+		conn.execute(models.PatientReport.__table__.insert(), [
+			{"appointment_id": 1, "symptoms": "Fever and cough"}, {"appointment_id": 1, "symptoms": "fever again"},
+			{"appointment_id": 3, "symptoms": "headache"}, {"appointment_id": 4, "symptoms": "high FEVER"},
+		])
+	api = _load_app_py()
+	sessions = sessionmaker(bind=eng)
+
+	def override():
+		db = sessions()
+		try:
+			yield db
+		finally:
+			db.close()
+
+	api.dependency_overrides[get_db] = override
+	yield TestClient(api)
+	api.dependency_overrides.clear()
+
+
+def test_compound_query_is_one_round_trip(client):
+	# the first lookup also reads the shared cache_versions stamp (rechecked every few seconds)
+	client.post("/stats/query", json={"metrics": ["appointments"], "start_date": "2030-01-07", "end_date": "2030-01-07"})
+	r = client.post("/stats/query", json={"metrics": ["appointments", "patients", "symptom"], "keyword": "fever", "start_date": "2030-01-07", "end_date": "2030-01-09", "group_by": ["day"]})
+	assert r.status_code == 200 and r.headers["x-db-queries"] == "1"
+	body = r.json()
+	assert [(g["date"], g["appointments"], g["symptom"]) for g in body["groups"]] == [("2030-01-07", 2, 1), ("2030-01-08", 2, 1), ("2030-01-09", 1, 0)]
+	assert body["totals"] == {"appointments": 5, "patients": None, "symptom": 2}
+	flat = client.post("/stats/query", json={"metrics": ["patients"], "doctor_id": 1, "start_date": "2030-01-07", "end_date": "2030-01-09"}).json()
+	assert flat["totals"] == {"patients": 3}
+	assert client.post("/stats/query", json={"metrics": ["revenue"]}).status_code == 400
+	assert client.post("/stats/query", json={"metrics": ["symptom"]}).status_code == 400
+
+
+def test_report_agent_uses_single_stats_call(client, monkeypatch):
+	monkeypatch.setenv("REPORT_AGENT_TEST_TODAY", "2030-01-09")
+	calls = []
+
+	def post(url, json=None, timeout=None):
+		calls.append(url)
+		return client.post(url.replace(report_agent.BASE_URL, ""), json=json)
+
+	monkeypatch.setattr(report_agent.requests, "post", post)
+	summary = lambda q: report_agent.summarize(report_agent._interpret_query(q), report_agent.call_stats_interpreted(report_agent._interpret_query(q), 1))
+	assert summary("tell times on 2030-01-07") == "Appointments on 2030-01-07: 09:00:00–09:30:00, 10:00:00–10:30:00."
+	assert summary("how many appointments and fever cases last 3 days") == "4 appointments and 1 patients with fever between 2030-01-07 and 2030-01-09."
+	assert summary("busiest day between 2030-01-07 and 2030-01-09") == "Busiest day between 2030-01-07 and 2030-01-09: 2030-01-07 (2 appointments)."
+	assert len(calls) == 3 and all(u.endswith("/stats/query") for u in calls)
+
+
+def test_summary_of_grouped_patients_has_no_total(client):
+	stats = client.post("/stats/query", json={"metrics": ["patients"], "start_date": "2030-01-07", "end_date": "2030-01-09", "group_by": ["day"]}).json()
+	assert stats["totals"] == {"patients": None}
+	assert report_agent.summarize({}, stats) == "Patients between 2030-01-07 and 2030-01-09 by day: 2030-01-07: 2; 2030-01-08: 2; 2030-01-09: 1."
+	empty = client.post("/stats/query", json={"metrics": ["patients"], "start_date": "2031-01-01", "end_date": "2031-01-02", "group_by": ["day"]}).json()
+	assert report_agent.summarize({}, empty) == "No data between 2031-01-01 and 2031-01-02."
@@ -0,0 +1,63 @@
+from datetime import date, time
+import pytest
+from sqlalchemy import func, select, text
+from app.db import Base, create_db_engine
+from app import models
+from app.services.schedule import WeeklyTemplate, expand, write_slots, ensure_slot_key
+
+
+def test_template_slots_and_exceptions():
+	tpl = WeeklyTemplate.from_dict({
+		"hours": {"mon": [["09:00", "10:00"], ["14:00", "15:15"]], "fri": [["09:00", "09:45"]]},
+		"slot_minutes": 30,
+		"exceptions": {"2030-01-14": [], "2030-01-18": [["12:00", "13:00"]]},
+	})
+	# 2030-01-07 is a Monday; a trailing 15-minute remainder does not make a slot
+	assert tpl.slots(date(2030, 1, 7)) == ((time(9), time(9, 30)), (time(9, 30), time(10)), (time(14), time(14, 30)), (time(14, 30), time(15)))
+	assert tpl.slots(date(2030, 1, 8)) == ()
+	assert tpl.slots(date(2030, 1, 11)) == ((time(9), time(9, 30)),)
+	assert tpl.slots(date(2030, 1, 14)) == ()
+	assert tpl.slots(date(2030, 1, 18)) == ((time(12), time(12, 30)), (time(12, 30), time(13)))
+	with pytest.raises(ValueError):
+		WeeklyTemplate({}, slot_minutes=0)
+
+
+def test_expand_covers_doctors_and_days():
+	a = WeeklyTemplate({d: [("09:00", "10:00")] for d in range(7)})
+	b = WeeklyTemplate({0: [("10:00", "10:45")]}, slot_minutes=15)
+	rows = expand({1: a, 2: b}, date(2030, 1, 6), date(2030, 1, 8))
+	assert len(rows) == 3 * 2 + 3
+	assert (2, date(2030, 1, 7), time(10, 30), time(10, 45)) in rows
+	assert not [r for r in rows if r[0] == 2 and r[1] != date(2030, 1, 7)]
+
+
+def test_write_slots_is_idempotent(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'slots.db'}")
+	Base.metadata.create_all(bind=eng)
+	tpl = WeeklyTemplate({d: [("09:00", "12:00")] for d in range(7)})
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. A"}, {"doctor_id": 2, "name": "Dr. B"}])
+		# an existing (booked) slot is left as it is
+		conn.execute(models.DoctorAvailability.__table__.insert(), [{"doctor_id": 1, "available_date": date(2030, 1, 7), "start_time": time(9), "end_time": time(9, 30), "is_booked": True}])
+		ensure_slot_key(conn)
+		rows = expand({1: tpl, 2: tpl}, date(2030, 1, 7), date(2030, 1, 9))
+		assert write_slots(conn, rows) == len(rows) - 1
+		assert write_slots(conn, rows) == 0
+		t = models.DoctorAvailability.__table__
+		assert conn.execute(select(func.count()).select_from(t)).scalar() == len(rows)
+		assert conn.execute(select(func.count()).select_from(t).where(t.c.is_booked.is_(True))).scalar() == 1
+
+
+def test_slot_key_migration_drops_duplicates(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+	Base.metadata.create_all(bind=eng)
+	t = models.DoctorAvailability.__table__
+	with eng.begin() as conn:
+		# a database from before the slot key, holding the same slot three times (one booked)
+		conn.execute(text("DROP INDEX uq_doctor_availability_slot"))
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. A"}])
+		slot = {"doctor_id": 1, "available_date": date(2030, 1, 7), "start_time": time(9), "end_time": time(9, 30)}
+		conn.execute(t.insert(), [{**slot, "is_booked": False}, {**slot, "is_booked": True}, {**slot, "is_booked": False}, {**slot, "start_time": time(10), "end_time": time(10, 30), "is_booked": False}])
+		assert ensure_slot_key(conn) == 2
+		assert ensure_slot_key(conn) == 0
+		assert conn.execute(select(t.c.availability_id, t.c.is_booked).order_by(t.c.availability_id)).all() == [(2, True), (4, False)]
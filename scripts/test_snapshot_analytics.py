@@ -0,0 +1,69 @@
+from datetime import date, time
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from scripts.export_files import ParquetTableWriter, arrow_type, write_manifest
+from scripts.snapshot_analytics import Snapshot
+
+# OIDs as psycopg2 reports them: int4, date, time, text, bool
+APPOINTMENTS = (["appointment_id", "doctor_id", "appointment_date", "start_time", "status", "reminder_sent"], [23, 23, 1082, 1083, 25, 16])
+REPORTS = (["report_id", "appointment_id", "symptoms"], [23, 23, 25])
+
+
+def _write(root, table, spec, rows, partition_by=None, batches=2):
+	w = ParquetTableWriter(str(root / "public" / table), spec[0], [arrow_type(o) for o in spec[1]], partition_by)
+	for i in range(batches):
+		w.write_rows(rows[i::batches])
+	return {"file": f"public/{table}", "format": "parquet", **w.close()}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+	appts = [
+		(1, 1, date(2030, 1, 30), time(9, 0), "booked", False),
+		(2, 1, date(2030, 1, 30), time(10, 0), "booked", True),
+		(3, 2, date(2030, 1, 31), time(9, 0), "cancelled", False),
+		(4, 1, date(2030, 2, 1), time(11, 30), "booked", None),
+		(5, 2, date(2030, 2, 1), time(9, 0), "booked", False),
+		(6, 2, date(2030, 2, 1), time(10, 0), "booked", False),
+	]
+	reports = [(1, 1, "Fever and cough"), (2, 3, "FEVER"), (3, 4, "headache"), (4, 6, None)]
+	tables = {
+		"public.appointments": _write(tmp_path, "appointments", APPOINTMENTS, appts, "appointment_date"),
+		"public.patient_reports": _write(tmp_path, "patient_reports", REPORTS, reports),
+		"public.doctors": _write(tmp_path, "doctors", (["doctor_id", "name"], [23, 25]), []),
+	}
+	write_manifest(str(tmp_path), {"format": "parquet", "tables": tables})
+	return Snapshot(str(tmp_path))
+
+
+def test_typed_month_partitions(snapshot):
+	entry = snapshot.manifest["tables"]["public.appointments"]
+	assert entry["rows"] == 6 and entry["partition_by"] == "appointment_date"
+	assert sorted(entry["files"]) == ["month=2030-01/part-0.parquet", "month=2030-02/part-0.parquet"]
+	schema = snapshot.dataset("appointments").schema
+	assert schema.field("appointment_date").type == pa.date32()
+	assert schema.field("start_time").type == pa.time64("us")
+	assert schema.field("reminder_sent").type == pa.bool_()
+	# empty tables still carry their schema
+	assert snapshot.dataset("doctors").count_rows() == 0
+
+
+def test_date_filter_prunes_partitions(snapshot):
+	flt = snapshot.appointment_filter("2030-02-01", "2030-02-28")
+	fragments = list(snapshot.dataset("appointments").get_fragments(filter=flt))
+	assert [f.path.split("/")[-2] for f in fragments] == ["month=2030-02"]
+
+
+def test_stats_questions(snapshot):
+	assert snapshot.count_appointments() == 6
+	assert snapshot.count_appointments("2030-01-31", "2030-02-01") == 4
+	assert snapshot.count_appointments("2030-01-01", "2030-01-31", doctor_id=1) == 2
+	assert snapshot.count_appointments(status="cancelled") == 1
+	assert snapshot.appointments_by_day("2030-01-01", "2030-01-31") == [{"date": "2030-01-30", "count": 2}, {"date": "2030-01-31", "count": 1}]
+	assert snapshot.busiest_day("2030-01-01", "2030-02-28") == {"date": "2030-02-01", "count": 3}
+	assert snapshot.busiest_day("2030-03-01", "2030-03-31") == {"date": None, "count": 0}
+	assert snapshot.symptom_count("fever") == 2
+	assert snapshot.symptom_count("fever", "2030-01-31", "2030-02-28") == 1
+	assert snapshot.symptom_count("fever", doctor_id=1) == 1
@@ -0,0 +1,98 @@
+from datetime import date
+import pytest
+import agent
+import report_agent
+from app.routers import nlp
+from app.services.temporal import parse_date, parse_range, parse_time, period_of, in_period, cache_clear, cache_info
+
+TODAY = date(2025, 8, 20)  # a Wednesday
+
+DATES = [
+	# phrase, prefer="future", prefer="past"
+	("today", "2025-08-20", "2025-08-20"),
+	("Tomorrow", "2025-08-21", "2025-08-21"),
+	("yesterday", "2025-08-19", "2025-08-19"),
+	("day after tomorrow", "2025-08-22", "2025-08-22"),
+	("friday", "2025-08-22", "2025-08-15"),
+	("wednesday", "2025-08-27", "2025-08-13"),
+	("last friday", "2025-08-15", "2025-08-15"),
+	("next mon", "2025-08-25", "2025-08-25"),
+	("next week", "2025-08-25", "2025-08-25"),
+	("26", "2025-08-26", "2025-07-26"),
+	("5th", "2025-09-05", "2025-08-05"),
+	("on the 31st", "2025-08-31", "2025-07-31"),
+	("the 26th of August", "2025-08-26", "2025-08-26"),
+	("Aug 26, 2024", "2024-08-26", "2024-08-26"),
+	("26 august", "2025-08-26", "2025-08-26"),
+	("2025-08-25", "2025-08-25", "2025-08-25"),
+	("25/08/2025", "2025-08-25", "2025-08-25"),
+	("26/08", "2025-08-26", "2025-08-26"),
+	("in 3 days", "2025-08-23", "2025-08-23"),
+	("2 weeks ago", "2025-08-06", "2025-08-06"),
+	("how many patients visited yesterday", "2025-08-19", "2025-08-19"),
+	("2025-13-40", None, None),
+	("31 feb", None, None),
+	("10:30", None, None),
+	("", None, None),
+]
+
+
+@pytest.mark.parametrize("phrase,future,past", DATES)
+def test_dates(phrase, future, past):
+	assert parse_date(phrase, TODAY) == future
+	assert parse_date(phrase, TODAY, prefer="past") == past
+
+
+@pytest.mark.parametrize("phrase,expected", [
+	("fever last 7 days", ("2025-08-14", "2025-08-20")),
+	("past 2 weeks", ("2025-08-07", "2025-08-20")),
+	("next 3 days", ("2025-08-20", "2025-08-22")),
+	("this week", ("2025-08-18", "2025-08-24")),
+	("next week", ("2025-08-25", "2025-08-31")),
+	("last week", ("2025-08-11", "2025-08-17")),
+	("between 2025-08-30 and 2025-08-24", ("2025-08-24", "2025-08-30")),
+	("yesterday", None),
+])
+def test_ranges(phrase, expected):
+	assert parse_range(phrase, TODAY) == expected
+
+
+@pytest.mark.parametrize("text,expected", [
+	("10", "10:00:00"), ("10am", "10:00:00"), ("12am", "00:00:00"), ("12 pm", "12:00:00"),
+	("10:30 pm", "22:30:00"), ("10.30", "10:30:00"), ("14:00:00", "14:00:00"), ("noon", "12:00:00"),
+	("25:00", None), ("13pm", None), ("soon", None),
+])
+def test_times(text, expected):
+	assert parse_time(text) == expected
+	assert parse_time(text, seconds=False) == (expected[:5] if expected else None)
+
+
+def test_periods():
+	assert period_of("tomorrow afternoon please") == "afternoon"
+	assert in_period("09:30:00", "morning") and not in_period("12:00:00", "morning")
+	assert in_period("17:00", "evening") and in_period("08:00", None)
+
+
+def test_callers_share_the_parser():
+	today = date.today().isoformat()
+	assert agent._normalize_date("today") == nlp.normalize_date("today") == today
+	assert agent._normalize_date("3rd August 2025") == nlp.normalize_date("3rd August 2025") == "2025-08-03"
+	assert agent._normalize_time("2:30pm") == "14:30" and nlp.normalize_time("2:30pm") == "14:30:00"
+	assert agent._match_period("13:00", "afternoon") and not agent._match_period("13:00", "evening")
+
+
+def test_report_agent_looks_back(monkeypatch):
+	monkeypatch.setenv("REPORT_AGENT_TEST_TODAY", TODAY.isoformat())
+	assert report_agent._interpret_query("tell times on friday")["date"] == "2025-08-15"
+	parsed = report_agent._interpret_query("how many patients with fever last 7 days")
+	assert (parsed["type"], parsed["start_date"], parsed["end_date"]) == ("count_symptom", "2025-08-14", "2025-08-20")
+	assert report_agent._interpret_query("how many appointments")["date"] == "2025-08-20"
+
+
+def test_hot_phrases_are_memoized():
+	cache_clear()
+	for _ in range(3):
+		parse_date("tomorrow", TODAY)
+	assert cache_info()["date"]["hits"] == 2
+	# the cache is keyed on today, so a new day does not reuse yesterday's answer
+	assert parse_date("tomorrow", date(2025, 8, 21)) == "2025-08-22"
@@ -0,0 +1,60 @@
+import json
+import time
+from app.config import settings
+from app.metrics import timed_node
+from app.tracing import span, record_span, start_trace, get_exporter, CLIENT
+from app.integrations.llm import StubLLM, get_llm, use_llm, reset_llm
+
+
+def test_span_is_noop_outside_a_trace():
+	with span("orphan") as s:
+		assert s is None
+	assert record_span("GET /x", 0, 1) is None
+
+
+def test_summary_attributes_calls_to_nodes():
+	stub = StubLLM({})
+	stub.add("Return ONLY JSON. Query: list doctors", '{"intent": "list_doctors"}')
+	use_llm(stub)
+
+	def parse(state):
+		get_llm("m").invoke("Return ONLY JSON. Query: list doctors")
+		now = time.time_ns()
+		record_span("GET /doctor_id", now - 1_000_000, now, **{"db.queries": 2})
+		return {}
+
+	def check(state):
+		with span("gmail.send", CLIENT):
+			pass
+		return {}
+
+	try:
+		with start_trace("turn") as trace:
+			timed_node("parse", parse)({})
+			timed_node("check", check)({})
+	finally:
+		reset_llm()
+	summary = trace.summary()
+	nodes = {n["node"]: n for n in summary["nodes"]}
+	assert nodes["parse"]["llm_calls"] == 1
+	assert nodes["parse"]["tokens_in"] > 0
+	assert nodes["parse"]["http_calls"] == 1 and nodes["parse"]["db_queries"] == 2
+	assert nodes["check"]["http_calls"] == 1 and nodes["check"]["llm_calls"] == 0
+	assert summary["totals"] == {"llm_calls": 1, "tokens_in": nodes["parse"]["tokens_in"], "tokens_out": nodes["parse"]["tokens_out"], "http_calls": 2, "db_queries": 2}
+	assert summary["duration_ms"] is not None
+
+
+def test_traces_export_as_otlp_json(tmp_path, monkeypatch):
+	path = tmp_path / "traces.jsonl"
+	monkeypatch.setattr(settings, "trace_export", str(path))
+	with start_trace("turn") as trace:
+		with span("node.parse", **{"graph.node": "parse"}):
+			pass
+	assert get_exporter().flush()
+	payload = json.loads(path.read_text().splitlines()[-1])
+	spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+	root = next(s for s in spans if "parentSpanId" not in s)
+	child = next(s for s in spans if s["name"] == "node.parse")
+	assert child["parentSpanId"] == root["spanId"]
+	assert {s["traceId"] for s in spans} == {trace.trace_id}
+	assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
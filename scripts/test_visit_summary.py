@@ -0,0 +1,80 @@
+from datetime import date, time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, create_db_engine, get_db
+from app import models
+from app.services.booking import book_slot, is_returning_patient
+from app.services.visit_summary import ensure_visit_summary, get_summary, rebuild, summary_cache
+from scripts.loadtest import _load_app_py
+
+MON, TUE = date(2030, 1, 7), date(2030, 1, 8)
+
+
+@pytest.fixture()
+def engine(tmp_path):
+	eng = create_db_engine(f"sqlite:///{tmp_path / 'visits.db'}")
+	Base.metadata.create_all(bind=eng)
+	with eng.begin() as conn:
+		conn.execute(models.Doctor.__table__.insert(), [{"doctor_id": 1, "name": "Dr. Ahuja"}, {"doctor_id": 2, "name": "Dr. Mehra"}])
+		conn.execute(models.Patient.__table__.insert(), [{"patient_id": 1, "name": "P1", "email": "p1@example.com"}, {"patient_id": 2, "name": "P2", "email": "p2@example.com"}])
+		conn.execute(models.DoctorScheduleTemplate.__table__.insert(), [{"doctor_id": d, "weekday": w, "start_time": time(9), "end_time": time(12), "slot_minutes": 30} for d in (1, 2) for w in (0, 1)])
+		rebuild(conn)
+	return eng
+
+
+def test_summary_follows_appointment_writes(engine):
+	db = sessionmaker(bind=engine)()
+	assert get_summary(db, 1)["visit_count"] == 0 and not is_returning_patient(db, 1)
+	first = book_slot(db, 1, 1, "2030-01-07", "09:00")
+	second = book_slot(db, 2, 1, "2030-01-08", "10:00")
+	# the first visit is a new-patient hour, the next one a returning half-hour
+	assert (first.visit_type, first.end_time, second.visit_type, second.end_time) == ("new", time(10), "returning", time(10, 30))
+	s = get_summary(db, 1)
+	assert (s["first_visit"], s["last_visit"], s["visit_count"], s["last_doctor_id"]) == (MON, TUE, 2, 2)
+	# cancelling a visit rebuilds the row; a rolled-back write leaves it alone
+	second.confirmation_status = "cancelled"
+	db.commit()
+	assert (get_summary(db, 1)["visit_count"], get_summary(db, 1)["last_doctor_id"]) == (1, 1)
+	first.status = "Cancelled"
+	db.flush()
+	db.rollback()
+	assert get_summary(db, 1)["visit_count"] == 1
+	db.close()
+
+
+def test_cache_hits_skip_the_database(engine):
+	db = sessionmaker(bind=engine)()
+	book_slot(db, 1, 2, "2030-01-07", "09:00")
+	assert is_returning_patient(db, 2)
+	statements = []
+	event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+	hits = summary_cache.hits
+	assert is_returning_patient(db, 2) and get_summary(db, 2)["visit_count"] == 1
+	assert statements == [] and summary_cache.hits == hits + 2
+	db.close()
+
+
+def test_backfill_and_patient_context(engine):
+	with engine.begin() as conn:
+		conn.execute(models.Appointment.__table__.insert(), [{"doctor_id": 2, "patient_id": 1, "appointment_date": MON, "start_time": time(9), "end_time": time(9, 30)}])
+		conn.execute(models.PatientVisitSummary.__table__.delete())
+		ensure_visit_summary(conn)
+	api = _load_app_py()
+	sessions = sessionmaker(bind=engine)
+
+	def override():
+		s = sessions()
+		try:
+			yield s
+		finally:
+			s.close()
+
+	api.dependency_overrides[get_db] = override
+	try:
+		c = TestClient(api)
+		assert c.get("/patient_id/p1@example.com").json() == {"patient_id": 1, "returning": True, "visit_count": 1, "last_visit": "2030-01-07", "last_doctor_id": 2, "visit_minutes": 30}
+		assert c.get("/patient_id/P2@example.com").json()["visit_minutes"] == 60
+	finally:
+		api.dependency_overrides.clear()